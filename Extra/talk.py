@@ -33,6 +33,10 @@ except ImportError as e:
     print("Install with: pip install pygame PyOpenGL PyOpenGL_accelerate requests pyaudio")
     sys.exit(1)
 
+# glyph_text lives with the main client in robot/; this legacy copy of the UI shares that module
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'robot'))
+from glyph_text import TextRenderer
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, 
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -1685,6 +1689,7 @@ class EnhancedRobotFaceSystem:
         # Initialize font system (will be set up after pygame.init)
         self.font = None
         self.font_large = None
+        self.text_renderer = None  # Glyph atlas for self.font, created once the GL context exists
         
         # Expression cycling
         self.expression_list = list(self.loader.expressions.keys())
@@ -1765,6 +1770,9 @@ class EnhancedRobotFaceSystem:
             self.font = pygame.font.Font(None, 24)
             self.font_large = pygame.font.Font(None, 32)
         
+        # Glyphs are rasterized once; strings are laid out once and drawn as one batch
+        self.text_renderer = TextRenderer(self.font)
+        
         print("Enhanced system initialized!")
         
         # Don't auto-start conversation - wait for button press
@@ -2189,17 +2197,14 @@ class EnhancedRobotFaceSystem:
         glPushMatrix()
         glLoadIdentity()
         
-        # Draw semi-transparent background box
-        text_lines = self.wrap_text(text, 60)  # Wrap at 60 characters
-        line_count = len(text_lines)
-        
-        # Background dimensions
-        bg_height = max(80, line_count * 25 + 20)
+        # Background dimensions (the text is wrapped to the box width in pixels)
         bg_width = min(self.width - 40, 600)
+        layout = self.text_renderer.layout(text, bg_width - 20)
+        bg_height = max(80, layout.height + 20)
         bg_x = (self.width - bg_width) // 2
         bg_y = 20
         
-        # Draw background rectangle
+        # Draw semi-transparent background box
         glColor4f(0.0, 0.0, 0.0, 0.7 * alpha)  # Semi-transparent black
         glBegin(GL_QUADS)
         glVertex2f(bg_x, bg_y)
@@ -2218,17 +2223,8 @@ class EnhancedRobotFaceSystem:
         glVertex2f(bg_x, bg_y + bg_height)
         glEnd()
         
-        # Draw text using simple bitmap drawing (dots/lines for characters)
-        # This is a basic implementation - you can enhance with proper font rendering
-        text_x = bg_x + 10
-        text_y = bg_y + bg_height - 30
-        
-        glColor4f(1.0, 1.0, 1.0, alpha)  # White text
-        glPointSize(2.0)
-        
-        for i, line in enumerate(text_lines):
-            y_pos = text_y - (i * 25)
-            self.draw_simple_text(line, text_x, y_pos, alpha)
+        # Draw the whole wrapped text in one batch from the glyph atlas
+        self.draw_simple_text(text, bg_x + 10, bg_y + bg_height - 10, alpha, max_width=bg_width - 20)
         
         # Restore matrices
         glPopMatrix()
@@ -2236,86 +2232,15 @@ class EnhancedRobotFaceSystem:
         glPopMatrix()
         glMatrixMode(GL_MODELVIEW)
     
-    def wrap_text(self, text, width):
-        """Wrap text to specified width"""
-        words = text.split()
-        lines = []
-        current_line = ""
-        
-        for word in words:
-            if len(current_line + " " + word) <= width:
-                if current_line:
-                    current_line += " " + word
-                else:
-                    current_line = word
-            else:
-                if current_line:
-                    lines.append(current_line)
-                current_line = word
-        
-        if current_line:
-            lines.append(current_line)
-        
-        return lines
-    
-    def draw_simple_text(self, text, x, y, alpha=1.0):
-        """Draw text using OpenGL textures from pygame font rendering"""
-        if not self.font or not text.strip():
+    def draw_simple_text(self, text, x, y, alpha=1.0, max_width=None):
+        """Draw text from the glyph atlas with its top-left corner at (x, y), wrapped to max_width pixels"""
+        if not self.text_renderer or not text.strip():
             return
-            
-        try:
-            # Create text surface using pygame font
-            text_color = (int(204 * alpha), int(229 * alpha), int(255 * alpha))  # Light blue
-            text_surface = self.font.render(text, True, text_color)
-            text_data = pygame.image.tostring(text_surface, "RGBA", True)
-            
-            # Get text dimensions
-            text_width = text_surface.get_width()
-            text_height = text_surface.get_height()
-            
-            # Enable texturing
-            glEnable(GL_TEXTURE_2D)
-            glEnable(GL_BLEND)
-            glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-            
-            # Generate and bind texture
-            texture_id = glGenTextures(1)
-            glBindTexture(GL_TEXTURE_2D, texture_id)
-            
-            # Set texture parameters
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
-            
-            # Upload texture data
-            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, text_width, text_height, 0, GL_RGBA, GL_UNSIGNED_BYTE, text_data)
-            
-            # Set color and alpha
-            glColor4f(1.0, 1.0, 1.0, alpha)
-            
-            # Draw textured quad
-            glBegin(GL_QUADS)
-            glTexCoord2f(0, 0); glVertex2f(x, y + text_height)
-            glTexCoord2f(1, 0); glVertex2f(x + text_width, y + text_height)
-            glTexCoord2f(1, 1); glVertex2f(x + text_width, y)
-            glTexCoord2f(0, 1); glVertex2f(x, y)
-            glEnd()
-            
-            # Clean up
-            glDeleteTextures([texture_id])
-            glDisable(GL_TEXTURE_2D)
-            glDisable(GL_BLEND)
-            
-        except Exception as e:
-            print(f"Text rendering error: {e}")
-            # Fallback to simple line if texture rendering fails
-            glColor4f(0.8, 0.9, 1.0, alpha)
-            glLineWidth(2.0)
-            glBegin(GL_LINES)
-            glVertex2f(x, y)
-            glVertex2f(x + len(text) * 8, y)
-            glEnd()
+        
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        self.text_renderer.draw(text, x, y, (0.8, 0.9, 1.0, alpha), max_width)  # Light blue
+        glDisable(GL_BLEND)
 
     def set_expression(self, expression_name):
         """Set expression"""
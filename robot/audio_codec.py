@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Upload audio codecs for the voice assistant.
+Captured 16-bit PCM is encoded to Opus, FLAC or WAV on a worker thread while
+recording is still running, so the payload is ready as soon as capture stops.
+FLAC/Opus need the optional `soundfile` package (libsndfile); without it only WAV is used.
+"""
+
+import queue
+import threading
+import wave
+import logging
+from io import BytesIO
+
+import numpy as np
+
+try:
+    import soundfile as sf
+except ImportError:
+    sf = None
+
+logger = logging.getLogger(__name__)
+
+# Codec name -> libsndfile container/subtype and upload metadata
+AUDIO_CODECS = {
+    'opus': {'format': 'OGG', 'subtype': 'OPUS', 'extension': 'ogg', 'mime': 'audio/ogg'},
+    'flac': {'format': 'FLAC', 'subtype': 'PCM_16', 'extension': 'flac', 'mime': 'audio/flac'},
+    'wav': {'format': 'WAV', 'subtype': 'PCM_16', 'extension': 'wav', 'mime': 'audio/wav'},
+}
+
+# Smallest payload first
+UPLOAD_CODEC_PREFERENCE = ['opus', 'flac', 'wav']
+
+
+def local_audio_codecs():
+    """Codecs this machine can encode"""
+    codecs = []
+    if sf is not None:
+        formats = sf.available_formats()
+        if 'OGG' in formats and 'OPUS' in sf.available_subtypes('OGG'):
+            codecs.append('opus')
+        if 'FLAC' in formats:
+            codecs.append('flac')
+    codecs.append('wav')
+    return codecs
+
+
+def choose_upload_codec(server_codecs):
+    """Pick the most compact codec supported by both the server and this machine"""
+    local = local_audio_codecs()
+    for codec in UPLOAD_CODEC_PREFERENCE:
+        if codec in local and codec in server_codecs:
+            return codec
+    return 'wav'
+
+
+class UploadEncoder:
+    """Encodes PCM chunks on a worker thread while they are still being captured"""
+
+    def __init__(self, codec='wav', rate=16000, channels=1):
+        if codec not in AUDIO_CODECS or (codec != 'wav' and sf is None):
+            logger.warning(f"Codec '{codec}' unavailable, falling back to wav")
+            codec = 'wav'
+        self.codec = codec
+        self.rate = rate
+        self.channels = channels
+        self.chunks = queue.Queue()
+        self.output = BytesIO()
+        self.error = None
+        self.input_done = False
+
+        self.thread = threading.Thread(target=self.worker)
+        self.thread.daemon = True
+        self.thread.start()
+
+    @property
+    def filename(self):
+        return f"audio.{AUDIO_CODECS[self.codec]['extension']}"
+
+    @property
+    def mime_type(self):
+        return AUDIO_CODECS[self.codec]['mime']
+
+    def feed(self, pcm):
+        """Queue raw int16 PCM bytes for encoding"""
+        self.chunks.put(pcm)
+
+    def worker(self):
+        try:
+            if self.codec == 'wav':
+                self.encode_wav()
+            else:
+                self.encode_soundfile()
+        except Exception as e:
+            self.error = e
+            logger.error(f"Audio encoding error ({self.codec}): {e}")
+            # Keep draining so producers never block on a dead encoder
+            while not self.input_done:
+                self.next_chunk()
+
+    def next_chunk(self):
+        chunk = self.chunks.get()
+        if chunk is None:
+            self.input_done = True
+        return chunk
+
+    def encode_wav(self):
+        wf = wave.open(self.output, 'wb')
+        wf.setnchannels(self.channels)
+        wf.setsampwidth(2)
+        wf.setframerate(self.rate)
+        while True:
+            chunk = self.next_chunk()
+            if chunk is None:
+                break
+            wf.writeframes(chunk)
+        wf.close()
+
+    def encode_soundfile(self):
+        codec = AUDIO_CODECS[self.codec]
+        with sf.SoundFile(self.output, mode='w', samplerate=self.rate, channels=self.channels,
+                          format=codec['format'], subtype=codec['subtype']) as f:
+            while True:
+                chunk = self.next_chunk()
+                if chunk is None:
+                    break
+                samples = np.frombuffer(chunk, dtype=np.int16)
+                if self.channels > 1:
+                    samples = samples.reshape(-1, self.channels)
+                f.write(samples)
+
+    def finish(self):
+        """Flush the encoder and return the encoded bytes (None if encoding failed)"""
+        self.chunks.put(None)
+        self.thread.join()
+        if self.error is not None:
+            return None
+        return self.output.getvalue()
+
+
+def encode_pcm(pcm, codec='wav', rate=16000, channels=1):
+    """Encode a complete PCM buffer in one call"""
+    encoder = UploadEncoder(codec, rate, channels)
+    encoder.feed(pcm)
+    return encoder.finish()
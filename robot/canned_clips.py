@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Canned fallback replies for the voice assistant.
+mtalk plays these local clips when the server can't answer (offline, failed
+request) or when a local command needs no round-trip. The clips are rendered
+once with an offline text-to-speech engine (espeak-ng or espeak) and written
+as <name>.wav into CANNED_CLIPS_DIR, relative to the directory mtalk runs from.
+
+Usage:
+    python canned_clips.py                      # render every missing clip
+    python canned_clips.py --force --voice en-us+f3 --speed 150
+"""
+
+import os
+import shutil
+import argparse
+import subprocess
+
+CANNED_CLIPS_DIR = "canned_clips"
+CANNED_REPLIES = {
+    'offline': "Sorry, I can't reach my server right now.",
+    'not_understood': "Sorry, I didn't catch that.",
+    'ok': "Okay!",
+}
+
+TTS_ENGINES = ('espeak-ng', 'espeak')
+
+
+def find_tts_engine():
+    for engine in TTS_ENGINES:
+        path = shutil.which(engine)
+        if path:
+            return path
+    return None
+
+
+def render_clip(engine, text, path, voice='en', speed=160):
+    """Write text as a WAV file with the espeak command line"""
+    subprocess.run([engine, '-v', voice, '-s', str(speed), '-w', path, text], check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render the canned fallback replies as local clips')
+    parser.add_argument('--output', default=CANNED_CLIPS_DIR, help='Directory mtalk loads canned clips from')
+    parser.add_argument('--voice', default='en', help='espeak voice name')
+    parser.add_argument('--speed', type=int, default=160, help='Speaking rate in words per minute')
+    parser.add_argument('--force', action='store_true', help='Re-render clips that already exist')
+    args = parser.parse_args()
+
+    engine = find_tts_engine()
+    if engine is None:
+        parser.error(f"No offline TTS engine found (install one of: {', '.join(TTS_ENGINES)})")
+
+    os.makedirs(args.output, exist_ok=True)
+    for name, text in CANNED_REPLIES.items():
+        existing = [f"{name}.{ext}" for ext in ('wav', 'mp3') if os.path.exists(os.path.join(args.output, f"{name}.{ext}"))]
+        if existing and not args.force:
+            print(f"{name:<16} kept {existing[0]}")
+            continue
+        path = os.path.join(args.output, f"{name}.wav")
+        render_clip(engine, text, path, args.voice, args.speed)
+        print(f"{name:<16} {path} ({os.path.getsize(path)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
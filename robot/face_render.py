@@ -0,0 +1,1627 @@
+#!/usr/bin/env python3
+"""
+Face rendering and animation for the robot's OpenGL face.
+Avatar state, the emotion and phoneme mouth tables, the face part texture atlas,
+the fixed-function and GLES2 renderers and the per-frame animation update.
+Nothing here touches the servos, microphone or network, so the face can be
+driven without the robot hardware (see render_benchmark.py).
+
+Usage:
+    python face_render.py --bake-atlas          # pack the face parts into atlas.png + atlas.json
+"""
+
+import os
+import re
+import json
+import math
+import time
+import ctypes
+import random
+import hashlib
+import logging
+import argparse
+
+import numpy as np
+from PIL import Image
+from OpenGL.GL import *
+from OpenGL.GLU import *
+
+from glyph_text import draw_layout
+
+logger = logging.getLogger(__name__)
+
+PARTS_PATH = "parts/"  # Assumes a 'parts' subfolder for images
+TEXTURE_CACHE_DIR = "texture_cache"  # Decoded RGBA pixels, memory-mapped on later starts
+TEXTURE_CACHE_HEADER = 8  # uint32 width, uint32 height
+
+# Face part images, all packed into one texture atlas at load time (add emotion-specific parts here)
+TEXTURE_PARTS = {
+    "base": "base.png",
+    "l_eye_bg": "left_eye_background_and_border.png",
+    "r_eye_bg": "right_eye_background_and_border.png",
+    "l_pupil": "left_eye_pupil.png",
+    "r_pupil": "right_eye_pupil.png",
+}
+FACE_PART_TEXTURES = {"face": "base", "l_eye_bg": "l_eye_bg", "r_eye_bg": "r_eye_bg",
+                      "l_pupil": "l_pupil", "r_pupil": "r_pupil"}  # Renderer part -> texture key
+ATLAS_IMAGE = "atlas.png"  # Optional pre-baked atlas in PARTS_PATH (python face_render.py --bake-atlas)
+ATLAS_MANIFEST = "atlas.json"
+ATLAS_PADDING = 4  # Edge texels repeated around each part; covers mip levels up to log2(ATLAS_PADDING)
+ATLAS_MAX_MIP_LEVEL = int(math.log2(ATLAS_PADDING))  # Smaller atlas mips would blend neighbouring parts
+LIP_EYEBROW_COLOR = (0, 53, 86)  # #003556 in RGB
+LIP_EYEBROW_COLOR_GL = (0/255.0, 53/255.0, 86/255.0, 1.0)  # Normalized for OpenGL
+
+# Static face geometry VBO layout: interleaved x, y, u, v float32 per vertex
+STATIC_VERTEX_STRIDE = 4 * 4
+STATIC_TEXCOORD_OFFSET = 2 * 4
+
+# Lip sync: cross-fade between cached phoneme mouth shapes over this long
+MOUTH_BLEND_SECONDS = 0.06
+
+# Background colors
+BG_COLOR_NORMAL = (0.1, 0.1, 0.8, 1.0)  # Blue background for normal mode
+BG_COLOR_LOADING = (0.0, 0.0, 0.0, 1.0)  # Black background for loading mode
+
+# Enhanced emotion definitions with loading expressions
+EMOTIONS = {
+    "neutral": {"eyebrow_y": 0.0, "eyebrow_r": 0, "mouth_c": 0.0, "eye_o": 1.0, "pupil_s": 1.0, "eye_steady": False, "eye_move_range": 0.3},
+    "happy": {"eyebrow_y": 0.05, "eyebrow_r": -5, "mouth_c": 0.6, "eye_o": 1.0, "pupil_s": 1.0, "eye_steady": False, "eye_move_range": 0.4},
+    "sad": {"eyebrow_y": -0.03, "eyebrow_r": 15, "mouth_c": -0.7, "eye_o": 0.6, "pupil_s": 0.9, "eye_steady": False, "eye_move_range": 0.2},
+    "angry": {"eyebrow_y": -0.01, "eyebrow_r": -10, "mouth_c": -0.4, "eye_o": 0.9, "pupil_s": 1.0, "eye_steady": False, "eye_move_range": 0.5},
+    "surprise": {"eyebrow_y": 0.12, "eyebrow_r": 5, "mouth_c": 0.2, "eye_o": 1.2, "pupil_s": 0.8, "eye_steady": False, "eye_move_range": 0.6},
+    "fear": {"eyebrow_y": 0.1, "eyebrow_r": 20, "mouth_c": -0.5, "eye_o": 1.15, "pupil_s": 0.7, "eye_steady": False, "eye_move_range": 0.7},
+    "disgust": {"eyebrow_y": -0.02, "eyebrow_r": -5, "mouth_c": -0.6, "eye_o": 0.9, "pupil_s": 1.0, "eye_steady": False, "eye_move_range": 0.3},
+    "amusement": {"eyebrow_y": 0.04, "eyebrow_r": -4, "mouth_c": 0.8, "eye_o": 1.0, "pupil_s": 1.0, "eye_steady": False, "eye_move_range": 0.4},
+    "frustration": {"eyebrow_y": -0.01, "eyebrow_r": -5, "mouth_c": -0.3, "eye_o": 0.9, "pupil_s": 1.0, "eye_steady": False, "eye_move_range": 0.4},
+    "love": {"eyebrow_y": 0.03, "eyebrow_r": -6, "mouth_c": 0.5, "eye_o": 1.0, "pupil_s": 1.2, "eye_steady": False, "eye_move_range": 0.3},
+    "embarrassment": {"eyebrow_y": -0.02, "eyebrow_r": 5, "mouth_c": -0.2, "eye_o": 0.8, "pupil_s": 1.1, "eye_steady": False, "eye_move_range": 0.2},
+    "confusion": {"eyebrow_y": 0.0, "eyebrow_r": 15, "mouth_c": -0.1, "eye_o": 0.9, "pupil_s": 1.0, "eye_steady": False, "eye_move_range": 0.5},
+    "sleepy": {"eyebrow_y": -0.01, "eyebrow_r": 2, "mouth_c": 0.1, "eye_o": 0.2, "pupil_s": 0.1, "eye_steady": True, "eye_move_range": 0.1},
+    "talking": {"eyebrow_y": 0.0, "eyebrow_r": 0, "mouth_c": 0.0, "eye_o": 1.0, "pupil_s": 1.0, "eye_steady": False, "eye_move_range": 0.3},
+    "cute_neutral": {"eyebrow_y": 0.02, "eyebrow_r": -2, "mouth_c": 0.2, "eye_o": 1.1, "pupil_s": 1.0, "eye_steady": False, "eye_move_range": 0.3},
+    
+    # Loading expressions - funny and interactive
+    "loading_thinking": {"eyebrow_y": 0.08, "eyebrow_r": 10, "mouth_c": -0.2, "eye_o": 0.8, "pupil_s": 0.9, "eye_steady": False, "eye_move_range": 0.8},
+    "loading_excited": {"eyebrow_y": 0.1, "eyebrow_r": -8, "mouth_c": 0.4, "eye_o": 1.3, "pupil_s": 1.1, "eye_steady": False, "eye_move_range": 0.9},
+    "loading_curious": {"eyebrow_y": 0.06, "eyebrow_r": 12, "mouth_c": 0.1, "eye_o": 1.1, "pupil_s": 0.8, "eye_steady": False, "eye_move_range": 1.0},
+    "loading_dizzy": {"eyebrow_y": 0.0, "eyebrow_r": 5, "mouth_c": -0.1, "eye_o": 0.9, "pupil_s": 1.2, "eye_steady": False, "eye_move_range": 1.2},
+    "loading_focused": {"eyebrow_y": -0.02, "eyebrow_r": -8, "mouth_c": 0.0, "eye_o": 0.7, "pupil_s": 0.6, "eye_steady": True, "eye_move_range": 0.1},
+}
+
+LOADING_EXPRESSIONS = ["loading_thinking", "loading_excited", "loading_curious", "loading_dizzy", "loading_focused"]
+
+# Mouth parameters per phoneme:
+# (width factor, opening height, upper curve, lower curve, lip thickness, roundness)
+PHONEME_MOUTH_PARAMS = [
+    ('vowel_wide_a', 1.3, 0.8, 0.3, 0.5, 0.15, 0.2),      # "Ah" - wide mouth
+    ('vowel_mid_e', 1.2, 0.6, 0.25, 0.35, 0.12, 0.3),     # "Eh" - moderately wide
+    ('vowel_narrow_i', 0.7, 0.25, 0.1, 0.15, 0.1, 0.1),   # "Ee" - narrow, pulled back
+    ('vowel_round_o', 0.9, 0.7, 0.4, 0.4, 0.18, 0.9),     # "Oh" - round but not wide
+    ('vowel_round_u', 0.8, 0.5, 0.3, 0.3, 0.16, 0.95),    # "Oo" - narrow and round
+    ('bilabial_b', 1.0, 0.0, 0.05, 0.05, 0.12, 0.2),      # Lips together
+    ('bilabial_p', 1.0, 0.0, 0.05, 0.05, 0.12, 0.2),
+    ('bilabial_m', 1.0, 0.0, 0.08, 0.08, 0.14, 0.3),
+    ('labiodental_f', 0.9, 0.15, 0.1, 0.2, 0.1, 0.1),     # Slightly narrow for "F"/"V"
+    ('labiodental_v', 0.9, 0.15, 0.1, 0.2, 0.1, 0.1),
+    ('dental_t', 1.0, 0.25, 0.15, 0.2, 0.1, 0.2),
+    ('dental_d', 1.0, 0.25, 0.15, 0.2, 0.1, 0.2),
+    ('dental_n', 1.0, 0.2, 0.12, 0.18, 0.12, 0.2),
+    ('dental_l', 1.0, 0.2, 0.12, 0.18, 0.1, 0.2),
+    ('dental_r', 1.0, 0.25, 0.15, 0.2, 0.12, 0.25),
+    ('sibilant_s', 0.85, 0.1, 0.08, 0.12, 0.08, 0.1),     # Narrow for "S"/"Z"
+    ('sibilant_z', 0.85, 0.1, 0.08, 0.12, 0.08, 0.1),
+    ('sibilant_sh', 0.9, 0.15, 0.1, 0.15, 0.1, 0.3),
+    ('sibilant_ch', 0.9, 0.12, 0.08, 0.12, 0.09, 0.2),
+    ('velar_k', 1.0, 0.2, 0.1, 0.15, 0.1, 0.2),
+    ('velar_g', 1.0, 0.2, 0.1, 0.15, 0.1, 0.2),
+    ('rounded_w', 0.8, 0.3, 0.2, 0.2, 0.14, 0.8),         # Narrow and round for "W"
+    ('palatal_y', 0.9, 0.15, 0.1, 0.15, 0.1, 0.3),
+    ('consonant_default', 1.0, 0.15, 0.1, 0.15, 0.1, 0.2),
+    ('pause', 1.0, 0.03, 0.05, 0.08, 0.1, 0.2),
+    ('neutral', 1.0, 0.05, 0.05, 0.08, 0.1, 0.2),
+]
+
+# Mouth parameters per emotion: (width factor while speaking, resting width, upper curve gain, lower curve gain)
+EMOTION_MOUTH_PARAMS = {
+    'happy': (1.4, 1.2, 0.8, 1.3),          # Much wider smile
+    'amusement': (1.5, 1.3, 0.8, 1.3),      # Even wider for laughter
+    'love': (1.2, 1.1, 0.8, 1.3),           # Gentle wider smile
+    'surprise': (1.3, 1.1, 1.0, 1.0),       # Wide open in surprise
+    'fear': (0.8, 0.8, 1.0, 1.0),           # Tighter, smaller mouth
+    'sad': (0.7, 0.8, 1.2, 0.7),            # Narrow, downturned
+    'angry': (0.9, 0.9, 1.0, 1.0),          # Tense, slightly narrow
+    'disgust': (0.8, 0.8, 1.0, 1.0),
+    'embarrassment': (0.8, 1.0, 1.0, 1.0),  # Shy, smaller mouth
+    'confusion': (0.9, 1.0, 1.0, 1.0),
+    'frustration': (0.85, 1.0, 1.2, 0.7),
+    'sleepy': (0.6, 1.0, 1.0, 1.0),         # Very small, relaxed
+    'talking': (1.0, 1.0, 1.0, 1.0),
+    'cute_neutral': (1.1, 1.0, 1.0, 1.0),   # Slightly wider for cuteness
+    'neutral': (1.0, 1.0, 1.0, 1.0),
+    'loading_thinking': (0.9, 1.0, 1.0, 1.0),
+    'loading_excited': (1.3, 1.0, 1.0, 1.0),
+    'loading_curious': (1.1, 1.0, 1.0, 1.0),
+    'loading_dizzy': (0.8, 1.0, 1.0, 1.0),
+    'loading_focused': (0.8, 1.0, 1.0, 1.0),
+}
+
+# Mouth opening profile kinds
+OPENING_ROUND, OPENING_WIDE, OPENING_NARROW, OPENING_STANDARD = range(4)
+
+def phoneme_opening_kind(name, roundness):
+    if roundness > 0.6:
+        return OPENING_ROUND
+    if name.startswith('vowel_wide'):
+        return OPENING_WIDE
+    if name.startswith('vowel_narrow'):
+        return OPENING_NARROW
+    return OPENING_STANDARD
+
+def phoneme_speech_motion(name):
+    """(mouth open ratio, target width) driven by update_animations while speaking"""
+    for prefix, motion in (('vowel_wide', (0.9, 1.3)), ('vowel_round', (0.7, 0.8)), ('vowel_narrow', (0.4, 0.7)),
+                           ('bilabial', (0.0, 1.0)), ('dental', (0.4, 1.0)), ('sibilant', (0.3, 0.85)),
+                           ('rounded', (0.5, 0.8))):
+        if name.startswith(prefix):
+            return motion
+    return (0.1, 1.0)  # pause or other
+
+def read_only_columns(rows, dtype=np.float32):
+    """Split table rows into read-only NumPy columns (structure of arrays)"""
+    columns = np.array(rows, dtype=dtype).T.copy()
+    columns.flags.writeable = False
+    return columns
+
+# Read-only structure-of-arrays tables, indexed by integer phoneme / emotion IDs
+PHONEME_NAMES = tuple(row[0] for row in PHONEME_MOUTH_PARAMS)
+PHONEME_IDS = {name: index for index, name in enumerate(PHONEME_NAMES)}
+NEUTRAL_PHONEME_ID = PHONEME_IDS['neutral']
+(PHONEME_WIDTH_FACTOR, PHONEME_OPENING_HEIGHT, PHONEME_UPPER_CURVE, PHONEME_LOWER_CURVE,
+ PHONEME_LIP_THICKNESS, PHONEME_ROUNDNESS) = read_only_columns([row[1:] for row in PHONEME_MOUTH_PARAMS])
+PHONEME_OPENING_KIND = read_only_columns([phoneme_opening_kind(row[0], row[6]) for row in PHONEME_MOUTH_PARAMS], np.int8)
+PHONEME_OPEN_RATIO, PHONEME_SPEECH_WIDTH = read_only_columns([phoneme_speech_motion(name) for name in PHONEME_NAMES])
+
+EMOTION_NAMES = tuple(EMOTIONS)
+EMOTION_IDS = {name: index for index, name in enumerate(EMOTION_NAMES)}
+NEUTRAL_EMOTION_ID = EMOTION_IDS['neutral']
+(EMOTION_MOUTH_WIDTH, EMOTION_REST_MOUTH_WIDTH, EMOTION_UPPER_CURVE_GAIN,
+ EMOTION_LOWER_CURVE_GAIN) = read_only_columns([EMOTION_MOUTH_PARAMS.get(name, (1.0, 1.0, 1.0, 1.0)) for name in EMOTION_NAMES])
+
+def text_to_enhanced_phonemes(text):
+    """Enhanced phoneme detection with better vowel recognition"""
+    phonemes = []
+    words = re.findall(r'\b\w+\b', text.lower())
+    
+    # Vowel patterns for better lip sync
+    vowel_patterns = {
+        'a': ('vowel_wide_a', 0.20),      # Wide open mouth
+        'e': ('vowel_mid_e', 0.18),       # Medium open, slightly wide
+        'i': ('vowel_narrow_i', 0.16),    # Narrow, high tongue
+        'o': ('vowel_round_o', 0.18),     # Round lips, medium open
+        'u': ('vowel_round_u', 0.16),     # Round lips, smaller opening
+        'ay': ('vowel_wide_a', 0.18),     # Diphthong
+        'ow': ('vowel_round_o', 0.18),    # Diphthong
+    }
+    
+    consonant_patterns = {
+        'b': ('bilabial_b', 0.12),        # Lips together
+        'p': ('bilabial_p', 0.12),        # Lips together
+        'm': ('bilabial_m', 0.14),        # Lips together, longer
+        'f': ('labiodental_f', 0.12),     # Teeth on lip
+        'v': ('labiodental_v', 0.12),     # Teeth on lip
+        't': ('dental_t', 0.10),          # Tongue to teeth
+        'd': ('dental_d', 0.10),          # Tongue to teeth
+        'n': ('dental_n', 0.12),          # Tongue to teeth, longer
+        'l': ('dental_l', 0.12),          # Tongue to teeth
+        'r': ('dental_r', 0.14),          # Tongue movement
+        's': ('sibilant_s', 0.14),        # Hissing sound
+        'z': ('sibilant_z', 0.14),        # Hissing sound
+        'sh': ('sibilant_sh', 0.16),      # Wider hissing
+        'ch': ('sibilant_ch', 0.14),      # Sharp hissing
+        'k': ('velar_k', 0.08),           # Back of tongue
+        'g': ('velar_g', 0.08),           # Back of tongue
+        'w': ('rounded_w', 0.12),         # Rounded lips
+        'y': ('palatal_y', 0.10),         # High tongue
+    }
+    
+    for word in words:
+        # Process each character with context
+        i = 0
+        while i < len(word):
+            char = word[i]
+            
+            # Check for common digraphs first
+            if i < len(word) - 1:
+                digraph = word[i:i+2]
+                if digraph in consonant_patterns:
+                    phonemes.append(consonant_patterns[digraph])
+                    i += 2
+                    continue
+                elif digraph in vowel_patterns:
+                    phonemes.append(vowel_patterns[digraph])
+                    i += 2
+                    continue
+            
+            # Single character processing
+            if char in vowel_patterns:
+                phonemes.append(vowel_patterns[char])
+            elif char in consonant_patterns:
+                phonemes.append(consonant_patterns[char])
+            else:
+                # Default consonant
+                phonemes.append(('consonant_default', 0.08))
+            
+            i += 1
+        
+        # Add word boundary
+        phonemes.append(('pause', 0.05))
+    
+    return phonemes
+
+class AvatarState:
+    """Enhanced Avatar State with loading mode support"""
+    def __init__(self):
+        # Emotion system
+        self.target_emotion = "sleepy"  # Start in sleep mode
+        self.current_emotion = "sleepy"
+        self.emotion_transition_speed = 3.0
+        
+        # Loading mode
+        self.is_loading = False
+        self.loading_start_time = 0
+        self.loading_expression_index = 0
+        self.next_loading_change = 0
+        
+        # Eye system
+        self.eye_open_ratio = 1.0
+        self.target_eye_open_ratio = 1.0
+        self.is_blinking = False
+        self.blink_start_time = 0
+        self.blink_duration = 0.12
+        self.next_blink_time = time.time() + 3
+        
+        # Eyebrow system
+        self.eyebrow_y, self.target_eyebrow_y = 0.0, 0.0
+        self.eyebrow_r, self.target_eyebrow_r = 0.0, 0.0
+        
+        # Pupil system
+        self.pupil_pos = np.array([0.0, 0.0])
+        self.target_pupil_pos = np.array([0.0, 0.0])
+        self.next_gaze_shift_time = time.time() + 2
+        self.pupil_size, self.target_pupil_size = 1.0, 1.0
+        
+        # Mouth system
+        self.mouth_open_ratio = 0.0
+        self.mouth_curve, self.target_mouth_curve = 0.0, 0.0
+        self.upper_lip_y = 0.0
+        self.lower_lip_y = 0.0
+        
+        # Speech system
+        self.is_speaking = False
+        self.speech_start_time = 0
+        self.speech_text = ""
+        self.speech_phonemes = []
+        self.current_phoneme_index = 0
+        
+        # Eye movement
+        self.eye_movement_enabled = True
+        self.eye_movement_range = 0.3
+        
+        # Sleep and special states
+        self.sleep_animation_phase = 0.0
+        self.is_sleeping = True  # Start sleeping
+        self.breathing_offset = 0.0
+        
+        # Mouth width tracking
+        self.current_mouth_width = 0.0
+        self.target_mouth_width = 0.0
+
+def pack_texture_atlas(images, padding=ATLAS_PADDING):
+    """Shelf-pack RGBA images (key -> (height, width, 4) array) into one atlas.
+    Returns (pixels, rects) with rects mapping key -> (x, y, width, height) in atlas pixels."""
+    padded = {key: (img.shape[1] + 2 * padding, img.shape[0] + 2 * padding) for key, img in images.items()}
+    area = sum(w * h for w, h in padded.values())
+    atlas_width = max(max(w for w, _ in padded.values()), int(math.ceil(math.sqrt(area))))
+    
+    # Tallest first, left to right, starting a new shelf when the row is full
+    positions = {}
+    x = y = shelf_height = 0
+    for key in sorted(images, key=lambda k: padded[k][1], reverse=True):
+        w, h = padded[key]
+        if x + w > atlas_width:
+            x, y, shelf_height = 0, y + shelf_height, 0
+        positions[key] = (x, y)
+        x += w
+        shelf_height = max(shelf_height, h)
+    
+    pixels = np.zeros((y + shelf_height, atlas_width, 4), dtype=np.uint8)
+    rects = {}
+    for key, (x, y) in positions.items():
+        img = images[key]
+        h, w = img.shape[:2]
+        pixels[y:y + h + 2 * padding, x:x + w + 2 * padding] = np.pad(
+            img, ((padding, padding), (padding, padding), (0, 0)), mode='edge')
+        rects[key] = (x + padding, y + padding, w, h)
+    return pixels, rects
+
+def bake_texture_atlas(parts_path=PARTS_PATH, parts=TEXTURE_PARTS):
+    """Pack the part images into ATLAS_IMAGE plus an ATLAS_MANIFEST of pixel rectangles"""
+    images = {}
+    for key, filename in parts.items():
+        with Image.open(os.path.join(parts_path, filename)) as img:
+            images[key] = np.asarray(img.convert("RGBA"))
+    pixels, rects = pack_texture_atlas(images)
+    
+    Image.fromarray(pixels, "RGBA").save(os.path.join(parts_path, ATLAS_IMAGE))
+    manifest = {
+        "size": [pixels.shape[1], pixels.shape[0]],
+        "parts": {key: {"file": parts[key], "rect": list(rect)} for key, rect in rects.items()}
+    }
+    with open(os.path.join(parts_path, ATLAS_MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    logger.info(f"Baked {len(rects)} parts into a {pixels.shape[1]}x{pixels.shape[0]} atlas")
+
+class TextureManager:
+    """Manages all texture loading and handling"""
+    
+    def __init__(self, parts_path=PARTS_PATH, cache_dir=TEXTURE_CACHE_DIR):
+        self.parts_path = parts_path
+        self.cache_dir = cache_dir
+        self.mipmaps_supported = True
+        self.textures = {}  # key -> GL texture (the atlas for every part when packing succeeded)
+        self.texture_info = {}  # key -> (width, height) of the source image
+        self.atlas_texture = None
+        self.atlas_uv = {}  # key -> (u0, v0, u1, v1); v0 is the top row of the image
+        self.load_all_textures()
+    
+    def load_texture(self, image_path):
+        """Load a single texture"""
+        if not os.path.exists(image_path):
+            logger.error(f"Texture not found: {image_path}")
+            # Create a placeholder texture
+            return self.create_placeholder_texture(), 64, 64
+        
+        try:
+            pixels = self.decode_rgba(image_path)
+            height, width = pixels.shape[:2]
+            return self.upload_texture(pixels, width, height), width, height
+        except Exception as e:
+            logger.error(f"Error loading texture '{image_path}': {e}")
+            return self.create_placeholder_texture(), 64, 64
+    
+    def cache_path(self, image_path):
+        """(cache file, cache key) for the current version of an image; the name changes with mtime and size"""
+        stat = os.stat(image_path)
+        key = hashlib.sha1(os.path.abspath(image_path).encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{key}-{stat.st_mtime_ns}-{stat.st_size}.rgba"), key
+    
+    def decode_rgba(self, image_path):
+        """(height, width, 4) uint8 pixels, memory-mapped from the cache when the source file is unchanged"""
+        path, key = self.cache_path(image_path)
+        if os.path.exists(path):
+            try:
+                raw = np.memmap(path, dtype=np.uint8, mode='r')
+                width, height = raw[:TEXTURE_CACHE_HEADER].view(np.uint32)
+                return raw[TEXTURE_CACHE_HEADER:].reshape(int(height), int(width), 4)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable texture cache {path}: {e}")
+        
+        with Image.open(image_path) as img:
+            pixels = np.asarray(img.convert("RGBA"))
+        self.write_cache(path, key, pixels)
+        return pixels
+    
+    def write_cache(self, path, key, pixels):
+        """Store decoded pixels and drop cache files left by older versions of the same image"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            for name in os.listdir(self.cache_dir):
+                if name.startswith(key + "-"):
+                    os.remove(os.path.join(self.cache_dir, name))
+            
+            height, width = pixels.shape[:2]
+            temp_path = path + ".tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(np.array([width, height], dtype=np.uint32).tobytes())
+                f.write(memoryview(np.ascontiguousarray(pixels)).cast('B'))
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write texture cache {path}: {e}")
+    
+    def upload_texture(self, pixels, width, height, max_level=None):
+        """Create a GL texture from RGBA pixels and build its mipmaps once, at load time.
+        max_level stops the mip chain early (the atlas padding only covers the first few levels)."""
+        texture_id = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, texture_id)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE, pixels)
+        
+        # The face is usually drawn smaller than the source art, so sample from mipmaps when the driver has them
+        if self.mipmaps_supported:
+            try:
+                glGenerateMipmap(GL_TEXTURE_2D)
+            except Exception as e:
+                logger.warning(f"Mipmap generation unavailable, using linear filtering: {e}")
+                self.mipmaps_supported = False
+        if self.mipmaps_supported and max_level is not None:
+            try:
+                glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, max_level)
+            except Exception as e:
+                # GL_TEXTURE_MAX_LEVEL is not in OpenGL ES 2.0: filter linearly rather than bleed across parts
+                logger.warning(f"Cannot limit mip levels, using linear filtering for this texture: {e}")
+                glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+                return texture_id
+        min_filter = GL_LINEAR_MIPMAP_LINEAR if self.mipmaps_supported else GL_LINEAR
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, min_filter)
+        return texture_id
+    
+    def create_placeholder_texture(self):
+        """Create a placeholder texture when image files are missing"""
+        # Create a simple 64x64 white texture
+        img_data = np.full((64, 64, 4), 255, dtype=np.uint8)
+        return self.upload_texture(img_data, 64, 64)
+    
+    def load_all_textures(self):
+        """Load all parts into one atlas texture (pre-baked if available), or one texture per part if it won't fit"""
+        logger.info("Loading textures...")
+        start = time.perf_counter()
+        
+        atlas = self.load_prebaked_atlas()
+        if atlas is None:
+            images = {key: self.decode_part(filename) for key, filename in TEXTURE_PARTS.items()}
+            atlas = pack_texture_atlas(images)
+        else:
+            images = None
+        pixels, rects = atlas
+        
+        atlas_height, atlas_width = pixels.shape[:2]
+        max_size = int(glGetIntegerv(GL_MAX_TEXTURE_SIZE))
+        if max(atlas_width, atlas_height) <= max_size:
+            self.atlas_texture = self.upload_texture(pixels, atlas_width, atlas_height, ATLAS_MAX_MIP_LEVEL)
+            for key, (x, y, w, h) in rects.items():
+                self.textures[key] = self.atlas_texture
+                self.texture_info[key] = (w, h)
+                self.atlas_uv[key] = (x / atlas_width, y / atlas_height, (x + w) / atlas_width, (y + h) / atlas_height)
+            logger.info(f"Packed {len(rects)} parts into a {atlas_width}x{atlas_height} atlas "
+                        f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+            return
+        
+        # Larger than the driver allows: fall back to separate textures
+        logger.warning(f"Atlas {atlas_width}x{atlas_height} exceeds GL_MAX_TEXTURE_SIZE {max_size}, "
+                       f"using one texture per part")
+        for key, filename in TEXTURE_PARTS.items():
+            if images is not None:
+                h, w = images[key].shape[:2]
+                tex_id = self.upload_texture(images[key], w, h)
+            else:
+                tex_id, w, h = self.load_texture(os.path.join(self.parts_path, filename))
+            self.textures[key] = tex_id
+            self.texture_info[key] = (w, h)
+            self.atlas_uv[key] = (0.0, 0.0, 1.0, 1.0)
+        logger.info(f"Loaded {len(self.textures)} textures in {(time.perf_counter() - start) * 1000:.0f} ms")
+    
+    def decode_part(self, filename):
+        """Pixels for one part, or a white placeholder if the file is missing or unreadable"""
+        image_path = os.path.join(self.parts_path, filename)
+        try:
+            return self.decode_rgba(image_path)
+        except Exception as e:
+            logger.error(f"Error loading texture '{image_path}': {e}")
+            return np.full((64, 64, 4), 255, dtype=np.uint8)
+    
+    def load_prebaked_atlas(self):
+        """(pixels, rects) from ATLAS_IMAGE/ATLAS_MANIFEST, or None if missing, incomplete or older than a part"""
+        image_path = os.path.join(self.parts_path, ATLAS_IMAGE)
+        manifest_path = os.path.join(self.parts_path, ATLAS_MANIFEST)
+        if not (os.path.exists(image_path) and os.path.exists(manifest_path)):
+            return None
+        
+        try:
+            with open(manifest_path, 'r') as f:
+                manifest = json.load(f)
+            parts = manifest["parts"]
+            if any(key not in parts or parts[key]["file"] != filename for key, filename in TEXTURE_PARTS.items()):
+                logger.warning("Pre-baked atlas does not match the part list, packing at load time")
+                return None
+            atlas_mtime = os.path.getmtime(image_path)
+            for filename in TEXTURE_PARTS.values():
+                part_path = os.path.join(self.parts_path, filename)
+                if os.path.exists(part_path) and os.path.getmtime(part_path) > atlas_mtime:
+                    logger.warning(f"{filename} is newer than the pre-baked atlas, packing at load time")
+                    return None
+            rects = {key: tuple(parts[key]["rect"]) for key in TEXTURE_PARTS}
+            return self.decode_rgba(image_path), rects
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not read pre-baked atlas: {e}")
+            return None
+
+class FaceRenderer:
+    """Enhanced Face Renderer with loading mode support"""
+    
+    def __init__(self, window_width, window_height, texture_manager):
+        self.window_width = window_width
+        self.window_height = window_height
+        self.texture_manager = texture_manager
+        self.update_face_dimensions()
+        
+        # Static geometry (brows) lives in a VBO rebuilt only on resize
+        self.static_vbo = None
+        self.static_parts = {}  # part -> (first vertex, vertex count)
+        self.part_bounds = {}  # part -> (center x, center y, width, height)
+        self.build_static_geometry()
+        
+        # Textured parts (face, eyes, pupils): one atlas triangle list streamed per frame
+        self.batch_vbo = glGenBuffers(1)
+        self.batch_vertices = np.zeros((6 * len(FACE_PART_TEXTURES), 4), dtype=np.float32)
+        
+        # Animation timing
+        self.last_update_time = time.time()
+        
+        # Background color state
+        self.current_bg_color = list(BG_COLOR_NORMAL)
+        self.target_bg_color = list(BG_COLOR_NORMAL)
+        
+        # Mouth mesh: cached per-phoneme shapes, cross-faded into a reused vertex buffer
+        self.mouth_shape_cache = {}
+        self.mouth_t_cache = {}
+        self.mouth_arch_cache = {}
+        self.mouth_vertices = None
+        self.mouth_source = None
+        self.mouth_target = None
+        self.mouth_switch_time = 0.0
+        
+        # Mouth GL buffers: vertices streamed per frame, indices cached per segment count
+        self.mouth_vbo = None
+        self.mouth_ebo = None
+        self.mouth_index_segments = None
+        self.mouth_index_count = 0
+    
+    def update_face_dimensions(self):
+        """Update face dimensions based on window size"""
+        self.center_x = self.window_width / 2
+        self.center_y = self.window_height / 2
+        
+        # Scale face based on window size
+        base_size = min(self.window_width, self.window_height)
+        self.face_height = base_size * 0.8
+        
+        # Get aspect ratio from base texture if available
+        if "base" in self.texture_manager.texture_info:
+            base_w, base_h = self.texture_manager.texture_info["base"]
+            aspect_ratio = base_w / base_h
+            self.face_width = self.face_height * aspect_ratio
+        else:
+            self.face_width = self.face_height * 0.8
+        
+        # Calculate component dimensions relative to face size
+        self.eye_y_offset = self.face_height * 0.08
+        self.eye_x_offset = self.face_width * 0.18
+        self.eye_size = self.face_width * 0.28
+        self.pupil_size = self.eye_size * 0.6
+        
+        # Eyebrow dimensions
+        self.brow_y_offset = self.face_height * 0.22
+        self.brow_size = self.eye_size * 1.0
+        
+        # Mouth dimensions
+        self.mouth_y_offset = self.face_height * 0.2
+        self.mouth_width = self.face_width * 0.25
+        self.mouth_height = self.face_width * 0.06
+        
+        logger.info(f"Face dimensions updated: {self.face_width}x{self.face_height}")
+    
+    def resize_window(self, new_width, new_height):
+        """Handle window resize"""
+        self.window_width = new_width
+        self.window_height = new_height
+        self.update_face_dimensions()
+        self.build_static_geometry()
+        self.mouth_shape_cache.clear()  # Shapes are in pixels
+        
+        # Update OpenGL viewport
+        glViewport(0, 0, new_width, new_height)
+        glMatrixMode(GL_PROJECTION)
+        glLoadIdentity()
+        gluOrtho2D(0, new_width, 0, new_height)
+        glMatrixMode(GL_MODELVIEW)
+    
+    def update_background_color(self, is_loading, dt):
+        """Update background color based on mode"""
+        if is_loading:
+            self.target_bg_color = list(BG_COLOR_LOADING)
+        else:
+            self.target_bg_color = list(BG_COLOR_NORMAL)
+        
+        # Smooth transition
+        for i in range(4):
+            self.current_bg_color[i] += (self.target_bg_color[i] - self.current_bg_color[i]) * min(1.0, dt * 3.0)
+        
+        glClearColor(*self.current_bg_color)
+    
+    def create_curved_eyebrow_mesh(self, cx, cy, width, height, curve_strength=0.3):
+        """Create curved eyebrow mesh"""
+        segments = 10
+        vertices = []
+        
+        for i in range(segments + 1):
+            t = i / segments
+            x = cx - width/2 + t * width
+            curve_y = math.sin(t * math.pi) * curve_strength * height
+            top_y = cy + height/2 + curve_y
+            bottom_y = cy - height/2 + curve_y * 0.3
+            vertices.extend([(x, bottom_y), (x, top_y)])
+        
+        return np.array(vertices, dtype=np.float32)
+    
+    def create_enhanced_lip_mesh(self, cx, cy, width, height, phoneme_type, is_upper=True, curve_amount=0.0, segments=32):
+        """Create enhanced lip mesh based on phoneme type for realistic speech"""
+        def cubic_bezier(p0, p1, p2, p3, t):
+            u = 1 - t
+            return (u**3)*p0 + 3*(u**2)*t*p1 + 3*u*(t**2)*p2 + (t**3)*p3
+        
+        # Phoneme-specific lip shapes
+        if phoneme_type.startswith('vowel_wide'):
+            # Wide open mouth (a, e)
+            if is_upper:
+                p0 = np.array([0.0, 0.1])
+                p1 = np.array([0.25, 0.4 + curve_amount])
+                p2 = np.array([0.75, 0.4 + curve_amount])
+                p3 = np.array([1.0, 0.1])
+            else:
+                p0 = np.array([0.0, -0.1 - curve_amount])
+                p1 = np.array([0.25, -0.5 - curve_amount])
+                p2 = np.array([0.75, -0.5 - curve_amount])
+                p3 = np.array([1.0, -0.1 - curve_amount])
+        
+        elif phoneme_type.startswith('vowel_round'):
+            # Round lips (o, u)
+            if is_upper:
+                p0 = np.array([0.0, 0.05])
+                p1 = np.array([0.25, 0.25 + curve_amount])
+                p2 = np.array([0.75, 0.25 + curve_amount])
+                p3 = np.array([1.0, 0.05])
+            else:
+                p0 = np.array([0.0, -0.05 - curve_amount])
+                p1 = np.array([0.25, -0.25 - curve_amount])
+                p2 = np.array([0.75, -0.25 - curve_amount])
+                p3 = np.array([1.0, -0.05 - curve_amount])
+        
+        elif phoneme_type.startswith('vowel_narrow'):
+            # Narrow opening (i)
+            if is_upper:
+                p0 = np.array([0.0, 0.02])
+                p1 = np.array([0.25, 0.15 + curve_amount])
+                p2 = np.array([0.75, 0.15 + curve_amount])
+                p3 = np.array([1.0, 0.02])
+            else:
+                p0 = np.array([0.0, -0.02 - curve_amount])
+                p1 = np.array([0.25, -0.15 - curve_amount])
+                p2 = np.array([0.75, -0.15 - curve_amount])
+                p3 = np.array([1.0, -0.02 - curve_amount])
+        
+        elif phoneme_type.startswith('bilabial'):
+            # Lips together (b, p, m)
+            if is_upper:
+                p0 = np.array([0.0, 0.0])
+                p1 = np.array([0.25, 0.05 + curve_amount])
+                p2 = np.array([0.75, 0.05 + curve_amount])
+                p3 = np.array([1.0, 0.0])
+            else:
+                p0 = np.array([0.0, 0.0 - curve_amount])
+                p1 = np.array([0.25, -0.05 - curve_amount])
+                p2 = np.array([0.75, -0.05 - curve_amount])
+                p3 = np.array([1.0, 0.0 - curve_amount])
+        
+        else:
+            # Default shape
+            if is_upper:
+                p0 = np.array([0.0, 0.0])
+                p1 = np.array([0.25, 0.2 + curve_amount])
+                p2 = np.array([0.75, 0.2 + curve_amount])
+                p3 = np.array([1.0, 0.0])
+            else:
+                p0 = np.array([0.0, 0.1 - curve_amount])
+                p1 = np.array([0.25, -0.2 - curve_amount])
+                p2 = np.array([0.75, -0.2 - curve_amount])
+                p3 = np.array([1.0, 0.1 - curve_amount])
+        
+        # Generate mesh
+        thickness = 0.5
+        outer, inner = [], []
+        for i in range(segments + 1):
+            t = i / segments
+            x_norm, y_norm = cubic_bezier(p0, p1, p2, p3, t)
+            x_world = cx - width/2 + x_norm * width
+            y_world = cy + y_norm * height
+            
+            dir_y = 1.0 if is_upper else -1.0
+            offset = dir_y * thickness * height
+            outer.append((x_world, y_world))
+            inner.append((x_world, y_world - offset))
+        
+        verts = []
+        for (xo, yo), (xi, yi) in zip(outer, inner):
+            verts.extend([(xo, yo), (xi, yi)])
+        return np.array(verts, dtype=np.float32)
+    
+    def build_static_geometry(self):
+        """Lay out the parts for the current window size and upload the brow meshes to a vertex buffer object.
+        Brow motion is applied per frame through the modelview matrix; textured parts go through the frame batch."""
+        eye_y = self.center_y + self.eye_y_offset
+        brow_y = self.center_y + self.brow_y_offset
+        quads = [
+            ('face', (self.center_x, self.center_y, self.face_width, self.face_height)),
+            ('l_eye_bg', (self.center_x - self.eye_x_offset, eye_y, self.eye_size, self.eye_size * 0.8)),
+            ('r_eye_bg', (self.center_x + self.eye_x_offset, eye_y, self.eye_size, self.eye_size * 0.8)),
+            ('l_pupil', (self.center_x - self.eye_x_offset, eye_y, self.pupil_size, self.pupil_size)),
+            ('r_pupil', (self.center_x + self.eye_x_offset, eye_y, self.pupil_size, self.pupil_size)),
+        ]
+        brows = [
+            ('l_brow', (self.center_x - self.eye_x_offset, brow_y, self.brow_size, self.eye_size * 0.05)),
+            ('r_brow', (self.center_x + self.eye_x_offset, brow_y, self.brow_size, self.eye_size * 0.05)),
+        ]
+        
+        chunks = []
+        first = 0
+        self.static_parts = {}
+        self.part_bounds = dict(quads)
+        for name, bounds in brows:
+            vertices = self.create_curved_eyebrow_mesh(*bounds)
+            chunks.append(np.hstack([vertices, np.zeros_like(vertices)]))
+            self.static_parts[name] = (first, len(vertices))
+            # Rotation pivot: centre of the brow's lower edge
+            self.part_bounds[name] = (float(np.mean(vertices[::2, 0])), float(np.mean(vertices[::2, 1])),
+                                      bounds[2], bounds[3])
+            first += len(vertices)
+        
+        data = np.ascontiguousarray(np.vstack(chunks), dtype=np.float32)
+        if self.static_vbo is None:
+            self.static_vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.static_vbo)
+        glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+    
+    def bind_static_geometry(self):
+        glBindBuffer(GL_ARRAY_BUFFER, self.static_vbo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+        glVertexPointer(2, GL_FLOAT, STATIC_VERTEX_STRIDE, ctypes.c_void_p(0))
+        glTexCoordPointer(2, GL_FLOAT, STATIC_VERTEX_STRIDE, ctypes.c_void_p(STATIC_TEXCOORD_OFFSET))
+    
+    def unbind_static_geometry(self):
+        glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+    
+    def build_textured_batch(self, avatar_state):
+        """Face, eye backgrounds and pupils for this frame as one (x, y, u, v) triangle list.
+        Returns (vertices, runs); runs are (texture, first vertex, count), a single run when the atlas is in use."""
+        textures = self.texture_manager.textures
+        atlas_uv = self.texture_manager.atlas_uv
+        eye_scale_y = avatar_state.eye_open_ratio
+        pupil_offset = avatar_state.pupil_pos * np.array([self.eye_size * 0.15, self.eye_size * 0.1])
+        
+        # part, scale x, scale y, offset x, offset y, hidden top fraction
+        placements = [("face", 1.0, 1.0, 0.0, 0.0, 0.0),
+                      ("l_eye_bg", 1.0, eye_scale_y, 0.0, 0.0, 0.0),
+                      ("r_eye_bg", 1.0, eye_scale_y, 0.0, 0.0, 0.0)]
+        if avatar_state.is_sleeping:
+            # Sleepy pupils sit low and are cut off from the top as the eyes close
+            crop_top = max(0.0, 1.0 - avatar_state.eye_open_ratio * 0.8)
+            pupil_offset_y = pupil_offset[1] + self.eye_size * 0.22
+            pupil_placement = (1.0, 1.0, pupil_offset[0], pupil_offset_y, crop_top)
+        else:
+            pupil_scale = avatar_state.pupil_size
+            pupil_placement = (pupil_scale, pupil_scale * eye_scale_y, pupil_offset[0], pupil_offset[1], 0.0)
+        placements += [("l_pupil",) + pupil_placement, ("r_pupil",) + pupil_placement]
+        
+        vertices = self.batch_vertices
+        runs = []
+        count = 0
+        for part, scale_x, scale_y, offset_x, offset_y, crop_top in placements:
+            key = FACE_PART_TEXTURES[part]
+            if key not in textures or crop_top >= 1.0:
+                continue
+            center_x, center_y, width, height = self.part_bounds[part]
+            x0 = center_x + offset_x - width * scale_x / 2
+            x1 = center_x + offset_x + width * scale_x / 2
+            y0 = center_y + offset_y - height * scale_y / 2
+            y1 = center_y + offset_y + height * scale_y / 2
+            u0, v0, u1, v1 = atlas_uv[key]
+            if crop_top > 0.0:
+                v0 += (v1 - v0) * crop_top
+                y1 -= height * crop_top
+            
+            vertices[count:count + 6] = ((x0, y0, u0, v1), (x1, y0, u1, v1), (x1, y1, u1, v0),
+                                         (x0, y0, u0, v1), (x1, y1, u1, v0), (x0, y1, u0, v0))
+            if runs and runs[-1][0] == textures[key]:
+                runs[-1][2] += 6
+            else:
+                runs.append([textures[key], count, 6])
+            count += 6
+        return vertices[:count], runs
+    
+    def upload_textured_batch(self, avatar_state):
+        """Stream this frame's textured parts into batch_vbo (left bound) and return the draw runs"""
+        vertices, runs = self.build_textured_batch(avatar_state)
+        glBindBuffer(GL_ARRAY_BUFFER, self.batch_vbo)
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STREAM_DRAW)
+        return runs
+    
+    def upload_panel(self, panel):
+        """Stream a (x, y, width, height) rectangle into batch_vbo as a 4-vertex fan / line loop"""
+        x, y, width, height = panel
+        corners = np.array([(x, y, 0, 0), (x + width, y, 0, 0), (x + width, y + height, 0, 0), (x, y + height, 0, 0)],
+                           dtype=np.float32)
+        glBindBuffer(GL_ARRAY_BUFFER, self.batch_vbo)
+        glBufferData(GL_ARRAY_BUFFER, corners.nbytes, corners, GL_STREAM_DRAW)
+    
+    def draw_text_panel(self, panel, fill_color, border_color, layout, text_x, text_y, text_color):
+        """Overlay box with a border and a glyph-atlas text layout whose top-left corner is (text_x, text_y)"""
+        self.upload_panel(panel)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(2, GL_FLOAT, STATIC_VERTEX_STRIDE, ctypes.c_void_p(0))
+        glColor4f(*fill_color)
+        glDrawArrays(GL_TRIANGLE_FAN, 0, 4)
+        glColor4f(*border_color)
+        glLineWidth(2.0)
+        glDrawArrays(GL_LINE_LOOP, 0, 4)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        
+        draw_layout(layout, text_x, text_y, text_color)
+    
+    def draw_curved_shape(self, vertices, color):
+        """Draw curved shape using triangle strip - FIXED: No color change during speech"""
+        glDisable(GL_TEXTURE_2D)
+        # Always use the same color, don't change during speech
+        glColor4f(*color)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(2, GL_FLOAT, 0, vertices)
+        glDrawArrays(GL_TRIANGLE_STRIP, 0, len(vertices))
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glColor4f(1.0, 1.0, 1.0, 1.0)  # Reset to white
+    
+    def create_dynamic_coordinated_mouth_mesh(self, cx, cy, base_width, base_height, phoneme_type, curve_amount=0.0, emotion_name="neutral", segments=32):
+        """Create coordinated lips with dynamic width/length based on phonemes and emotions.
+        Returns a view of a reused float32 buffer (4 vertices per segment edge), valid until the next call."""
+        phoneme_id = PHONEME_IDS.get(phoneme_type, NEUTRAL_PHONEME_ID)
+        emotion_id = EMOTION_IDS.get(emotion_name, NEUTRAL_EMOTION_ID)
+        shape = self.mouth_base_shape(phoneme_id, emotion_id, base_width, base_height, segments)
+        
+        # Cross-fade from the previous phoneme's shape instead of snapping to the new one
+        source_key, weight = self.advance_mouth_blend((phoneme_id, emotion_id, base_width, base_height, segments))
+        source = self.mouth_shape_cache.get(source_key)
+        if weight < 1.0 and source is not None and len(source[0][0]) == segments + 1:
+            source_profile, source_params, source_width = source
+            target_profile, target_params, target_width = shape
+            profile = source_profile + (target_profile - source_profile) * weight
+            params = source_params + (target_params - source_params) * weight
+            actual_width = source_width + (target_width - source_width) * weight
+        else:
+            profile, params, actual_width = shape
+        
+        x_offsets, half_opening = profile
+        half_thickness, upper_curve, upper_curve_gain, lower_curve, lower_curve_gain = params
+        upper_curve_strength = upper_curve + upper_curve_gain * curve_amount
+        lower_curve_strength = lower_curve - lower_curve_gain * curve_amount
+        arch = self.mouth_arch(segments) * base_height
+        
+        # Vertices per segment edge: upper_outer, upper_inner, lower_outer, lower_inner
+        vertices = self.mouth_vertex_buffer(segments)
+        np.add(x_offsets[:, None], cx, out=vertices[:, :, 0])
+        vertices[:, 1, 1] = cy + half_opening
+        vertices[:, 3, 1] = cy - half_opening
+        vertices[:, 0, 1] = vertices[:, 1, 1] + arch * upper_curve_strength + half_thickness
+        vertices[:, 2, 1] = vertices[:, 3, 1] - arch * lower_curve_strength - half_thickness
+        
+        return vertices.reshape(-1, 2), actual_width
+    
+    def advance_mouth_blend(self, key):
+        """Track mouth shape changes. Returns (previous shape key, weight of the current one)"""
+        now = time.time()
+        if key != self.mouth_target:
+            self.mouth_source = self.mouth_target
+            self.mouth_target = key
+            self.mouth_switch_time = now
+        return self.mouth_source, (now - self.mouth_switch_time) / MOUTH_BLEND_SECONDS
+    
+    def current_phoneme(self, avatar_state):
+        """Phoneme being spoken right now, or 'neutral'"""
+        if avatar_state.is_speaking and avatar_state.speech_phonemes:
+            elapsed = time.time() - avatar_state.speech_start_time
+            phoneme_time = 0
+            
+            for phoneme_type, duration in avatar_state.speech_phonemes:
+                if elapsed < phoneme_time + duration:
+                    return phoneme_type
+                phoneme_time += duration
+        return 'neutral'
+    
+    def mouth_dimensions(self, phoneme_id, emotion_id, base_width, base_height):
+        """(width, opening height, lip thickness, opening boost) in pixels for a phoneme/emotion pair"""
+        # Combine factors - emotion provides base, phoneme modifies it
+        total_width_factor = EMOTION_MOUTH_WIDTH[emotion_id] * PHONEME_WIDTH_FACTOR[phoneme_id]
+        dynamic_width = base_width * float(total_width_factor)
+        
+        # Ensure width doesn't go too extreme
+        actual_width = max(base_width * 0.4, min(base_width * 1.8, dynamic_width))
+        
+        opening_height = float(PHONEME_OPENING_HEIGHT[phoneme_id]) * base_height
+        lip_thickness = float(PHONEME_LIP_THICKNESS[phoneme_id]) * base_height
+        
+        # For wide emotions, make the opening extend more across the width (scaled by 1 at center, 0 at edges)
+        width_stretch = (actual_width / base_width)
+        opening_boost = (width_stretch - 1.0) * 0.3 * opening_height if width_stretch > 1.0 else 0.0
+        return actual_width, opening_height, lip_thickness, opening_boost
+    
+    def mouth_t(self, segments):
+        t = self.mouth_t_cache.get(segments)
+        if t is None:
+            t = np.linspace(0.0, 1.0, segments + 1)
+            self.mouth_t_cache[segments] = t
+        return t
+    
+    def mouth_arch(self, segments):
+        """sin(pi * t) along the mouth, shared by the lip curves"""
+        arch = self.mouth_arch_cache.get(segments)
+        if arch is None:
+            arch = np.sin(self.mouth_t(segments) * math.pi)
+            self.mouth_arch_cache[segments] = arch
+        return arch
+    
+    def mouth_vertex_buffer(self, segments):
+        if self.mouth_vertices is None or len(self.mouth_vertices) != segments + 1:
+            self.mouth_vertices = np.zeros((segments + 1, 4, 2), dtype=np.float32)
+        return self.mouth_vertices
+    
+    def mouth_base_shape(self, phoneme_id, emotion_id, base_width, base_height, segments):
+        """Cached (profile, params, width) for a phoneme/emotion pair; only curve_amount varies per frame"""
+        key = (phoneme_id, emotion_id, base_width, base_height, segments)
+        shape = self.mouth_shape_cache.get(key)
+        if shape is None:
+            shape = self.build_mouth_base_shape(phoneme_id, emotion_id, base_width, base_height, segments)
+            self.mouth_shape_cache[key] = shape
+        return shape
+    
+    def build_mouth_base_shape(self, phoneme_id, emotion_id, base_width, base_height, segments):
+        """Mouth contour for a phoneme/emotion pair, evaluated over all segments at once"""
+        actual_width, opening_height, lip_thickness, opening_boost = self.mouth_dimensions(
+            phoneme_id, emotion_id, base_width, base_height)
+        roundness = PHONEME_ROUNDNESS[phoneme_id]
+        opening_kind = PHONEME_OPENING_KIND[phoneme_id]
+        
+        # Emotion-based curve adjustments (applied to the curve_amount term as well)
+        upper_gain = EMOTION_UPPER_CURVE_GAIN[emotion_id]
+        lower_gain = EMOTION_LOWER_CURVE_GAIN[emotion_id]
+        
+        t = self.mouth_t(segments)
+        distance_from_center = np.abs(t - 0.5) * 2  # 0 at center, 1 at edges
+        
+        # Calculate opening shape based on roundness
+        if opening_kind == OPENING_ROUND:  # Round shapes (o, u, w)
+            # Elliptical opening with proper roundness
+            opening_x_factor = np.sqrt(np.maximum(0.0, 1 - distance_from_center ** (2.5 - roundness)))
+            opening_y_offset = self.mouth_arch(segments) * opening_height/2 * opening_x_factor
+        elif opening_kind == OPENING_WIDE:  # Wide shapes (a, e)
+            opening_y_offset = (1.0 - distance_from_center) * opening_height/2
+        elif opening_kind == OPENING_NARROW:  # Narrow shapes (i)
+            opening_y_offset = np.maximum(0.0, 1.0 - 8 * (t - 0.5) ** 2) * opening_height/2
+        else:  # Other consonants
+            opening_y_offset = np.maximum(0.0, 1.0 - 4 * (t - 0.5) ** 2) * opening_height/2
+        
+        # Apply emotional width stretching to the opening
+        opening_y_offset = opening_y_offset + opening_boost * (1.0 - distance_from_center)
+        
+        profile = np.array([t * actual_width - actual_width/2, opening_y_offset/2], dtype=np.float32)
+        params = np.array([
+            lip_thickness/2,
+            PHONEME_UPPER_CURVE[phoneme_id] * upper_gain, 0.4 * upper_gain,
+            PHONEME_LOWER_CURVE[phoneme_id] * lower_gain, 0.4 * lower_gain,
+        ], dtype=np.float32)
+        return profile, params, actual_width
+
+    def draw_dynamic_coordinated_mouth(self, vertices, color):
+        """Draw the coordinated mouth with proper topology for realistic lips.
+        Both lips are one indexed triangle list (GLES has no GL_QUADS)."""
+        glDisable(GL_TEXTURE_2D)
+        glColor4f(*color)
+        
+        if self.mouth_vbo is None:
+            self.mouth_vbo = glGenBuffers(1)
+            self.mouth_ebo = glGenBuffers(1)
+        
+        # Vertices change every frame: re-specify the whole buffer (lets the driver orphan the old one)
+        glBindBuffer(GL_ARRAY_BUFFER, self.mouth_vbo)
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STREAM_DRAW)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(2, GL_FLOAT, 0, ctypes.c_void_p(0))
+        
+        segments = len(vertices) // 4 - 1  # Number of segments
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.mouth_ebo)
+        index_count = self.update_mouth_indices(segments)
+        if index_count:
+            glDrawElements(GL_TRIANGLES, index_count, GL_UNSIGNED_SHORT, ctypes.c_void_p(0))
+        
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glColor4f(1.0, 1.0, 1.0, 1.0)  # Reset to white
+    
+    def update_mouth_indices(self, segments):
+        """Fill the bound element buffer for this segment count (only when it changes); returns the index count.
+        Each segment edge has 4 vertices: upper outer, upper inner, lower outer, lower inner."""
+        if segments != self.mouth_index_segments:
+            base = np.arange(segments, dtype=np.uint16)[:, None] * 4
+            # Quad current_outer, current_inner, next_inner, next_outer as two triangles
+            upper = base + np.array([0, 1, 5, 0, 5, 4], dtype=np.uint16)
+            # Quad current_inner, current_outer, next_outer, next_inner
+            lower = base + np.array([3, 2, 6, 3, 6, 7], dtype=np.uint16)
+            indices = np.ascontiguousarray(np.concatenate([upper.ravel(), lower.ravel()]))
+            glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+            self.mouth_index_segments = segments
+            self.mouth_index_count = len(indices)
+        return self.mouth_index_count
+    
+    def render_face(self, avatar_state):
+        """Render the complete face with loading mode support"""
+        # Update background color
+        dt = time.time() - self.last_update_time
+        self.update_background_color(avatar_state.is_loading, dt)
+        self.last_update_time = time.time()
+        
+        glClear(GL_COLOR_BUFFER_BIT)
+        glLoadIdentity()
+        
+        # 1-3. Base face, blinking eye backgrounds and pupils: one atlas bind, one draw
+        runs = self.upload_textured_batch(avatar_state)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+        glVertexPointer(2, GL_FLOAT, STATIC_VERTEX_STRIDE, ctypes.c_void_p(0))
+        glTexCoordPointer(2, GL_FLOAT, STATIC_VERTEX_STRIDE, ctypes.c_void_p(STATIC_TEXCOORD_OFFSET))
+        glEnable(GL_TEXTURE_2D)
+        for texture_id, first, count in runs:
+            glBindTexture(GL_TEXTURE_2D, texture_id)
+            glDrawArrays(GL_TRIANGLES, first, count)
+        glDisable(GL_TEXTURE_2D)
+        
+        # Brow meshes come from the VBO built for the current window size
+        self.bind_static_geometry()
+        
+        # 4. Curved Eyebrows (keep same color always)
+        y_offset = avatar_state.eyebrow_y * self.face_height
+        rotation = avatar_state.eyebrow_r
+        
+        glDisable(GL_TEXTURE_2D)
+        glColor4f(*LIP_EYEBROW_COLOR_GL)
+        for part, rot_dir in (("l_brow", 1), ("r_brow", -1)):
+            first, count = self.static_parts[part]
+            center_x, center_y = self.part_bounds[part][:2]
+            
+            # Raise by y_offset, rotate about the raised brow centre, then raise once more
+            # (same placement as the previous per-frame mesh offset)
+            glPushMatrix()
+            glTranslatef(center_x, center_y + y_offset, 0)
+            glRotatef(rotation * rot_dir, 0, 0, 1)
+            glTranslatef(-center_x, -center_y + y_offset, 0)
+            glDrawArrays(GL_TRIANGLE_STRIP, first, count)
+            glPopMatrix()
+        glColor4f(1.0, 1.0, 1.0, 1.0)  # Reset to white
+        
+        self.unbind_static_geometry()
+        
+        # 5. Enhanced Dynamic Coordinated Lip Rendering (NEW VERSION)
+        curve_amount = avatar_state.mouth_curve
+        current_phoneme = self.current_phoneme(avatar_state)
+        
+        # Create dynamic coordinated mouth mesh with emotion-based width
+        mouth_vertices, actual_mouth_width = self.create_dynamic_coordinated_mouth_mesh(
+            self.center_x, 
+            self.center_y - self.mouth_y_offset, 
+            self.mouth_width, 
+            self.mouth_height, 
+            current_phoneme,
+            curve_amount=curve_amount,
+            emotion_name=avatar_state.target_emotion
+        )
+        
+        # Draw coordinated mouth
+        self.draw_dynamic_coordinated_mouth(mouth_vertices, LIP_EYEBROW_COLOR_GL)
+
+
+# GLSL ES 2.0 face shaders. Parts share one program: a per-part pivot, offset and 2x2 transform
+# (brow rotation); the textured atlas batch is drawn with the identity transform.
+PART_VERTEX_SHADER = """
+#version 100
+attribute vec2 a_position;
+attribute vec2 a_uv;
+uniform vec2 u_viewport;
+uniform vec2 u_pivot;
+uniform vec2 u_offset;
+uniform mat2 u_transform;
+varying vec2 v_uv;
+
+void main() {
+    vec2 world = u_pivot + u_offset + u_transform * (a_position - u_pivot);
+    gl_Position = vec4(world / u_viewport * 2.0 - 1.0, 0.0, 1.0);
+    v_uv = a_uv;
+}
+"""
+
+PART_FRAGMENT_SHADER = """
+#version 100
+precision mediump float;
+uniform sampler2D u_texture;
+uniform vec4 u_color;
+uniform float u_textured;
+varying vec2 v_uv;
+
+void main() {
+    gl_FragColor = mix(u_color, texture2D(u_texture, v_uv) * u_color, u_textured);
+}
+"""
+
+# The mouth mesh only carries (t, contour row); the lip curve is evaluated here from two
+# parameter sets (previous and current phoneme) so cross-fading costs nothing on the CPU.
+MOUTH_VERTEX_SHADER = """
+#version 100
+const float PI = 3.14159265;
+attribute vec2 a_mouth;  // t along the mouth, row: 0 upper outer, 1 upper inner, 2 lower outer, 3 lower inner
+uniform vec2 u_viewport;
+uniform vec2 u_center;
+uniform float u_height;
+uniform vec4 u_shape_from;  // width, opening height, opening kind, roundness
+uniform vec4 u_lips_from;   // half thickness, upper curve, lower curve, opening boost
+uniform vec4 u_shape_to;
+uniform vec4 u_lips_to;
+uniform float u_blend;
+
+float opening(vec4 shape, float t) {
+    float d = abs(t - 0.5) * 2.0;
+    float half_height = shape.y * 0.5;
+    if (shape.z < 0.5) {
+        return sin(t * PI) * half_height * sqrt(max(0.0, 1.0 - pow(d, 2.5 - shape.w)));
+    } else if (shape.z < 1.5) {
+        return (1.0 - d) * half_height;
+    } else if (shape.z < 2.5) {
+        return max(0.0, 1.0 - 8.0 * (t - 0.5) * (t - 0.5)) * half_height;
+    }
+    return max(0.0, 1.0 - 4.0 * (t - 0.5) * (t - 0.5)) * half_height;
+}
+
+vec2 contour(vec4 shape, vec4 lips, float t, float row) {
+    float half_opening = (opening(shape, t) + lips.w * (1.0 - abs(t - 0.5) * 2.0)) * 0.5;
+    float arch = sin(t * PI) * u_height;
+    float y = row < 1.5 ? half_opening : -half_opening;
+    if (row < 0.5) {
+        y += arch * lips.y + lips.x;
+    } else if (row > 1.5 && row < 2.5) {
+        y -= arch * lips.z + lips.x;
+    }
+    return vec2((t - 0.5) * shape.x, y);
+}
+
+void main() {
+    vec2 from = contour(u_shape_from, u_lips_from, a_mouth.x, a_mouth.y);
+    vec2 to = contour(u_shape_to, u_lips_to, a_mouth.x, a_mouth.y);
+    vec2 world = u_center + mix(from, to, u_blend);
+    gl_Position = vec4(world / u_viewport * 2.0 - 1.0, 0.0, 1.0);
+}
+"""
+
+MOUTH_FRAGMENT_SHADER = """
+#version 100
+precision mediump float;
+uniform vec4 u_color;
+
+void main() {
+    gl_FragColor = u_color;
+}
+"""
+
+def compile_shader_program(vertex_source, fragment_source, attributes):
+    """Compile and link a program, binding attribute names to locations in order. Raises RuntimeError"""
+    shaders = []
+    for shader_type, source in ((GL_VERTEX_SHADER, vertex_source), (GL_FRAGMENT_SHADER, fragment_source)):
+        shader = glCreateShader(shader_type)
+        glShaderSource(shader, source.strip())
+        glCompileShader(shader)
+        if not glGetShaderiv(shader, GL_COMPILE_STATUS):
+            log = glGetShaderInfoLog(shader)
+            glDeleteShader(shader)
+            raise RuntimeError(f"Shader compile failed: {log}")
+        shaders.append(shader)
+    
+    program = glCreateProgram()
+    for shader in shaders:
+        glAttachShader(program, shader)
+    for location, name in enumerate(attributes):
+        glBindAttribLocation(program, location, name)
+    glLinkProgram(program)
+    for shader in shaders:
+        glDeleteShader(shader)
+    if not glGetProgramiv(program, GL_LINK_STATUS):
+        raise RuntimeError(f"Shader link failed: {glGetProgramInfoLog(program)}")
+    return program
+
+class ShaderFaceRenderer(FaceRenderer):
+    """Face renderer for GLSL ES 2.0 (Raspberry Pi KMS): no fixed-function state, matrix stack or GL_QUADS.
+    Textured parts are one atlas batch, brow motion is uniforms over the static VBO and the mouth curve is
+    computed in the vertex shader."""
+    
+    MOUTH_SEGMENTS = 32
+    
+    def __init__(self, window_width, window_height, texture_manager):
+        super().__init__(window_width, window_height, texture_manager)
+        self.part_program = compile_shader_program(PART_VERTEX_SHADER, PART_FRAGMENT_SHADER, ["a_position", "a_uv"])
+        self.mouth_program = compile_shader_program(MOUTH_VERTEX_SHADER, MOUTH_FRAGMENT_SHADER, ["a_mouth"])
+        self.part_uniforms = self.uniform_locations(self.part_program, [
+            "u_viewport", "u_pivot", "u_offset", "u_transform", "u_texture", "u_color", "u_textured"])
+        self.mouth_uniforms = self.uniform_locations(self.mouth_program, [
+            "u_viewport", "u_center", "u_height", "u_shape_from", "u_lips_from", "u_shape_to", "u_lips_to",
+            "u_blend", "u_color"])
+        self.build_mouth_mesh(self.MOUTH_SEGMENTS)
+        logger.info("GLES2 shader face renderer initialized")
+    
+    @staticmethod
+    def uniform_locations(program, names):
+        return {name: glGetUniformLocation(program, name) for name in names}
+    
+    def build_mouth_mesh(self, segments):
+        """Static (t, row) mesh for the mouth; indices come from the shared element buffer"""
+        t = np.repeat(self.mouth_t(segments), 4)
+        rows = np.tile(np.arange(4), segments + 1)
+        data = np.ascontiguousarray(np.column_stack([t, rows]), dtype=np.float32)
+        
+        self.mouth_vbo = glGenBuffers(1)
+        self.mouth_ebo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.mouth_vbo)
+        glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.mouth_ebo)
+        self.update_mouth_indices(segments)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+    
+    def resize_window(self, new_width, new_height):
+        """Handle window resize (projection is the u_viewport uniform, no matrix stack)"""
+        self.window_width = new_width
+        self.window_height = new_height
+        self.update_face_dimensions()
+        self.build_static_geometry()
+        glViewport(0, 0, new_width, new_height)
+    
+    def draw_part(self, part, texture_id=None, color=(1.0, 1.0, 1.0, 1.0), scale=(1.0, 1.0), offset=(0.0, 0.0),
+                  rotation=0.0, inner_offset=(0.0, 0.0), mode=GL_TRIANGLE_FAN):
+        """Draw one static part: scale and rotate (degrees) about its pivot, shifted by inner_offset
+        before rotation and offset after it"""
+        first, count = self.static_parts[part]
+        pivot_x, pivot_y = self.part_bounds[part][:2]
+        cos_r, sin_r = math.cos(math.radians(rotation)), math.sin(math.radians(rotation))
+        scale_x, scale_y = scale
+        
+        uniforms = self.part_uniforms
+        glUniform2f(uniforms["u_pivot"], pivot_x, pivot_y)
+        glUniform2f(uniforms["u_offset"],
+                    offset[0] + cos_r * inner_offset[0] - sin_r * inner_offset[1],
+                    offset[1] + sin_r * inner_offset[0] + cos_r * inner_offset[1])
+        # Column-major rotation * scale
+        glUniformMatrix2fv(uniforms["u_transform"], 1, GL_FALSE,
+                           np.array([cos_r * scale_x, sin_r * scale_x, -sin_r * scale_y, cos_r * scale_y], dtype=np.float32))
+        glUniform4f(uniforms["u_color"], *color)
+        glUniform1f(uniforms["u_textured"], 1.0 if texture_id is not None else 0.0)
+        if texture_id is not None:
+            glBindTexture(GL_TEXTURE_2D, texture_id)
+        glDrawArrays(mode, first, count)
+    
+    def render_face(self, avatar_state):
+        """Render the complete face with loading mode support"""
+        # Update background color
+        dt = time.time() - self.last_update_time
+        self.update_background_color(avatar_state.is_loading, dt)
+        self.last_update_time = time.time()
+        
+        glClear(GL_COLOR_BUFFER_BIT)
+        
+        uniforms = self.part_uniforms
+        glUseProgram(self.part_program)
+        glUniform2f(uniforms["u_viewport"], self.window_width, self.window_height)
+        glUniform1i(uniforms["u_texture"], 0)
+        glActiveTexture(GL_TEXTURE0)
+        glEnableVertexAttribArray(0)
+        glEnableVertexAttribArray(1)
+        
+        # 1-3. Base face, blinking eye backgrounds and pupils: pre-transformed, one atlas bind, one draw
+        runs = self.upload_textured_batch(avatar_state)
+        glVertexAttribPointer(0, 2, GL_FLOAT, GL_FALSE, STATIC_VERTEX_STRIDE, ctypes.c_void_p(0))
+        glVertexAttribPointer(1, 2, GL_FLOAT, GL_FALSE, STATIC_VERTEX_STRIDE, ctypes.c_void_p(STATIC_TEXCOORD_OFFSET))
+        glUniform2f(uniforms["u_pivot"], 0.0, 0.0)
+        glUniform2f(uniforms["u_offset"], 0.0, 0.0)
+        glUniformMatrix2fv(uniforms["u_transform"], 1, GL_FALSE, np.array([1.0, 0.0, 0.0, 1.0], dtype=np.float32))
+        glUniform4f(uniforms["u_color"], 1.0, 1.0, 1.0, 1.0)
+        glUniform1f(uniforms["u_textured"], 1.0)
+        for texture_id, first, count in runs:
+            glBindTexture(GL_TEXTURE_2D, texture_id)
+            glDrawArrays(GL_TRIANGLES, first, count)
+        
+        glBindBuffer(GL_ARRAY_BUFFER, self.static_vbo)
+        glVertexAttribPointer(0, 2, GL_FLOAT, GL_FALSE, STATIC_VERTEX_STRIDE, ctypes.c_void_p(0))
+        glVertexAttribPointer(1, 2, GL_FLOAT, GL_FALSE, STATIC_VERTEX_STRIDE, ctypes.c_void_p(STATIC_TEXCOORD_OFFSET))
+        
+        # 4. Curved Eyebrows: raised, rotated about the raised centre, raised once more
+        y_offset = avatar_state.eyebrow_y * self.face_height
+        for part, rot_dir in (("l_brow", 1), ("r_brow", -1)):
+            self.draw_part(part, color=LIP_EYEBROW_COLOR_GL, offset=(0.0, y_offset), rotation=avatar_state.eyebrow_r * rot_dir,
+                           inner_offset=(0.0, y_offset), mode=GL_TRIANGLE_STRIP)
+        
+        glDisableVertexAttribArray(1)
+        
+        # 5. Mouth: two parameter vectors, curve evaluated on the GPU
+        phoneme_id = PHONEME_IDS.get(self.current_phoneme(avatar_state), NEUTRAL_PHONEME_ID)
+        emotion_id = EMOTION_IDS.get(avatar_state.target_emotion, NEUTRAL_EMOTION_ID)
+        source_key, weight = self.advance_mouth_blend((phoneme_id, emotion_id))
+        shape_to, lips_to = self.mouth_parameters(phoneme_id, emotion_id, avatar_state.mouth_curve)
+        if source_key is not None and weight < 1.0:
+            shape_from, lips_from = self.mouth_parameters(*source_key, avatar_state.mouth_curve)
+        else:
+            shape_from, lips_from, weight = shape_to, lips_to, 1.0
+        
+        uniforms = self.mouth_uniforms
+        glUseProgram(self.mouth_program)
+        glUniform2f(uniforms["u_viewport"], self.window_width, self.window_height)
+        glUniform2f(uniforms["u_center"], self.center_x, self.center_y - self.mouth_y_offset)
+        glUniform1f(uniforms["u_height"], self.mouth_height)
+        glUniform4f(uniforms["u_shape_from"], *shape_from)
+        glUniform4f(uniforms["u_lips_from"], *lips_from)
+        glUniform4f(uniforms["u_shape_to"], *shape_to)
+        glUniform4f(uniforms["u_lips_to"], *lips_to)
+        glUniform1f(uniforms["u_blend"], weight)
+        glUniform4f(uniforms["u_color"], *LIP_EYEBROW_COLOR_GL)
+        
+        glBindBuffer(GL_ARRAY_BUFFER, self.mouth_vbo)
+        glVertexAttribPointer(0, 2, GL_FLOAT, GL_FALSE, 0, ctypes.c_void_p(0))
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.mouth_ebo)
+        glDrawElements(GL_TRIANGLES, self.mouth_index_count, GL_UNSIGNED_SHORT, ctypes.c_void_p(0))
+        
+        glDisableVertexAttribArray(0)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glUseProgram(0)
+    
+    def draw_text_panel(self, panel, fill_color, border_color, layout, text_x, text_y, text_color):
+        """Overlay box and text through the part program: untextured panel, then the layout VBO offset into place"""
+        uniforms = self.part_uniforms
+        glUseProgram(self.part_program)
+        glUniform2f(uniforms["u_viewport"], self.window_width, self.window_height)
+        glUniform1i(uniforms["u_texture"], 0)
+        glUniform2f(uniforms["u_pivot"], 0.0, 0.0)
+        glUniform2f(uniforms["u_offset"], 0.0, 0.0)
+        glUniformMatrix2fv(uniforms["u_transform"], 1, GL_FALSE, np.array([1.0, 0.0, 0.0, 1.0], dtype=np.float32))
+        glEnableVertexAttribArray(0)
+        
+        self.upload_panel(panel)
+        glVertexAttribPointer(0, 2, GL_FLOAT, GL_FALSE, STATIC_VERTEX_STRIDE, ctypes.c_void_p(0))
+        glUniform1f(uniforms["u_textured"], 0.0)
+        glUniform4f(uniforms["u_color"], *fill_color)
+        glDrawArrays(GL_TRIANGLE_FAN, 0, 4)
+        glUniform4f(uniforms["u_color"], *border_color)
+        glLineWidth(2.0)
+        glDrawArrays(GL_LINE_LOOP, 0, 4)
+        
+        if layout.vertex_count:
+            glEnableVertexAttribArray(1)
+            glBindBuffer(GL_ARRAY_BUFFER, layout.vbo)
+            glVertexAttribPointer(0, 2, GL_FLOAT, GL_FALSE, STATIC_VERTEX_STRIDE, ctypes.c_void_p(0))
+            glVertexAttribPointer(1, 2, GL_FLOAT, GL_FALSE, STATIC_VERTEX_STRIDE, ctypes.c_void_p(STATIC_TEXCOORD_OFFSET))
+            glUniform2f(uniforms["u_offset"], text_x, text_y)
+            glUniform1f(uniforms["u_textured"], 1.0)
+            glUniform4f(uniforms["u_color"], *text_color)
+            glActiveTexture(GL_TEXTURE0)
+            glBindTexture(GL_TEXTURE_2D, layout.texture)
+            glDrawArrays(GL_TRIANGLES, 0, layout.vertex_count)
+            glDisableVertexAttribArray(1)
+        
+        glDisableVertexAttribArray(0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glUseProgram(0)
+    
+    def mouth_parameters(self, phoneme_id, emotion_id, curve_amount):
+        """Shader parameter vectors (shape, lips) for one phoneme/emotion pair"""
+        width, opening_height, lip_thickness, opening_boost = self.mouth_dimensions(
+            phoneme_id, emotion_id, self.mouth_width, self.mouth_height)
+        upper_curve = (PHONEME_UPPER_CURVE[phoneme_id] + curve_amount * 0.4) * EMOTION_UPPER_CURVE_GAIN[emotion_id]
+        lower_curve = (PHONEME_LOWER_CURVE[phoneme_id] - curve_amount * 0.4) * EMOTION_LOWER_CURVE_GAIN[emotion_id]
+        shape = (width, opening_height, float(PHONEME_OPENING_KIND[phoneme_id]), float(PHONEME_ROUNDNESS[phoneme_id]))
+        lips = (lip_thickness / 2, float(upper_curve), float(lower_curve), opening_boost)
+        return shape, lips
+
+
+class FaceAnimator:
+    """Expression, loading and lip sync animation of self.avatar_state, advanced once per frame.
+    Mixed into the face systems, which provide avatar_state, is_loading and loading_message."""
+    
+    def start_loading_mode(self, message="Connecting to server..."):
+        """Start loading mode with funny expressions"""
+        self.is_loading = True
+        self.loading_message = message
+        self.avatar_state.is_loading = True
+        self.avatar_state.loading_start_time = time.time()
+        self.avatar_state.loading_expression_index = 0
+        self.avatar_state.next_loading_change = time.time() + 0.8
+        
+        # Set initial loading expression
+        self.set_expression(LOADING_EXPRESSIONS[0])
+        logger.info(f"Loading mode started: {message}")
+    
+    def stop_loading_mode(self):
+        """Stop loading mode"""
+        self.is_loading = False
+        self.avatar_state.is_loading = False
+        logger.info("Loading mode stopped")
+    
+    def update_loading_expressions(self):
+        """Update loading expressions continuously"""
+        if not self.avatar_state.is_loading:
+            return
+        
+        current_time = time.time()
+        if current_time > self.avatar_state.next_loading_change:
+            # Cycle through loading expressions
+            self.avatar_state.loading_expression_index = (self.avatar_state.loading_expression_index + 1) % len(LOADING_EXPRESSIONS)
+            next_expression = LOADING_EXPRESSIONS[self.avatar_state.loading_expression_index]
+            self.set_expression(next_expression)
+            
+            # Random timing for more natural feel
+            self.avatar_state.next_loading_change = current_time + random.uniform(0.6, 1.2)
+            
+            logger.info(f"Loading expression changed to: {next_expression}")
+    
+    def set_expression(self, emotion_name):
+        """Set facial expression"""
+        if emotion_name in EMOTIONS:
+            self.avatar_state.target_emotion = emotion_name
+            logger.info(f"Expression set to: {emotion_name}")
+        else:
+            logger.warning(f"Unknown emotion: {emotion_name}")
+    
+    def update_animations(self, dt):
+        """Update all animations with loading mode support"""
+        current_time = time.time()
+        speed = dt * self.avatar_state.emotion_transition_speed
+        
+        # Update loading expressions
+        self.update_loading_expressions()
+        
+        # Get current emotion parameters
+        emotion = EMOTIONS[self.avatar_state.target_emotion]
+        
+        # Update emotion targets
+        self.avatar_state.target_eyebrow_y = emotion["eyebrow_y"]
+        self.avatar_state.target_eyebrow_r = emotion["eyebrow_r"]
+        self.avatar_state.target_mouth_curve = emotion["mouth_c"]
+        self.avatar_state.target_eye_open_ratio = emotion["eye_o"]
+        self.avatar_state.target_pupil_size = emotion["pupil_s"]
+        self.avatar_state.eye_movement_range = emotion["eye_move_range"]
+        
+        # Smooth transitions
+        self.avatar_state.eyebrow_y += (self.avatar_state.target_eyebrow_y - self.avatar_state.eyebrow_y) * speed
+        self.avatar_state.eyebrow_r += (self.avatar_state.target_eyebrow_r - self.avatar_state.eyebrow_r) * speed
+        self.avatar_state.mouth_curve += (self.avatar_state.target_mouth_curve - self.avatar_state.mouth_curve) * speed
+        self.avatar_state.pupil_size += (self.avatar_state.target_pupil_size - self.avatar_state.pupil_size) * speed
+        
+        # Eye movement control
+        self.avatar_state.eye_movement_enabled = not emotion.get("eye_steady", False)
+        self.avatar_state.is_sleeping = (self.avatar_state.target_emotion == "sleepy")
+        
+        # Enhanced pupil movement for loading mode
+        if self.avatar_state.is_loading:
+            # Crazy eye movement during loading
+            loading_time = current_time - self.avatar_state.loading_start_time
+            self.avatar_state.target_pupil_pos = np.array([
+                math.sin(loading_time * 3) * 0.8,
+                math.cos(loading_time * 2.5) * 0.6
+            ])
+        elif self.avatar_state.eye_movement_enabled and current_time > self.avatar_state.next_gaze_shift_time:
+            movement_range = self.avatar_state.eye_movement_range
+            self.avatar_state.target_pupil_pos = np.array([
+                random.uniform(-movement_range, movement_range), 
+                random.uniform(-movement_range * 0.7, movement_range * 0.7)
+            ])
+            self.avatar_state.next_gaze_shift_time = current_time + random.uniform(1.5, 4.0)
+        elif not self.avatar_state.eye_movement_enabled:
+            self.avatar_state.target_pupil_pos = np.array([0.0, 0.0])
+        
+        self.avatar_state.pupil_pos += (self.avatar_state.target_pupil_pos - self.avatar_state.pupil_pos) * dt * 3.0
+        
+        # Breathing animation
+        self.avatar_state.breathing_offset = math.sin(current_time * 2) * 3
+        
+        # Sleep animation
+        if self.avatar_state.is_sleeping:
+            self.avatar_state.sleep_animation_phase += dt * 2.0
+            sleep_offset = math.sin(self.avatar_state.sleep_animation_phase) * 0.05
+            self.avatar_state.pupil_pos[1] = sleep_offset
+        
+        # Enhanced blinking system
+        if not self.avatar_state.is_blinking and current_time > self.avatar_state.next_blink_time:
+            self.avatar_state.is_blinking = True
+            self.avatar_state.blink_start_time = current_time
+            
+            if self.avatar_state.is_sleeping:
+                self.avatar_state.blink_duration = 2.0
+            elif self.avatar_state.target_emotion in ["fear", "surprise"]:
+                self.avatar_state.blink_duration = 0.08
+            else:
+                self.avatar_state.blink_duration = 0.12
+        
+        if self.avatar_state.is_blinking:
+            progress = (current_time - self.avatar_state.blink_start_time) / self.avatar_state.blink_duration
+            if progress <= 1.0:
+                if self.avatar_state.is_sleeping:
+                    self.avatar_state.eye_open_ratio = 0.3 + math.sin(progress * math.pi) * 0.1
+                else:
+                    self.avatar_state.eye_open_ratio = 1.0 - math.sin(progress * math.pi) * 0.8
+            else:
+                self.avatar_state.is_blinking = False
+                self.avatar_state.eye_open_ratio = self.avatar_state.target_eye_open_ratio
+                if self.avatar_state.is_sleeping:
+                    self.avatar_state.next_blink_time = current_time + random.uniform(0.5, 2.0)
+                else:
+                    self.avatar_state.next_blink_time = current_time + random.uniform(2, 6)
+        else:
+            self.avatar_state.eye_open_ratio += (self.avatar_state.target_eye_open_ratio - self.avatar_state.eye_open_ratio) * speed
+        
+        # Enhanced coordinated lip sync with dynamic width (UPDATED SECTION)
+        if self.avatar_state.is_speaking and self.avatar_state.speech_phonemes:
+            elapsed = current_time - self.avatar_state.speech_start_time
+            
+            phoneme_time = 0
+            current_phoneme = None
+            
+            for phoneme_type, duration in self.avatar_state.speech_phonemes:
+                if elapsed < phoneme_time + duration:
+                    current_phoneme = phoneme_type
+                    break
+                phoneme_time += duration
+            
+            # Set mouth opening ratio and width based on current phoneme
+            if current_phoneme:
+                phoneme_id = PHONEME_IDS.get(current_phoneme, NEUTRAL_PHONEME_ID)
+                self.avatar_state.mouth_open_ratio = float(PHONEME_OPEN_RATIO[phoneme_id])
+                self.avatar_state.target_mouth_width = float(PHONEME_SPEECH_WIDTH[phoneme_id])
+                
+                # Add natural variation for more realistic movement
+                variation = math.sin(elapsed * math.pi * 4) * 0.1
+                self.avatar_state.mouth_open_ratio += variation
+                self.avatar_state.mouth_open_ratio = max(0.0, min(1.0, self.avatar_state.mouth_open_ratio))
+                
+                # Add width variation for dynamic speech
+                width_variation = math.sin(elapsed * math.pi * 3) * 0.05
+                self.avatar_state.target_mouth_width += width_variation
+        else:
+            # Return to neutral position when not speaking
+            self.avatar_state.mouth_open_ratio *= max(0, 1.0 - (dt * 4.0))
+            # Return to emotion-based default width
+            emotion_id = EMOTION_IDS.get(self.avatar_state.target_emotion, NEUTRAL_EMOTION_ID)
+            self.avatar_state.target_mouth_width = float(EMOTION_REST_MOUTH_WIDTH[emotion_id])
+        
+        # Smooth width transitions
+        self.avatar_state.current_mouth_width += (
+            self.avatar_state.target_mouth_width - self.avatar_state.current_mouth_width
+        ) * dt * 8.0  # Fast width changes for responsive speech
+
+def main():
+    parser = argparse.ArgumentParser(description='Face part texture atlas tools')
+    parser.add_argument('--bake-atlas', action='store_true',
+                      help=f'Pack the face parts into {ATLAS_IMAGE} + {ATLAS_MANIFEST} and exit')
+    parser.add_argument('--parts-path', default=PARTS_PATH, help='Directory holding the face part images')
+    args = parser.parse_args()
+    
+    if not args.bake_atlas:
+        parser.error("nothing to do (use --bake-atlas)")
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    bake_texture_atlas(args.parts_path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Glyph-atlas text rendering for the OpenGL face overlays.
+Each glyph of a pygame font is rasterized once into a shared RGBA atlas texture.
+Laid-out strings are cached by (text, max width) as a vertex buffer of textured
+quads, so drawing a subtitle costs one texture bind and one draw call instead of
+a font render and texture upload per frame.
+"""
+
+import ctypes
+import logging
+from collections import OrderedDict
+
+import numpy as np
+import pygame
+from OpenGL.GL import *
+
+logger = logging.getLogger(__name__)
+
+GLYPH_ATLAS_SIZE = 512
+GLYPH_PADDING = 1  # Transparent texels between glyphs so linear filtering never picks up a neighbour
+LAYOUT_CACHE_SIZE = 32  # Laid-out strings kept (each owns a small VBO)
+PRELOAD_CHARACTERS = ''.join(chr(code) for code in range(32, 127))
+
+# Layout vertices: x, y, u, v as float32
+VERTEX_STRIDE = 4 * 4
+TEXCOORD_OFFSET = 2 * 4
+
+
+class GlyphAtlas:
+    """One font's glyphs packed into a single texture; each glyph is rasterized the first time it is used"""
+
+    def __init__(self, font, size=GLYPH_ATLAS_SIZE):
+        self.font = font
+        self.size = size
+        self.line_height = font.get_linesize()
+        self.glyphs = {}  # char -> (u0, v0, u1, v1, width, height), None if it did not fit
+        self.cursor_x = 0
+        self.cursor_y = 0
+        self.shelf_height = 0
+
+        self.texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, size, size, 0, GL_RGBA, GL_UNSIGNED_BYTE,
+                     np.zeros((size, size, 4), dtype=np.uint8))
+
+        for char in PRELOAD_CHARACTERS:
+            self.glyph(char)
+
+    def allocate(self, width, height):
+        """Top-left texel for a width x height glyph (shelf packing), or None when the atlas is full"""
+        width += GLYPH_PADDING
+        height += GLYPH_PADDING
+        if self.cursor_x + width > self.size:
+            self.cursor_x = 0
+            self.cursor_y += self.shelf_height
+            self.shelf_height = 0
+        if width > self.size or self.cursor_y + height > self.size:
+            return None
+        position = (self.cursor_x, self.cursor_y)
+        self.cursor_x += width
+        self.shelf_height = max(self.shelf_height, height)
+        return position
+
+    def glyph(self, char):
+        """Atlas entry for a character, rasterizing it on first use"""
+        if char in self.glyphs:
+            return self.glyphs[char]
+
+        # Characters outside the BMP (emoji) raise on pygame builds without UCS-4 support; they are skipped
+        surface = None
+        if ord(char) <= 0xFFFF:
+            try:
+                surface = self.font.render(char, True, (255, 255, 255))
+            except (pygame.error, UnicodeError, ValueError) as e:
+                logger.warning(f"Cannot render glyph {char!r}: {e}")
+        if surface is None:
+            self.glyphs[char] = None
+            return None
+
+        width, height = surface.get_size()
+        position = self.allocate(width, height)
+        if position is None:
+            logger.warning(f"Glyph atlas full, skipping {char!r}")
+            self.glyphs[char] = None
+            return None
+
+        x, y = position
+        if width and height:
+            glBindTexture(GL_TEXTURE_2D, self.texture)
+            glTexSubImage2D(GL_TEXTURE_2D, 0, x, y, width, height, GL_RGBA, GL_UNSIGNED_BYTE,
+                            pygame.image.tostring(surface, "RGBA", False))
+        glyph = (x / self.size, y / self.size, (x + width) / self.size, (y + height) / self.size, width, height)
+        self.glyphs[char] = glyph
+        return glyph
+
+
+class TextLayout:
+    """A laid-out string as textured quads in a VBO; origin at its top-left corner, y up"""
+
+    def __init__(self, vertices, texture, width, height, line_count):
+        self.texture = texture
+        self.width = width
+        self.height = height
+        self.line_count = line_count
+        self.vertex_count = len(vertices)
+        self.vbo = None
+        if self.vertex_count:
+            self.vbo = glGenBuffers(1)
+            glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+            glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def release(self):
+        if self.vbo is not None:
+            glDeleteBuffers(1, [self.vbo])
+            self.vbo = None
+
+
+class TextRenderer:
+    """Word-wrapped text from a glyph atlas, with an LRU cache of laid-out strings"""
+
+    def __init__(self, font, cache_size=LAYOUT_CACHE_SIZE):
+        self.atlas = GlyphAtlas(font)
+        self.cache_size = cache_size
+        self.layouts = OrderedDict()
+
+    def text_width(self, text):
+        width = 0
+        for char in text:
+            glyph = self.atlas.glyph(char)
+            if glyph is not None:
+                width += glyph[4]
+        return width
+
+    def wrap(self, text, max_width):
+        """Greedy word wrap by rendered width; a word wider than max_width gets a line of its own"""
+        space = self.text_width(" ")
+        lines = []
+        current, current_width = [], 0
+        for word in text.split():
+            word_width = self.text_width(word)
+            if current and current_width + space + word_width > max_width:
+                lines.append(" ".join(current))
+                current, current_width = [], 0
+            current_width += word_width + (space if current else 0)
+            current.append(word)
+        if current:
+            lines.append(" ".join(current))
+        return lines
+
+    def layout(self, text, max_width=None):
+        """Cached layout of text, wrapped to max_width pixels (one line if None)"""
+        key = (text, max_width)
+        layout = self.layouts.get(key)
+        if layout is not None:
+            self.layouts.move_to_end(key)
+            return layout
+
+        layout = self.build_layout(text, max_width)
+        self.layouts[key] = layout
+        if len(self.layouts) > self.cache_size:
+            _, evicted = self.layouts.popitem(last=False)
+            evicted.release()
+        return layout
+
+    def build_layout(self, text, max_width):
+        lines = self.wrap(text, max_width) if max_width else [" ".join(text.split())]
+        line_height = self.atlas.line_height
+
+        quads = []
+        width = 0
+        for index, line in enumerate(lines):
+            x = 0
+            top = -index * line_height
+            for char in line:
+                glyph = self.atlas.glyph(char)
+                if glyph is None:
+                    continue
+                u0, v0, u1, v1, glyph_width, glyph_height = glyph
+                if not char.isspace():
+                    quads.append((x, top - glyph_height, x + glyph_width, top, u0, v0, u1, v1))
+                x += glyph_width
+            width = max(width, x)
+
+        vertices = np.empty((len(quads) * 6, 4), dtype=np.float32)
+        for index, (x0, y0, x1, y1, u0, v0, u1, v1) in enumerate(quads):
+            vertices[index * 6:index * 6 + 6] = ((x0, y0, u0, v1), (x1, y0, u1, v1), (x1, y1, u1, v0),
+                                                 (x0, y0, u0, v1), (x1, y1, u1, v0), (x0, y1, u0, v0))
+        return TextLayout(vertices, self.atlas.texture, width, len(lines) * line_height, len(lines))
+
+    def draw(self, text, x, y, color=(1.0, 1.0, 1.0, 1.0), max_width=None):
+        """Fixed-function pipeline: draw text with its top-left corner at (x, y). Returns the layout"""
+        layout = self.layout(text, max_width)
+        draw_layout(layout, x, y, color)
+        return layout
+
+    def release(self):
+        for layout in self.layouts.values():
+            layout.release()
+        self.layouts.clear()
+        glDeleteTextures([self.atlas.texture])
+
+
+def draw_layout(layout, x, y, color=(1.0, 1.0, 1.0, 1.0)):
+    """Fixed-function pipeline: one bind and one draw call for a laid-out string (blending must be enabled)"""
+    if not layout.vertex_count:
+        return
+    glPushMatrix()
+    glTranslatef(x, y, 0)
+    glEnable(GL_TEXTURE_2D)
+    glBindTexture(GL_TEXTURE_2D, layout.texture)
+    glColor4f(*color)
+
+    glBindBuffer(GL_ARRAY_BUFFER, layout.vbo)
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+    glVertexPointer(2, GL_FLOAT, VERTEX_STRIDE, ctypes.c_void_p(0))
+    glTexCoordPointer(2, GL_FLOAT, VERTEX_STRIDE, ctypes.c_void_p(TEXCOORD_OFFSET))
+    glDrawArrays(GL_TRIANGLES, 0, layout.vertex_count)
+    glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+    glDisableClientState(GL_VERTEX_ARRAY)
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    glDisable(GL_TEXTURE_2D)
+    glColor4f(1.0, 1.0, 1.0, 1.0)
+    glPopMatrix()
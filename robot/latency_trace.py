@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+End-to-end conversation latency tracer.
+Each conversation turn records named spans (record, upload, server, download,
+robot_action, storage, playback, ...) with monotonic timestamps. Finished turns
+are appended to a size-rotated JSONL file; run this module to summarize them.
+
+Usage:
+    python latency_trace.py [turn_traces.jsonl]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import contextlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+TRACE_PATH = "turn_traces.jsonl"
+TRACE_MAX_BYTES = 5 * 1024 * 1024
+TRACE_BACKUPS = 3
+
+# Display order for the summary; unknown stages are listed after these
+STAGE_ORDER = ['record', 'upload', 'server', 'download', 'robot_action',
+               'storage', 'first_sound', 'playback', 'total']
+
+
+class TurnTrace:
+    """Spans for a single conversation turn, relative to the turn start.
+    Background work that outlives the turn (a robot action) holds it open: the turn is
+    written once finish_turn() has run and every hold() has been released."""
+
+    def __init__(self, turn_id):
+        self.turn_id = turn_id
+        self.wall_time = time.time()
+        self.start = time.monotonic()
+        self.end = None  # Set by finish_turn; 'total' stops here even if background spans run on
+        self.spans = []
+        self.status = "ok"
+        self.pending = 0
+        self.write = None  # Deferred writer, set when finish_turn() runs while holds are pending
+        self.written = False
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name):
+        """Time the enclosed block as a span"""
+        span_start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add_span(name, span_start, time.monotonic())
+
+    def add_span(self, name, start, end):
+        """Record a span from monotonic start/end timestamps (safe from any thread)"""
+        with self.lock:
+            if self.written:
+                logger.warning(f"Span '{name}' ({(end - start) * 1000:.0f}ms) arrived after turn {self.turn_id} was written")
+                return
+            self.spans.append({
+                'name': name,
+                'start': round(start - self.start, 4),
+                'duration': round(end - start, 4)
+            })
+
+    def hold(self):
+        """Keep the turn open for a span that a background thread will add; pair with release()"""
+        with self.lock:
+            self.pending += 1
+
+    def release(self):
+        """Background span added; writes the turn if it was finished while held"""
+        with self.lock:
+            self.pending -= 1
+            write = self.write if self.pending == 0 else None
+            self.write = None
+        if write is not None:
+            write(self)
+
+    def to_record(self):
+        with self.lock:
+            end = self.end if self.end is not None else time.monotonic()
+            return {
+                'turn': self.turn_id,
+                'wall_time': self.wall_time,
+                'status': self.status,
+                'total': round(end - self.start, 4),
+                'spans': list(self.spans)
+            }
+
+
+class LatencyTracer:
+    """Creates turn traces and appends finished ones to a rotating JSONL file"""
+
+    def __init__(self, path=TRACE_PATH, max_bytes=TRACE_MAX_BYTES, backups=TRACE_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.turn_count = 0
+        self.lock = threading.Lock()
+
+    def start_turn(self):
+        self.turn_count += 1
+        return TurnTrace(self.turn_count)
+
+    def finish_turn(self, trace, status=None):
+        """End the turn and write it, or defer the write until its held background spans are in"""
+        with trace.lock:
+            if status is not None:
+                trace.status = status
+            trace.end = time.monotonic()
+            if trace.pending:
+                trace.write = self.write_turn
+                return
+        self.write_turn(trace)
+
+    def write_turn(self, trace):
+        """Append the turn to disk; rotation happens before the file exceeds max_bytes"""
+        record = trace.to_record()
+        with trace.lock:
+            trace.written = True
+        line = json.dumps(record) + "\n"
+        with self.lock:
+            try:
+                self.rotate_if_needed(len(line))
+                with open(self.path, 'a') as f:
+                    f.write(line)
+            except OSError as e:
+                logger.warning(f"Could not write latency trace: {e}")
+
+    def rotate_if_needed(self, incoming):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) + incoming <= self.max_bytes:
+            return
+        for index in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{index}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{index + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+
+def load_traces(path, backups=TRACE_BACKUPS):
+    """Read the trace file and its rotated backups, oldest first"""
+    paths = [f"{path}.{i}" for i in range(backups, 0, -1)] + [path]
+    records = []
+    for trace_path in paths:
+        if not os.path.exists(trace_path):
+            continue
+        with open(trace_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        pass
+    return records
+
+
+def percentile(values, fraction):
+    """Linear-interpolated percentile of a non-empty list"""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def summarize(records):
+    """Per-stage duration lists (seconds); spans repeated within a turn are summed"""
+    stages = {}
+    for record in records:
+        per_turn = {}
+        for span in record.get('spans', []):
+            per_turn[span['name']] = per_turn.get(span['name'], 0.0) + span['duration']
+        per_turn['total'] = record.get('total', 0.0)
+        for name, duration in per_turn.items():
+            stages.setdefault(name, []).append(duration)
+    return stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize conversation latency traces')
+    parser.add_argument('path', nargs='?', default=TRACE_PATH, help='Trace JSONL file')
+    parser.add_argument('--status', help="Only include turns with this status (e.g. 'ok')")
+    args = parser.parse_args()
+
+    records = load_traces(args.path)
+    if args.status:
+        records = [r for r in records if r.get('status') == args.status]
+    if not records:
+        print(f"No traces found in {args.path}")
+        sys.exit(1)
+
+    stages = summarize(records)
+    names = [n for n in STAGE_ORDER if n in stages] + sorted(n for n in stages if n not in STAGE_ORDER)
+
+    print(f"{len(records)} turns")
+    print(f"{'stage':<14} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    for name in names:
+        values = stages[name]
+        print(f"{name:<14} {len(values):>6} {percentile(values, 0.5) * 1000:>9.0f} "
+              f"{percentile(values, 0.95) * 1000:>9.0f} {max(values) * 1000:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
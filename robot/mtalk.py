@@ -19,10 +19,11 @@ import random
 import sys
 import os
 import threading
+import queue
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
 import requests
-import tempfile
 import pyaudio
-import wave
 import argparse
 import logging
 import urllib.parse
@@ -30,8 +31,9 @@ import struct
 import urllib3
 import contextlib
 import re
+import hashlib
+from collections import OrderedDict, deque
 import numpy as np
-from PIL import Image
 from typing import Dict, List, Tuple, Optional, Any
 # import speech_recognition as sr
 from io import BytesIO
@@ -39,6 +41,9 @@ from vosk import Model, KaldiRecognizer
 import pyaudio
 import json
 from robot import handle_input,init_robot,Robot
+from audio_codec import UploadEncoder, choose_upload_codec, encode_pcm
+from latency_trace import LatencyTracer
+from canned_clips import CANNED_CLIPS_DIR, CANNED_REPLIES  # Render the clips with canned_clips.py
 
 # Disable SSL warnings
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -48,56 +53,294 @@ try:
     from pygame.locals import *
     from OpenGL.GL import *
     from OpenGL.GLU import *
+    import OpenGL.error
 except ImportError as e:
     print(f"Required libraries not installed: {e}")
     print("Install with: pip install pygame PyOpenGL PyOpenGL_accelerate requests pyaudio pillow numpy SpeechRecognition")
     sys.exit(1)
 
+from glyph_text import TextRenderer
+from face_render import (MOUTH_BLEND_SECONDS, BG_COLOR_NORMAL, AvatarState, TextureManager, FaceRenderer,
+                         ShaderFaceRenderer, FaceAnimator, text_to_enhanced_phonemes)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, 
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 robot = init_robot("no_movement",logger)
-# Global configuration
-PARTS_PATH = "parts/"  # Assumes a 'parts' subfolder for images
-LIP_EYEBROW_COLOR = (0, 53, 86)  # #003556 in RGB
-LIP_EYEBROW_COLOR_GL = (0/255.0, 53/255.0, 86/255.0, 1.0)  # Normalized for OpenGL
 
-# Background colors
-BG_COLOR_NORMAL = (0.1, 0.1, 0.8, 1.0)  # Blue background for normal mode
-BG_COLOR_LOADING = (0.0, 0.0, 0.0, 1.0)  # Black background for loading mode
+# Adaptive frame pacing
+FRAME_RATE_SPEAKING = 60
+FRAME_RATE_AWAKE = 30
+FRAME_RATE_SLEEPING = 4
+FRAME_MAX_IDLE_SECONDS = 1.0  # Longest sleep between updates while nothing is scheduled
+REDRAW_PIXEL_THRESHOLD = 0.5  # Skip the redraw unless something moved at least this far
+MAX_ANIMATION_STEP = 0.1  # Seconds; longer frame gaps are applied in sub-steps so the smoothing never overshoots
+FRAME_OVERRUN_SLACK = 0.1  # Wake-ups later than scheduled by more than this (stalls, suspend) are clamped
+
+# Subtitle / status overlay
+OVERLAY_FONT_SIZE = 24
+OVERLAY_TEXT_COLOR = (0.8, 0.9, 1.0)
+
+
+# Audio output format (mixer is initialized once with this)
+AUDIO_FREQUENCY = 22050
+AUDIO_CHANNELS = 2
+AUDIO_BUFFER = 512
+PLAYBACK_END_EVENT = USEREVENT + 1  # Posted by pygame when the speech channel finishes (or is stopped)
+PIPELINE_UI_EVENT = USEREVENT + 2  # Wakes the render loop when the pipeline queues a UI change
+MUSIC_END_EVENT = USEREVENT + 3  # Posted by pygame when mixer.music finishes (or is stopped)
+PLAYBACK_END_MARGIN = 5.0  # Seconds past the clip length before a playback without an end event is abandoned
+PLAYBACK_MIN_BYTES_PER_SECOND = 4000  # 32 kbit/s, the lowest reply bitrate expected; bounds the length of encoded clips
+PLAYBACK_POLL_SECONDS = 0.25  # How often a waiter checks that the mixer is still playing
+
+# Response audio hand-off between the network and playback stages
+RESPONSE_CHUNK_SIZE = 16384
+RESPONSE_QUEUE_CHUNKS = 64  # Bounded: the downloader blocks when playback falls behind
+RESPONSE_STALL_SECONDS = 30  # A full queue nobody drains for this long means playback abandoned the stream
+RESPONSE_POLL_SECONDS = 0.1
+
+# Response audio cache (content-addressed by text/language/voice/format)
+RESPONSE_CACHE_DIR = "response_cache"
+RESPONSE_CACHE_DISK_BYTES = 64 * 1024 * 1024
+RESPONSE_CACHE_MEMORY_BYTES = 8 * 1024 * 1024
+RESPONSE_CACHE_DECODED_ENTRIES = 8  # Hottest entries kept as decoded pygame Sounds
+
+# Hybrid local/remote speech handling
+SLOW_LINK_SECONDS = 6.0  # Requests slower than this mark the link degraded (next turn is text-only)
+PROCESS_TEXT_ENDPOINT = "/process_text"  # Used when /health reports 'text_input': true
+
+# Network deadlines
+TURN_RESPONSE_BUDGET = 15.0  # Seconds from end of recording to reply headers before falling back offline
+REQUEST_CONNECT_TIMEOUT = 3.0
+
+# Commands answered locally from the Vosk transcript, with no server round-trip
+LOCAL_ACTION_PHRASES = {
+    'stand_by': ['stand by', 'standby', 'stand still'],
+    'right_hand_wave': ['wave', 'wave your hand', 'say hi'],
+    'both_hands_raise': ['raise your hands', 'hands up'],
+    'walk_forward': ['walk forward', 'start walking'],
+}
+COMMAND_EXTRA_WORDS = 1  # Words allowed after a command phrase ("wave please"); nothing may precede it
+INTENT_STABLE_PARTIALS = 3  # Identical partial results needed before an action fires mid-utterance
+
+# API link supervision
+LINK_PROBE_INTERVAL = 10.0  # Seconds between /health probes while the link is up
+LINK_PROBE_JITTER = 0.3  # Each interval is randomized by +/- this fraction
+LINK_RECONNECT_INTERVAL = 2.0  # First retry delay once offline, doubled up to LINK_PROBE_INTERVAL
+LINK_PROBE_TIMEOUT = 3.0
+LINK_RTT_ALPHA = 0.3  # EWMA weight of the newest RTT sample
+LINK_DEGRADED_RTT = 1.0  # Smoothed /health RTT (seconds) above which the link counts as degraded
+LINK_OFFLINE_FAILURES = 2  # Consecutive failures before the link counts as offline
+
+# Background conversation storage
+CONVERSATION_BATCH_SIZE = 5
+CONVERSATION_FLUSH_SECONDS = 15.0
+CONVERSATION_SPOOL_PATH = "conversation_spool.jsonl"  # Records kept while the server is unreachable
+CONVERSATION_REJECTED_PATH = "conversation_rejected.jsonl"  # Records the server refused; never retried
 
 # Wake words for local detection
 WAKE_WORDS = ['wake', 'wakeup', 'wake up', 'hello', 'start', 'activate', 'robot', 'hey']
 SLEEP_WORDS = ['sleep', 'go to sleep', 'goodbye', 'stop', 'bye']
 
-# Enhanced emotion definitions with loading expressions
-EMOTIONS = {
-    "neutral": {"eyebrow_y": 0.0, "eyebrow_r": 0, "mouth_c": 0.0, "eye_o": 1.0, "pupil_s": 1.0, "eye_steady": False, "eye_move_range": 0.3},
-    "happy": {"eyebrow_y": 0.05, "eyebrow_r": -5, "mouth_c": 0.6, "eye_o": 1.0, "pupil_s": 1.0, "eye_steady": False, "eye_move_range": 0.4},
-    "sad": {"eyebrow_y": -0.03, "eyebrow_r": 15, "mouth_c": -0.7, "eye_o": 0.6, "pupil_s": 0.9, "eye_steady": False, "eye_move_range": 0.2},
-    "angry": {"eyebrow_y": -0.01, "eyebrow_r": -10, "mouth_c": -0.4, "eye_o": 0.9, "pupil_s": 1.0, "eye_steady": False, "eye_move_range": 0.5},
-    "surprise": {"eyebrow_y": 0.12, "eyebrow_r": 5, "mouth_c": 0.2, "eye_o": 1.2, "pupil_s": 0.8, "eye_steady": False, "eye_move_range": 0.6},
-    "fear": {"eyebrow_y": 0.1, "eyebrow_r": 20, "mouth_c": -0.5, "eye_o": 1.15, "pupil_s": 0.7, "eye_steady": False, "eye_move_range": 0.7},
-    "disgust": {"eyebrow_y": -0.02, "eyebrow_r": -5, "mouth_c": -0.6, "eye_o": 0.9, "pupil_s": 1.0, "eye_steady": False, "eye_move_range": 0.3},
-    "amusement": {"eyebrow_y": 0.04, "eyebrow_r": -4, "mouth_c": 0.8, "eye_o": 1.0, "pupil_s": 1.0, "eye_steady": False, "eye_move_range": 0.4},
-    "frustration": {"eyebrow_y": -0.01, "eyebrow_r": -5, "mouth_c": -0.3, "eye_o": 0.9, "pupil_s": 1.0, "eye_steady": False, "eye_move_range": 0.4},
-    "love": {"eyebrow_y": 0.03, "eyebrow_r": -6, "mouth_c": 0.5, "eye_o": 1.0, "pupil_s": 1.2, "eye_steady": False, "eye_move_range": 0.3},
-    "embarrassment": {"eyebrow_y": -0.02, "eyebrow_r": 5, "mouth_c": -0.2, "eye_o": 0.8, "pupil_s": 1.1, "eye_steady": False, "eye_move_range": 0.2},
-    "confusion": {"eyebrow_y": 0.0, "eyebrow_r": 15, "mouth_c": -0.1, "eye_o": 0.9, "pupil_s": 1.0, "eye_steady": False, "eye_move_range": 0.5},
-    "sleepy": {"eyebrow_y": -0.01, "eyebrow_r": 2, "mouth_c": 0.1, "eye_o": 0.2, "pupil_s": 0.1, "eye_steady": True, "eye_move_range": 0.1},
-    "talking": {"eyebrow_y": 0.0, "eyebrow_r": 0, "mouth_c": 0.0, "eye_o": 1.0, "pupil_s": 1.0, "eye_steady": False, "eye_move_range": 0.3},
-    "cute_neutral": {"eyebrow_y": 0.02, "eyebrow_r": -2, "mouth_c": 0.2, "eye_o": 1.1, "pupil_s": 1.0, "eye_steady": False, "eye_move_range": 0.3},
-    
-    # Loading expressions - funny and interactive
-    "loading_thinking": {"eyebrow_y": 0.08, "eyebrow_r": 10, "mouth_c": -0.2, "eye_o": 0.8, "pupil_s": 0.9, "eye_steady": False, "eye_move_range": 0.8},
-    "loading_excited": {"eyebrow_y": 0.1, "eyebrow_r": -8, "mouth_c": 0.4, "eye_o": 1.3, "pupil_s": 1.1, "eye_steady": False, "eye_move_range": 0.9},
-    "loading_curious": {"eyebrow_y": 0.06, "eyebrow_r": 12, "mouth_c": 0.1, "eye_o": 1.1, "pupil_s": 0.8, "eye_steady": False, "eye_move_range": 1.0},
-    "loading_dizzy": {"eyebrow_y": 0.0, "eyebrow_r": 5, "mouth_c": -0.1, "eye_o": 0.9, "pupil_s": 1.2, "eye_steady": False, "eye_move_range": 1.2},
-    "loading_focused": {"eyebrow_y": -0.02, "eyebrow_r": -8, "mouth_c": 0.0, "eye_o": 0.7, "pupil_s": 0.6, "eye_steady": True, "eye_move_range": 0.1},
-}
+def build_keyword_grammar(*word_lists):
+    """Build a Vosk grammar (JSON phrase list) restricted to the given keywords"""
+    phrases = []
+    for words in word_lists:
+        for word in words:
+            if word not in phrases:
+                phrases.append(word)
+    phrases.append("[unk]")  # Everything else decodes as unknown
+    return json.dumps(phrases)
+
+def compile_keyword_pattern(words):
+    """Whole-word regex for a keyword list, longest phrases first"""
+    ordered = sorted(words, key=len, reverse=True)
+    return re.compile(r'\b(' + '|'.join(re.escape(w) for w in ordered) + r')\b')
+
+WAKE_PATTERN = compile_keyword_pattern(WAKE_WORDS)
+SLEEP_PATTERN = compile_keyword_pattern(SLEEP_WORDS)
 
-LOADING_EXPRESSIONS = ["loading_thinking", "loading_excited", "loading_curious", "loading_dizzy", "loading_focused"]
+class IntentTrie:
+    """Word-level trie over action phrases, matched at the start of an utterance"""
+    
+    def __init__(self, phrases_by_action):
+        self.root = {}
+        for action, phrases in phrases_by_action.items():
+            for phrase in phrases:
+                node = self.root
+                for word in phrase.split():
+                    node = node.setdefault(word, {})
+                node[None] = action  # None marks the end of a phrase
+    
+    def match(self, words):
+        """Return (action, matched_word_count) for the longest phrase words start with, or (None, 0)"""
+        best_action, best_length = None, 0
+        node = self.root
+        for index, word in enumerate(words):
+            node = node.get(word)
+            if node is None:
+                break
+            if None in node:
+                best_action, best_length = node[None], index + 1
+        return best_action, best_length
+
+INTENT_TRIE = IntentTrie(LOCAL_ACTION_PHRASES)
+
+def command_words(text):
+    """Normalized words of a transcript"""
+    return re.sub(r'[^\w\s]', '', text.lower()).split()
+
+def strip_wake_word(words, wake_words=WAKE_WORDS):
+    """Words after the longest wake phrase they start with, or None (a pre-rolled turn begins with one)"""
+    for phrase in sorted((keyword.split() for keyword in wake_words), key=len, reverse=True):
+        if words[:len(phrase)] == phrase:
+            return words[len(phrase):]
+    return None
+
+def match_command(words, sleep_words=SLEEP_WORDS, wake_words=WAKE_WORDS):
+    """Map command words to ('sleep' | action | None, command_only).
+    command_only means the utterance is just the command: it starts with the phrase, leading wake
+    words aside, and at most COMMAND_EXTRA_WORDS words follow. Sleep only ever matches command_only,
+    so neither "what's the nearest bus stop" nor "don't start walking" is taken as a command.
+    Wake words are stripped one at a time, so "start walking" still matches before "start" goes."""
+    while words:
+        for keyword in sleep_words:
+            phrase = keyword.split()
+            if words[:len(phrase)] == phrase and len(words) - len(phrase) <= COMMAND_EXTRA_WORDS:
+                return 'sleep', True
+        action, matched = INTENT_TRIE.match(words)
+        if action is not None:
+            return action, len(words) - matched <= COMMAND_EXTRA_WORDS
+        words = strip_wake_word(words, wake_words)
+    return None, False
+
+# Serializes servo motions started by the local fast path and by server replies
+robot_action_lock = threading.Lock()
+robot_actions_stopped = threading.Event()  # Set at shutdown: actions not yet started are dropped
+
+def run_robot_action(action):
+    """Run a robot action, waiting for any motion already in progress (dropped once shutdown starts)"""
+    while not robot_action_lock.acquire(timeout=0.1):
+        if robot_actions_stopped.is_set():
+            return
+    try:
+        if robot_actions_stopped.is_set():
+            logger.info(f"Robot action '{action}' dropped at shutdown")
+            return
+        handle_input(robot, logger, action)
+    finally:
+        robot_action_lock.release()
+
+def start_robot_action(action, trace=None):
+    """Run a robot action on a daemon thread so the caller never waits on the servo lock"""
+    started_at = time.monotonic()
+    if trace is not None:
+        trace.hold()
+    
+    def worker():
+        try:
+            run_robot_action(action)
+        finally:
+            if trace is not None:
+                trace.add_span('robot_action', started_at, time.monotonic())
+                trace.release()
+    
+    thread = threading.Thread(target=worker)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+# Seconds of microphone audio kept before a recording starts (wake word + gap)
+PRE_ROLL_SECONDS = 3.0
+
+# Barge-in: the next recording starts while a reply plays and interrupts it when the user talks
+BARGE_IN_ECHO_MARGIN = 2.5  # Speech must be this many times louder than the tracked echo level
+BARGE_IN_MIN_RMS = 500  # Absolute floor so room noise never counts as speech
+BARGE_IN_SPEECH_SECONDS = 0.25  # Sustained loudness needed before playback is cancelled
+BARGE_IN_CALIBRATION_SECONDS = 0.3  # Initial playback audio used only to learn the echo level
+
+class RobotState:
+    """Conversation states driving the wake listener and conversation worker"""
+    SLEEPING = "sleeping"
+    LISTENING = "listening"
+    RECORDING = "recording"
+    PROCESSING = "processing"
+    SPEAKING = "speaking"
+
+AWAKE_STATES = (RobotState.LISTENING, RobotState.RECORDING, RobotState.PROCESSING, RobotState.SPEAKING)
+CAPTURE_STATES = (RobotState.LISTENING, RobotState.RECORDING, RobotState.SPEAKING)  # A recording may run in these
+
+class RobotStateMachine:
+    """Thread-safe state holder; listeners are called on every transition instead of polling"""
+    
+    def __init__(self, initial_state=RobotState.SLEEPING):
+        self.state = initial_state
+        self.condition = threading.Condition()
+        self.listeners = []
+    
+    def add_listener(self, callback):
+        """callback(old_state, new_state) runs on the transitioning thread after each change"""
+        self.listeners.append(callback)
+    
+    def transition(self, new_state, allowed_from=None):
+        """Move to new_state, optionally only from one of allowed_from. Returns True on success"""
+        with self.condition:
+            if allowed_from is not None and self.state not in allowed_from:
+                return False
+            old_state = self.state
+            if old_state != new_state:
+                logger.info(f"State: {old_state} -> {new_state}")
+                self.state = new_state
+            self.condition.notify_all()
+        
+        if old_state != new_state:
+            for callback in self.listeners:
+                callback(old_state, new_state)
+        return True
+
+class PreRollBuffer:
+    """Fixed-size circular buffer holding the most recent int16 microphone samples"""
+    
+    def __init__(self, seconds=PRE_ROLL_SECONDS, rate=16000):
+        self.capacity = int(seconds * rate)
+        self.samples = np.zeros(self.capacity, dtype=np.int16)
+        self.write_pos = 0
+        self.filled = 0
+        self.lock = threading.Lock()
+    
+    def write(self, data):
+        """Append raw int16 PCM bytes, overwriting the oldest samples"""
+        block = np.frombuffer(data, dtype=np.int16)
+        if len(block) > self.capacity:
+            block = block[-self.capacity:]
+        count = len(block)
+        
+        with self.lock:
+            end = self.write_pos + count
+            if end <= self.capacity:
+                self.samples[self.write_pos:end] = block
+            else:
+                first = self.capacity - self.write_pos
+                self.samples[self.write_pos:] = block[:first]
+                self.samples[:count - first] = block[first:]
+            self.write_pos = end % self.capacity
+            self.filled = min(self.capacity, self.filled + count)
+    
+    def snapshot(self):
+        """Return buffered audio as PCM bytes in chronological order"""
+        with self.lock:
+            if self.filled < self.capacity:
+                data = self.samples[:self.filled].copy()
+            else:
+                data = np.concatenate((self.samples[self.write_pos:], self.samples[:self.write_pos]))
+        return data.tobytes()
+    
+    def clear(self):
+        """Drop all buffered audio"""
+        with self.lock:
+            self.write_pos = 0
+            self.filled = 0
 
 class LocalVoiceDetector:
     """Local voice detection for wake commands without server dependency (Offline using Vosk)"""
@@ -105,61 +348,629 @@ class LocalVoiceDetector:
     def __init__(self, model_path="model", rate=16000):
         self.model = Model(model_path)
         self.rate = rate
-        self.recognizer = KaldiRecognizer(self.model, self.rate)
+        self.block_size = 4096
+        # Keyword-only grammar: much cheaper to decode than the full language model
+        self.grammar = build_keyword_grammar(WAKE_WORDS, SLEEP_WORDS)
+        self.recognizer = KaldiRecognizer(self.model, self.rate, self.grammar)
+        
+        # Per-block decode timing
+        self.decode_blocks = 0
+        self.decode_total = 0.0
+        self.decode_max = 0.0
+        self.decode_report_interval = 100
+        
         self.audio_interface = pyaudio.PyAudio()
         self.stream = self.audio_interface.open(
             format=pyaudio.paInt16,
             channels=1,
             rate=self.rate,
             input=True,
-            frames_per_buffer=8192
+            frames_per_buffer=self.block_size
         )
         self.stream.start_stream()
+        
+        # Rolling pre-roll so speech around the wake word reaches the next recording
+        self.preroll = PreRollBuffer(rate=self.rate)
         logger.info("Local voice detector initialized with Vosk")
 
-    def listen_for_wake_word(self, duration=2):
-        """Listen for wake words locally using offline Vosk model"""
+    def process_block(self):
+        """Read and decode one audio block. Returns True (wake), False (sleep) or None"""
         try:
-            frames = []
-            for _ in range(int(self.rate / 4096 * duration)):
-                data = self.stream.read(4096, exception_on_overflow=False)
-                if self.recognizer.AcceptWaveform(data):
-                    result = json.loads(self.recognizer.Result())
-                    text = result.get("text", "").lower()
+            data = self.stream.read(self.block_size, exception_on_overflow=False)
+            self.preroll.write(data)
+            
+            # Fire on partial results so the keyword is caught mid-utterance
+            decode_start = time.perf_counter()
+            if self.recognizer.AcceptWaveform(data):
+                text = json.loads(self.recognizer.Result()).get("text", "")
+                if text:
                     logger.info(f"Detected speech: {text}")
-
-                    for wake_word in WAKE_WORDS:
-                        if wake_word in text:
-                            logger.info(f"Wake word detected: {wake_word}")
-                            return True
-                    
-                    for sleep_word in SLEEP_WORDS:
-                        if sleep_word in text:
-                            logger.info(f"Sleep word detected: {sleep_word}")
-                            return False
+            else:
+                text = json.loads(self.recognizer.PartialResult()).get("partial", "")
+            self.record_decode_time(time.perf_counter() - decode_start)
+            
+            command = self.match_command(text)
+            if command is not None:
+                self.recognizer.Reset()
+            return command
 
         except Exception as e:
             logger.error(f"Voice detection error: {e}")
+            return None
+    
+    def discard_pending(self):
+        """Drop audio queued while the listener was idle so stale speech is not decoded"""
+        try:
+            available = self.stream.get_read_available()
+            if available > 0:
+                self.stream.read(available, exception_on_overflow=False)
+        except Exception as e:
+            logger.warning(f"Pending audio discard error: {e}")
+        self.preroll.clear()
+        self.recognizer.Reset()
+    
+    def match_command(self, text):
+        """Return True for a wake word, False for a sleep word, None otherwise"""
+        text = text.lower()
+        match = WAKE_PATTERN.search(text)
+        if match:
+            logger.info(f"Wake word detected: {match.group(1)}")
+            return True
+        match = SLEEP_PATTERN.search(text)
+        if match:
+            logger.info(f"Sleep word detected: {match.group(1)}")
+            return False
+        return None
+    
+    def record_decode_time(self, elapsed):
+        """Track per-block decode time and report it periodically"""
+        self.decode_blocks += 1
+        self.decode_total += elapsed
+        self.decode_max = max(self.decode_max, elapsed)
+        
+        if self.decode_blocks >= self.decode_report_interval:
+            block_ms = self.block_size / self.rate * 1000
+            avg_ms = self.decode_total / self.decode_blocks * 1000
+            logger.info(f"Wake decode: avg {avg_ms:.1f}ms, max {self.decode_max * 1000:.1f}ms "
+                        f"per {block_ms:.0f}ms block ({avg_ms / block_ms * 100:.0f}% real-time)")
+            self.decode_blocks = 0
+            self.decode_total = 0.0
+            self.decode_max = 0.0
+    
+    def capture_preroll(self):
+        """Drain pending microphone audio into the pre-roll and return it as PCM bytes"""
+        try:
+            available = self.stream.get_read_available()
+            if available > 0:
+                self.preroll.write(self.stream.read(available, exception_on_overflow=False))
+        except Exception as e:
+            logger.warning(f"Pre-roll drain error: {e}")
+        
+        data = self.preroll.snapshot()
+        self.preroll.clear()
+        self.recognizer.Reset()
+        return data
+
+class BargeInDetector:
+    """Detects the user talking over playback from microphone energy.
+    The threshold follows the echo of the robot's own voice, so only louder, sustained speech triggers it."""
+    
+    def __init__(self, rate=16000, chunk=1024, echo_margin=BARGE_IN_ECHO_MARGIN, min_rms=BARGE_IN_MIN_RMS,
+                 speech_seconds=BARGE_IN_SPEECH_SECONDS, calibration_seconds=BARGE_IN_CALIBRATION_SECONDS):
+        self.echo_margin = echo_margin
+        self.min_rms = min_rms
+        self.required_blocks = max(1, math.ceil(speech_seconds * rate / chunk))
+        self.calibration_blocks = max(1, math.ceil(calibration_seconds * rate / chunk))
+        self.echo_level = 0.0
+        self.blocks_seen = 0
+        self.speech_blocks = 0
+    
+    @property
+    def threshold(self):
+        return max(self.min_rms, self.echo_level * self.echo_margin)
+    
+    def process(self, data):
+        """Feed one PCM block captured during playback. Returns True once barge-in speech is detected"""
+        samples = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+        rms = float(np.sqrt(np.mean(samples * samples))) if samples.size else 0.0
+        self.blocks_seen += 1
+        
+        if self.blocks_seen <= self.calibration_blocks:
+            self.echo_level = max(self.echo_level, rms)
+            return False
+        
+        if rms > self.threshold:
+            self.speech_blocks += 1
+            return self.speech_blocks >= self.required_blocks
         
+        # Not speech: follow the echo envelope (quick to rise, slow to decay)
+        self.speech_blocks = 0
+        alpha = 0.5 if rms > self.echo_level else 0.05
+        self.echo_level += alpha * (rms - self.echo_level)
+        return False
+
+class AudioOutputService:
+    """Long-lived audio output: the mixer is initialized once, completion is signalled by event.
+    Every playback expects exactly one end event from its source (stop() included), so an event
+    that arrives late for an earlier playback is counted against that one and never ends the current."""
+    
+    def __init__(self, frequency=AUDIO_FREQUENCY, channels=AUDIO_CHANNELS, buffer=AUDIO_BUFFER):
+        if not pygame.mixer.get_init():
+            pygame.mixer.init(frequency=frequency, size=-16, channels=channels, buffer=buffer)
+        
+        # Reserve one channel for speech so effects never steal it
+        pygame.mixer.set_reserved(1)
+        self.channel = pygame.mixer.Channel(0)
+        self.channel.set_endevent(PLAYBACK_END_EVENT)
+        pygame.mixer.music.set_endevent(MUSIC_END_EVENT)
+        
+        self.finished = threading.Event()
+        self.finished.set()
+        self.lock = threading.Lock()
+        self.started = {PLAYBACK_END_EVENT: 0, MUSIC_END_EVENT: 0}  # Playbacks started per source
+        self.ended = {PLAYBACK_END_EVENT: 0, MUSIC_END_EVENT: 0}  # End events received per source
+        self.current = None  # (source end event, playback generation) of the latest playback
+        self.length = None  # Seconds the latest playback should last (None if unknown)
+        logger.info(f"Audio output initialized: {pygame.mixer.get_init()}")
+    
+    def decode(self, source):
+        """Decode a path or file-like object into a Sound, or None if the mixer can't"""
+        try:
+            return pygame.mixer.Sound(file=source)
+        except pygame.error as e:
+            logger.warning(f"Sound decode failed, falling back to mixer.music: {e}")
+            if hasattr(source, 'seek'):
+                source.seek(0)
+            return None
+    
+    def play(self, source, namehint=""):
+        """Start playback of a Sound, path or complete in-memory file and return the time the first sound was queued.
+        SDL reads file sources from its audio thread, so they must never block on the network."""
+        if isinstance(source, pygame.mixer.Sound):
+            sound = source
+        else:
+            sound = self.decode(source)
+        end_event = PLAYBACK_END_EVENT if sound is not None else MUSIC_END_EVENT
+        with self.lock:
+            self.finished.clear()
+            try:
+                if sound is not None:
+                    self.channel.play(sound)
+                else:
+                    pygame.mixer.music.load(source, namehint)
+                    pygame.mixer.music.play()
+            except pygame.error:
+                self.finished.set()
+                raise
+            self.started[end_event] += 1
+            self.current = (end_event, self.started[end_event])
+            self.length = self.clip_length(sound, source)
+        return time.time()
+    
+    def clip_length(self, sound, source):
+        """Exact length of a Sound; an upper bound from the size of encoded data otherwise"""
+        if sound is not None:
+            return sound.get_length()
+        if isinstance(source, BytesIO):
+            return source.getbuffer().nbytes / PLAYBACK_MIN_BYTES_PER_SECOND
+        if isinstance(source, str) and os.path.exists(source):
+            return os.path.getsize(source) / PLAYBACK_MIN_BYTES_PER_SECOND
         return None
+    
+    def wait(self, timeout=None):
+        """Block until the current playback ends or is stopped. Returns False if it is still going
+        after timeout seconds (default: clip length + PLAYBACK_END_MARGIN). A mixer that went
+        idle counts as finished, so a lost end event never hangs the caller."""
+        if timeout is None and self.length is not None:
+            timeout = self.length + PLAYBACK_END_MARGIN
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.finished.wait(PLAYBACK_POLL_SECONDS):
+            if not (self.channel.get_busy() or pygame.mixer.music.get_busy()):
+                logger.warning("Playback ended without an end event")
+                self.finished.set()
+            elif deadline is not None and time.monotonic() > deadline:
+                return False
+        return True
+    
+    def stop(self):
+        """Stop any playback and release waiters"""
+        with self.lock:
+            self.channel.stop()
+            pygame.mixer.music.stop()
+            self.finished.set()
+    
+    def on_end_event(self, event_type):
+        """Called from the pygame event loop when PLAYBACK_END_EVENT or MUSIC_END_EVENT arrives"""
+        with self.lock:
+            self.ended[event_type] += 1
+            if self.current is not None:
+                end_event, generation = self.current
+                if end_event == event_type and self.ended[event_type] >= generation:
+                    self.finished.set()
+    
+    def is_busy(self):
+        return not self.finished.is_set()
 
-def save_audio_file_threaded(self, file_path, content):
-    """Save audio file in a separate thread."""
-    def worker():
-        with open(file_path, 'wb') as f:
-            f.write(content)
-    t = threading.Thread(target=worker)
-    t.daemon = True
-    t.start()
-    return t
+class ResponseAudioCache:
+    """LRU cache of response audio: encoded bytes in memory and on disk, decoded Sounds for the hottest entries"""
+    
+    def __init__(self, audio_output, cache_dir=RESPONSE_CACHE_DIR, max_disk_bytes=RESPONSE_CACHE_DISK_BYTES,
+                 max_memory_bytes=RESPONSE_CACHE_MEMORY_BYTES, decoded_entries=RESPONSE_CACHE_DECODED_ENTRIES,
+                 canned_dir=CANNED_CLIPS_DIR):
+        self.audio_output = audio_output
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_bytes = max_memory_bytes
+        self.decoded_entries = decoded_entries
+        
+        self.memory = OrderedDict()   # key -> (data, audio_format)
+        self.memory_bytes = 0
+        self.decoded = OrderedDict()  # key -> pygame.mixer.Sound
+        self.hit_counts = {}
+        self.lock = threading.Lock()
+        
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.canned = self.load_canned_clips(canned_dir)
+    
+    @staticmethod
+    def make_key(text, language, voice, audio_format):
+        """Content address for a reply"""
+        raw = "\x00".join([text.strip().lower(), language, voice, audio_format])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+    
+    def disk_path(self, key, audio_format):
+        return os.path.join(self.cache_dir, f"{key}.{audio_format}")
+    
+    def get(self, key, audio_format):
+        """Return {'data', 'audio_format', 'sound'} or None"""
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                self.memory.move_to_end(key)
+            else:
+                path = self.disk_path(key, audio_format)
+                if not os.path.exists(path):
+                    return None
+                try:
+                    with open(path, 'rb') as f:
+                        entry = (f.read(), audio_format)
+                    os.utime(path)  # Disk LRU is ordered by mtime
+                except OSError as e:
+                    logger.warning(f"Response cache read error: {e}")
+                    return None
+                self.remember(key, entry)
+            
+            self.hit_counts[key] = self.hit_counts.get(key, 0) + 1
+            sound = self.decoded.get(key)
+            if sound is not None:
+                self.decoded.move_to_end(key)
+        
+        # Repeat hits get decoded once and kept ready to play
+        if sound is None and self.hit_counts[key] >= 2:
+            sound = self.audio_output.decode(BytesIO(entry[0]))
+            if sound is not None:
+                with self.lock:
+                    self.decoded[key] = sound
+                    while len(self.decoded) > self.decoded_entries:
+                        self.decoded.popitem(last=False)
+        
+        return {'data': entry[0], 'audio_format': entry[1], 'sound': sound}
+    
+    def put(self, key, data, audio_format):
+        """Store a complete response body"""
+        with self.lock:
+            self.remember(key, (data, audio_format))
+        
+        path = self.disk_path(key, audio_format)
+        try:
+            temp_path = path + ".tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+            self.trim_disk()
+        except OSError as e:
+            logger.warning(f"Response cache write error: {e}")
+    
+    def remember(self, key, entry):
+        """Insert into the memory LRU (caller holds the lock)"""
+        if key in self.memory:
+            self.memory_bytes -= len(self.memory.pop(key)[0])
+        self.memory[key] = entry
+        self.memory_bytes += len(entry[0])
+        while self.memory_bytes > self.max_memory_bytes and len(self.memory) > 1:
+            _, (old_data, _) = self.memory.popitem(last=False)
+            self.memory_bytes -= len(old_data)
+    
+    def trim_disk(self):
+        """Delete least recently used files until the cache fits its size bound"""
+        files = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if os.path.isfile(path) and not name.endswith(".tmp"):
+                stat = os.stat(path)
+                files.append((stat.st_mtime, stat.st_size, path))
+        
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+    
+    def load_canned_clips(self, canned_dir):
+        """Pre-decode the local fallback clips listed in CANNED_REPLIES"""
+        canned = {}
+        for name, text in CANNED_REPLIES.items():
+            for audio_format in ('wav', 'mp3'):
+                path = os.path.join(canned_dir, f"{name}.{audio_format}")
+                if os.path.exists(path):
+                    sound = self.audio_output.decode(path)
+                    if sound is not None:
+                        canned[name] = {'text': text, 'sound': sound, 'audio_format': audio_format}
+                    break
+        if canned:
+            logger.info(f"Loaded canned clips: {', '.join(canned)}")
+        missing = [name for name in CANNED_REPLIES if name not in canned]
+        if missing:
+            logger.warning(f"Canned clips missing from '{canned_dir}': {', '.join(missing)} "
+                           f"(offline replies will be silent; run canned_clips.py to render them)")
+        return canned
+    
+    def canned_response(self, name, robot_expression='confusion'):
+        """Build a response_data dict for a canned clip, or None if it isn't available"""
+        clip = self.canned.get(name)
+        if clip is None:
+            logger.warning(f"No canned clip '{name}', replying without audio")
+            return None
+        return {
+            'robot_expression': robot_expression,
+            'text_response': clip['text'],
+            'language_used': 'english',
+            'cached_audio': {'data': None, 'audio_format': clip['audio_format'], 'sound': clip['sound']},
+            'audio_format': clip['audio_format'],
+            'received_at': time.time(),
+            'user_input': ''
+        }
+
+class ResponseAudioStream:
+    """In-memory response audio: filled by the network stage, taken whole by playback"""
+    
+    def __init__(self, audio_format='mp3', max_chunks=RESPONSE_QUEUE_CHUNKS):
+        self.audio_format = audio_format
+        self.chunks = queue.Queue(maxsize=max_chunks)
+        self.buffer = bytearray()
+        self.complete = False
+        self.cancelled = threading.Event()
+        self.lock = threading.RLock()
+    
+    # Producer side (network thread)
+    def put(self, chunk):
+        """Hand a chunk to playback; returns False if the consumer went away"""
+        stalled_at = time.monotonic() + RESPONSE_STALL_SECONDS
+        while not self.cancelled.is_set():
+            try:
+                self.chunks.put(chunk, timeout=RESPONSE_POLL_SECONDS)
+                return True
+            except queue.Full:
+                if time.monotonic() > stalled_at:
+                    logger.warning("Response audio stream not drained, abandoning it")
+                    self.cancel()
+        return False
+    
+    def finish(self):
+        """Mark the end of the response body (a cancelled stream already reads as ended)"""
+        self.put(None)
+    
+    def cancel(self):
+        """Abandon the stream; unblocks the producer and any reader"""
+        self.cancelled.set()
+    
+    # Consumer side (playback)
+    def _pull(self):
+        """Move queued chunks into the buffer until the body is complete.
+        Returns early, leaving the body incomplete, once the stream is cancelled."""
+        while not self.complete:
+            if self.cancelled.is_set():
+                return
+            try:
+                chunk = self.chunks.get(timeout=RESPONSE_POLL_SECONDS)
+            except queue.Empty:
+                continue
+            if chunk is None:
+                self.complete = True
+            else:
+                self.buffer += chunk
+    
+    def wait_for_body(self):
+        """Block until the whole body has arrived; None if the stream was cancelled first"""
+        with self.lock:
+            self._pull()
+            return bytes(self.buffer) if self.complete else None
+    
+    def close(self):
+        self.cancel()
+    
+    def completed_data(self):
+        """The full body if it has been completely received, else None"""
+        with self.lock:
+            if not self.complete:
+                try:
+                    while not self.complete:
+                        chunk = self.chunks.get_nowait()
+                        if chunk is None:
+                            self.complete = True
+                        else:
+                            self.buffer += chunk
+                except queue.Empty:
+                    return None
+            return bytes(self.buffer)
+
+class RequestCancelled(Exception):
+    """A request was abandoned because its turn ran out of time or was cancelled"""
+
+class RequestDeadline:
+    """Latency budget shared by every network call of one turn; cancellable from any thread.
+    Cancelling closes the responses registered with track(), aborting their downloads."""
+    
+    def __init__(self, seconds=TURN_RESPONSE_BUDGET):
+        self.expires_at = time.monotonic() + seconds
+        self.cancelled = threading.Event()
+        self.responses = []
+        self.lock = threading.Lock()
+    
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+    
+    @property
+    def expired(self):
+        return self.cancelled.is_set() or self.remaining() <= 0
+    
+    def check(self):
+        if self.expired:
+            raise RequestCancelled("cancelled" if self.cancelled.is_set() else "turn latency budget exhausted")
+    
+    def timeout(self, connect=REQUEST_CONNECT_TIMEOUT):
+        """(connect, read) timeout for requests, bounded by what is left of the budget"""
+        self.check()
+        remaining = self.remaining()
+        return (min(connect, remaining), remaining)
+    
+    def track(self, response):
+        """Close response if the turn is cancelled (immediately if it already was)"""
+        with self.lock:
+            if not self.cancelled.is_set():
+                self.responses.append(response)
+                return
+        response.close()
+    
+    def cancel(self):
+        with self.lock:
+            self.cancelled.set()
+            responses, self.responses = self.responses, []
+        for response in responses:
+            try:
+                response.close()
+            except Exception:
+                pass
+
+class TimedUploadBody:
+    """Request body that records (monotonic) when its last byte has been handed to the socket.
+    With a deadline, the upload is aborted between blocks once the turn is cancelled or out of time."""
+    
+    def __init__(self, body, deadline=None):
+        self.body = BytesIO(body)
+        self.length = len(body)
+        self.deadline = deadline
+        self.finished_at = None
+    
+    def __len__(self):
+        return self.length
+    
+    def read(self, size=-1):
+        if self.deadline is not None:
+            self.deadline.check()
+        data = self.body.read(size)
+        if not data and self.finished_at is None:
+            self.finished_at = time.monotonic()
+        return data
+
+def download_response_audio(response, audio_stream, trace=None):
+    """Network stage: copy the streamed response body into the hand-off queue"""
+    download_start = time.monotonic()
+    try:
+        for chunk in response.iter_content(chunk_size=RESPONSE_CHUNK_SIZE):
+            if chunk and not audio_stream.put(chunk):
+                break
+    except Exception as e:
+        logger.error(f"Response audio download error: {e}")
+    finally:
+        audio_stream.finish()
+        response.close()
+        if trace is not None:
+            trace.add_span('download', download_start, time.monotonic())
+
+class LocalTranscriber:
+    """Transcribes captured PCM with the local Vosk model on a worker thread while recording runs"""
+    
+    def __init__(self, model, rate=16000, on_intent=None):
+        self.recognizer = KaldiRecognizer(model, rate)  # Full vocabulary, unlike the wake recognizer
+        self.on_intent = on_intent
+        self.intent = None
+        self.candidate = None  # Action phrase the latest partial results agree on
+        self.candidate_count = 0
+        self.chunks = queue.Queue()
+        self.parts = []
+        self.thread = threading.Thread(target=self.worker)
+        self.thread.daemon = True
+        self.thread.start()
+    
+    def feed(self, pcm):
+        self.chunks.put(pcm)
+    
+    def worker(self):
+        input_done = False
+        try:
+            while True:
+                chunk = self.chunks.get()
+                if chunk is None:
+                    input_done = True
+                    break
+                if self.recognizer.AcceptWaveform(chunk):
+                    self.parts.append(json.loads(self.recognizer.Result()).get("text", ""))
+                    self.check_intent(" ".join(part for part in self.parts if part), final=True)
+                else:
+                    partial = json.loads(self.recognizer.PartialResult()).get("partial", "")
+                    self.check_intent(" ".join(part for part in self.parts + [partial] if part))
+            self.parts.append(json.loads(self.recognizer.FinalResult()).get("text", ""))
+        except Exception as e:
+            logger.error(f"Local transcription error: {e}")
+            while not input_done:
+                input_done = self.chunks.get() is None
+    
+    def check_intent(self, text, final=False):
+        """Fire on_intent once, for an utterance that is just an action phrase (see match_command).
+        A final result fires at once; partial results, which Vosk still revises, must agree for
+        INTENT_STABLE_PARTIALS decodes in a row."""
+        if self.intent is not None or not text:
+            return
+        words = command_words(text)
+        action, command_only = match_command(words)
+        if action is None or action == 'sleep' or not command_only:
+            self.candidate, self.candidate_count = None, 0
+            return
+        if not final:
+            candidate = (action, tuple(words))
+            if candidate != self.candidate:
+                self.candidate, self.candidate_count = candidate, 0
+            self.candidate_count += 1
+            if self.candidate_count < INTENT_STABLE_PARTIALS:
+                return
+        self.intent = action
+        logger.info(f"Local intent from {'final' if final else 'stable partial'} result: {action} ('{text}')")
+        if self.on_intent:
+            self.on_intent(action)
+    
+    def finish(self, timeout=2.0):
+        """Return the transcript ('' if decoding did not finish in time)"""
+        self.chunks.put(None)
+        self.thread.join(timeout=timeout)
+        if self.thread.is_alive():
+            logger.warning("Local transcription did not finish in time")
+            return ""
+        return " ".join(part for part in self.parts if part).strip()
 
 class VoiceAssistantClient:
     """Voice Assistant Client for API Communication - Enhanced"""
     
-    def __init__(self, api_url="https://aiec.guni.ac.in:8111", user_name="test_user", verify_ssl=False):
+    def __init__(self, api_url="https://aiec.guni.ac.in:8111", user_name="test_user", verify_ssl=False, audio_output=None):
         self.api_url = api_url
         self.user_name = user_name
         self.verify_ssl = verify_ssl
+        self.audio_output = audio_output or AudioOutputService()
+        self.response_cache = ResponseAudioCache(self.audio_output)
         
         # Audio Configuration with minimum recording time
         self.audio_config = {
@@ -172,6 +983,7 @@ class VoiceAssistantClient:
         }
         
         # State tracking
+        self.closed = False
         self.is_recording = False
         self.is_processing = False
         self.is_speaking = False
@@ -179,16 +991,30 @@ class VoiceAssistantClient:
         self.last_user_input = ""
         self.last_ai_response = ""
         
-        # Test connection
-        self.test_api_connection()
+        # Upload codec, negotiated from the /health response
+        self.server_audio_codecs = ['wav']
+        self.upload_codec = 'wav'
+        
+        # Hybrid mode: local transcript (Vosk model set by the face system)
+        self.local_model = None
+        self.text_input_supported = False
+        
+        # Link health is probed in the background; startup never waits for the server
+        self.link = LinkSupervisor(self)
+        
+        # Conversation records are persisted off the speaking path
+        self.conversation_store = ConversationStore(self)
     
-    def test_api_connection(self):
-        """Test connection to the voice assistant API"""
+    def test_api_connection(self, timeout=5, quiet=False):
+        """Test connection to the voice assistant API. Returns True if /health answered 200"""
         try:
-            response = requests.get(f"{self.api_url}/health", timeout=5, verify=self.verify_ssl)
+            response = requests.get(f"{self.api_url}/health", timeout=timeout, verify=self.verify_ssl)
             if response.status_code == 200:
                 self.api_status = "Connected"
-                logger.info("API connection successful")
+                if not quiet:
+                    logger.info("API connection successful")
+                self.negotiate_upload_codec(response, quiet)
+                return True
             else:
                 self.api_status = f"Error {response.status_code}"
                 logger.warning(f"API responded with status: {response.status_code}")
@@ -197,18 +1023,37 @@ class VoiceAssistantClient:
             logger.error(f"SSL Certificate error connecting to API: {e}")
         except requests.exceptions.RequestException as e:
             self.api_status = "Connection Error"
-            logger.error(f"Cannot connect to API at {self.api_url}: {e}")
+            if not quiet:
+                logger.error(f"Cannot connect to API at {self.api_url}: {e}")
+        return False
     
-    def record_audio_with_minimum_time(self, min_seconds=None):
-        """Record audio with minimum time guarantee"""
+    def negotiate_upload_codec(self, health_response, quiet=False):
+        """Pick the upload codec from the 'audio_formats' list advertised by /health"""
+        try:
+            health = health_response.json()
+            self.server_audio_codecs = health.get('audio_formats', ['wav'])
+            self.text_input_supported = bool(health.get('text_input', False))
+        except ValueError:
+            self.server_audio_codecs = ['wav']
+        upload_codec = choose_upload_codec(self.server_audio_codecs)
+        if quiet and upload_codec == self.upload_codec:
+            return
+        self.upload_codec = upload_codec
+        logger.info(f"Upload codec: {self.upload_codec} (server accepts {self.server_audio_codecs})")
+    
+    def record_audio_with_minimum_time(self, min_seconds=None, preroll=b'', on_intent=None, barge_in=False,
+                                       keep_recording=None):
+        """Record audio with minimum time guarantee, prefixed with optional pre-roll PCM.
+        on_intent(action) is called as soon as the local transcript is just an action phrase.
+        keep_recording() is checked every block; once it returns False the recording ends at once,
+        minimum time or not (e.g. the robot was put to sleep).
+        With barge_in=True recording may start during playback: microphone audio is held back until
+        the reply ends (the echo is dropped) or the user talks over it (playback is stopped)."""
         min_seconds = min_seconds or self.audio_config['min_record_seconds']
         max_seconds = self.audio_config['record_seconds']
         
         try:
             audio = pyaudio.PyAudio()
-            temp_audio_file = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-            temp_audio_path = temp_audio_file.name
-            temp_audio_file.close()
             
             stream = audio.open(
                 format=self.audio_config['format'],
@@ -218,139 +1063,287 @@ class VoiceAssistantClient:
                 frames_per_buffer=self.audio_config['chunk']
             )
             
+            # Encoder runs alongside capture so the payload is ready when recording stops
+            encoder = UploadEncoder(self.upload_codec, self.audio_config['rate'], self.audio_config['channels'])
+            transcriber = None
+            if self.local_model:
+                transcriber = LocalTranscriber(self.local_model, self.audio_config['rate'], on_intent)
+            
             logger.info(f"Recording started... (min: {min_seconds}s, max: {max_seconds}s)")
             frames = []
+            preroll_seconds = len(preroll) / 2 / self.audio_config['rate']
+            if preroll:
+                frames.append(preroll)
+                encoder.feed(preroll)
+                if transcriber:
+                    transcriber.feed(preroll)
+                logger.info(f"Prepending {preroll_seconds:.1f}s of pre-roll audio")
             
             frames_per_second = self.audio_config['rate'] / self.audio_config['chunk']
             min_frames = int(frames_per_second * min_seconds)
             max_frames = int(frames_per_second * max_seconds)
             
-            for i in range(max_frames):
-                if not self.is_recording and i >= min_frames:
+            detector = None
+            if barge_in and self.audio_output.is_busy():
+                detector = BargeInDetector(self.audio_config['rate'], self.audio_config['chunk'])
+                held = deque(maxlen=detector.required_blocks + 2)  # Speech onset kept for the recording
+            
+            recorded = 0
+            while recorded < max_frames and not self.closed:
+                if keep_recording is not None and not keep_recording():
+                    logger.info("Recording cancelled")
+                    break
+                if not self.is_recording and (detector is not None or recorded >= min_frames):
                     break
                 data = stream.read(self.audio_config['chunk'], exception_on_overflow=False)
+                
+                if detector is not None:
+                    if not self.audio_output.is_busy():
+                        # Reply finished on its own: what was held is echo, the turn starts now
+                        logger.info("Playback finished, recording next turn")
+                        detector = None
+                    elif detector.process(data):
+                        logger.info(f"Barge-in detected (threshold {detector.threshold:.0f} RMS), stopping playback")
+                        self.audio_output.stop()
+                        detector = None
+                        onset = list(held)
+                        held.clear()
+                        for block in onset:
+                            frames.append(block)
+                            encoder.feed(block)
+                            if transcriber:
+                                transcriber.feed(block)
+                        recorded += len(onset)
+                    else:
+                        held.append(data)
+                        continue
+                
                 frames.append(data)
+                encoder.feed(data)
+                if transcriber:
+                    transcriber.feed(data)
+                recorded += 1
             
             stream.stop_stream()
             stream.close()
             audio.terminate()
             
-            actual_duration = len(frames) / frames_per_second
+            actual_duration = (len(frames) - (1 if preroll else 0)) / frames_per_second + preroll_seconds
             logger.info(f"Recording finished. Duration: {actual_duration:.1f}s")
             
-            wf = wave.open(temp_audio_path, 'wb')
-            wf.setnchannels(self.audio_config['channels'])
-            wf.setsampwidth(audio.get_sample_size(self.audio_config['format']))
-            wf.setframerate(self.audio_config['rate'])
-            wf.writeframes(b''.join(frames))
-            wf.close()
+            pcm = b''.join(frames)
+            payload = encoder.finish()
+            codec, filename, mime_type = encoder.codec, encoder.filename, encoder.mime_type
+            if payload is None:
+                payload = encode_pcm(pcm, 'wav', self.audio_config['rate'], self.audio_config['channels'])
+                codec, filename, mime_type = 'wav', 'audio.wav', 'audio/wav'
+            logger.info(f"Encoded {len(pcm)} bytes PCM -> {len(payload)} bytes {codec}")
+            
+            transcript = transcriber.finish() if transcriber else ""
+            if transcript:
+                logger.info(f"Local transcript: {transcript}")
             
-            return temp_audio_path
+            return {
+                'pcm': pcm,
+                'rate': self.audio_config['rate'],
+                'duration': actual_duration,
+                'payload': payload,
+                'codec': codec,
+                'filename': filename,
+                'mime_type': mime_type,
+                'transcript': transcript,
+                'intent': transcriber.intent if transcriber else None,
+                'preroll': bool(preroll),
+            }
             
         except Exception as e:
             logger.error(f"Audio recording error: {e}")
             return None
 
-    def send_audio_to_api(self, audio_path):
-        """Send audio to the API and get response"""
+    def send_audio_to_api(self, recording, trace=None, deadline=None):
+        """Send recorded audio to the API and get response.
+        The deadline bounds the connect/read timeouts and can abort the upload mid-way."""
+        request_start = time.monotonic()
         try:
-            logger.info(f"Sending audio to API: {self.api_url}")
+            logger.info(f"Sending {len(recording['payload'])} bytes of {recording['codec']} audio to API: {self.api_url}")
             
-            with open(audio_path, 'rb') as audio_file:
-                files = {'audio': ('audio.wav', audio_file, 'audio/wav')}
-                data = {'user_name': self.user_name}
-                
-                response = requests.post(
-                    f"{self.api_url}/process_audio",
-                    files=files,
-                    data=data,
-                    timeout=30,
-                    verify=self.verify_ssl
-                )
+            # Multipart body is built up front so the end of the upload can be timed
+            body, content_type = urllib3.encode_multipart_formdata({
+                'user_name': self.user_name,
+                'audio': (recording['filename'], recording['payload'], recording['mime_type'])
+            })
+            upload_body = TimedUploadBody(body, deadline)
             
-            # Cleanup temp file
-            try:
-                os.unlink(audio_path)
-            except:
-                pass
+            request_start = time.monotonic()
+            response = requests.post(
+                f"{self.api_url}/process_audio",
+                data=upload_body,
+                headers={'Content-Type': content_type},
+                timeout=deadline.timeout() if deadline else 30,
+                verify=self.verify_ssl,
+                stream=True  # Body is handed to playback while it downloads
+            )
+            headers_at = time.monotonic()
+            if deadline is not None:
+                deadline.track(response)
+                deadline.check()
+            self.link.record_request(headers_at - request_start)
+            if trace is not None:
+                upload_end = upload_body.finished_at or headers_at
+                trace.add_span('upload', request_start, upload_end)
+                trace.add_span('server', upload_end, headers_at)
             
-            if response.status_code == 200:
-                robot_expression = response.headers.get('X-Robot-Expression', 'cute_neutral')
-                encoded_text_response = response.headers.get('X-LLM-Text', 'I am here to help!')
-                language_used = response.headers.get('X-Language-Used', 'english')
-                audio_format = response.headers.get('X-Audio-Format', 'mp3')
-                robot_action_response = response.headers.get('X-Robot-Action', 'none')
-                
-                try:
-                    text_response = urllib.parse.unquote(encoded_text_response)
-                except Exception:
-                    text_response = encoded_text_response
-                
-                file_extension = '.wav' if audio_format == 'wav' else '.mp3'
-                temp_audio = tempfile.NamedTemporaryFile(delete=False, suffix=file_extension)
-                # temp_audio.write(response.content)
-                temp_audio.close()
-                save_audio_file_threaded(temp_audio.name, response.content)
-                handle_input(robot, logger, robot_action_response)
-                result = {
-                    'robot_expression': robot_expression,
-                    'text_response': text_response,
-                    'language_used': language_used,
-                    'audio_file': temp_audio.name,
-                    'audio_format': audio_format,
-                    'user_input': f"Processed via {self.user_name}"
-                }
-                
-                logger.info(f"API Response parsed: {result}")
-                return result
-            else:
-                logger.error(f"API Error: {response.status_code}")
-                return None
-                
+            return self.handle_api_response(response, f"Processed via {self.user_name}", trace,
+                                            skip_action=recording.get('intent'))
+        
+        except RequestCancelled as e:
+            return self.abandon_request(deadline, request_start, e)
         except Exception as e:
+            self.link.record_failure()
             logger.error(f"API communication error: {e}")
             return None
     
-    def play_audio_response(self, response_data, avatar_state):
-        """Play audio response from API with improved lip sync"""
-        if not response_data or 'audio_file' not in response_data:
+    def send_text_to_api(self, text, trace=None, skip_action=None, deadline=None):
+        """Send a locally transcribed utterance instead of audio (slow or failing link)"""
+        request_start = time.monotonic()
+        try:
+            logger.info(f"Sending text-only request to API: {text}")
+            response = requests.post(
+                f"{self.api_url}{PROCESS_TEXT_ENDPOINT}",
+                data={'user_name': self.user_name, 'text': text},
+                timeout=deadline.timeout() if deadline else 30,
+                verify=self.verify_ssl,
+                stream=True
+            )
+            headers_at = time.monotonic()
+            if deadline is not None:
+                deadline.track(response)
+                deadline.check()
+            self.link.record_request(headers_at - request_start)
+            if trace is not None:
+                trace.add_span('server', request_start, headers_at)
+            
+            return self.handle_api_response(response, text, trace, skip_action=skip_action)
+        
+        except RequestCancelled as e:
+            return self.abandon_request(deadline, request_start, e)
+        except Exception as e:
+            self.link.record_failure()
+            logger.error(f"API text request error: {e}")
+            return None
+    
+    def abandon_request(self, deadline, request_start, reason):
+        """Give up on a request whose deadline passed or whose turn was cancelled"""
+        if not deadline.cancelled.is_set():
+            # Ran out of time: that is a slow link, not a cancelled turn
+            self.link.record_request(time.monotonic() - request_start)
+        logger.warning(f"API request abandoned: {reason}")
+        return None
+    
+    def handle_api_response(self, response, user_input, trace=None, skip_action=None):
+        """Parse response headers, start the audio download and start the robot action in the background.
+        skip_action is an action the local fast path already started."""
+        if response.status_code != 200:
+            logger.error(f"API Error: {response.status_code}")
+            response.close()
+            return None
+        
+        robot_expression = response.headers.get('X-Robot-Expression', 'cute_neutral')
+        encoded_text_response = response.headers.get('X-LLM-Text', 'I am here to help!')
+        language_used = response.headers.get('X-Language-Used', 'english')
+        audio_format = response.headers.get('X-Audio-Format', 'mp3')
+        robot_action_response = response.headers.get('X-Robot-Action', 'none')
+        
+        try:
+            text_response = urllib.parse.unquote(encoded_text_response)
+        except Exception:
+            text_response = encoded_text_response
+        
+        result = {
+            'robot_expression': robot_expression,
+            'text_response': text_response,
+            'language_used': language_used,
+            'audio_format': audio_format,
+            'user_input': user_input
+        }
+        
+        # Known replies play from cache; the body is not downloaded at all
+        voice = response.headers.get('X-Voice', '')
+        cache_key = self.response_cache.make_key(text_response, language_used, voice, audio_format)
+        cached_audio = self.response_cache.get(cache_key, audio_format)
+        if cached_audio is not None:
+            logger.info("Response audio served from cache")
+            response.close()
+            result['cached_audio'] = cached_audio
+        else:
+            audio_stream = ResponseAudioStream(audio_format)
+            download_thread = threading.Thread(target=download_response_audio, args=(response, audio_stream, trace))
+            download_thread.daemon = True
+            download_thread.start()
+            result['audio_stream'] = audio_stream
+            result['cache_key'] = cache_key
+        
+        # The reply never waits for a motion: a slow local action may still hold the servo lock
+        if robot_action_response == skip_action:
+            logger.info(f"Robot action '{skip_action}' already started locally")
+        elif robot_action_response and robot_action_response != 'none':
+            start_robot_action(robot_action_response, trace)
+        result['received_at'] = time.time()
+        result['received_mono'] = time.monotonic()
+        
+        logger.info(f"API Response parsed: {result}")
+        return result
+    
+    def play_audio_response(self, response_data, avatar_state, trace=None, on_started=None):
+        """Play audio response from API with improved lip sync.
+        on_started() is called once sound is playing, before waiting for it to end."""
+        if not response_data or ('audio_stream' not in response_data and 'cached_audio' not in response_data):
             return
         
+        audio_stream = response_data.get('audio_stream')
         try:
-            audio_file_path = response_data['audio_file']
             audio_format = response_data.get('audio_format', 'mp3')
             text = response_data.get('text_response', '')
             
-            logger.info(f"Playing {audio_format} audio file: {audio_file_path}")
+            phonemes = text_to_enhanced_phonemes(text)
             
-            # Initialize pygame mixer
             try:
-                pygame.mixer.quit()
-            except:
-                pass
-            
-            if audio_format == 'wav':
-                pygame.mixer.init(frequency=22050, size=-16, channels=2, buffer=1024)
-            else:
-                pygame.mixer.init(frequency=22050, size=-16, channels=2, buffer=512)
-            
-            # Set up enhanced lip sync
-            avatar_state.is_speaking = True
-            avatar_state.speech_start_time = time.time()
-            avatar_state.speech_text = text
-            avatar_state.speech_phonemes = self.text_to_enhanced_phonemes(text)
-            avatar_state.current_phoneme_index = 0
-            
-            try:
-                pygame.mixer.music.load(audio_file_path)
-                pygame.mixer.music.play()
+                if 'cached_audio' in response_data:
+                    cached = response_data['cached_audio']
+                    logger.info(f"Playing cached {audio_format} response")
+                    started_at = self.audio_output.play(cached['sound'] or BytesIO(cached['data']))
+                else:
+                    # SDL reads its source from the audio callback (and seeks to the end for MP3 tags):
+                    # it gets the complete body, never a reader that can block on the network
+                    body = audio_stream.wait_for_body()
+                    if body is None:
+                        logger.info("Response audio cancelled before the download finished")
+                        return
+                    logger.info(f"Playing {audio_format} response from memory ({len(body)} bytes)")
+                    started_at = self.audio_output.play(BytesIO(body), namehint=audio_format)
                 
-                # Wait for playback to complete
-                while pygame.mixer.music.get_busy():
-                    pygame.time.Clock().tick(10)
-                    if not self.is_speaking:
-                        pygame.mixer.music.stop()
-                        break
+                playback_start = time.monotonic()
+                if trace is not None and 'received_mono' in response_data:
+                    trace.add_span('first_sound', response_data['received_mono'], playback_start)
+                if on_started is not None:
+                    on_started()
+                
+                # Set up enhanced lip sync from the moment sound actually starts
+                avatar_state.is_speaking = True
+                avatar_state.speech_start_time = started_at
+                avatar_state.speech_text = text
+                avatar_state.speech_phonemes = phonemes
+                avatar_state.current_phoneme_index = 0
+                
+                if 'received_at' in response_data:
+                    logger.info(f"Time to first sound: {(started_at - response_data['received_at']) * 1000:.0f}ms")
+                
+                # Wait for the end-of-playback event (or stop()), bounded by the clip length
+                if not self.audio_output.wait():
+                    logger.warning("Playback overran its expected length, stopping it")
+                    self.audio_output.stop()
+                if trace is not None:
+                    trace.add_span('playback', playback_start, time.monotonic())
                 
                 logger.info("Audio playback completed")
             except pygame.error as e:
@@ -362,981 +1355,291 @@ class VoiceAssistantClient:
             avatar_state.upper_lip_y = 0.0
             avatar_state.lower_lip_y = 0.0
             
-            # Cleanup temp file
-            try:
-                os.unlink(audio_file_path)
-            except:
-                pass
+            # Remember fully downloaded replies for next time
+            if audio_stream is not None and 'cache_key' in response_data:
+                data = audio_stream.completed_data()
+                if data:
+                    self.response_cache.put(response_data['cache_key'], data, audio_format)
                 
         except Exception as e:
             logger.error(f"Audio playback error: {e}")
+        finally:
+            if audio_stream is not None:
+                audio_stream.close()
     
-    def text_to_enhanced_phonemes(self, text):
-        """Enhanced phoneme detection with better vowel recognition"""
-        phonemes = []
-        words = re.findall(r'\b\w+\b', text.lower())
-        
-        # Vowel patterns for better lip sync
-        vowel_patterns = {
-            'a': ('vowel_wide_a', 0.20),      # Wide open mouth
-            'e': ('vowel_mid_e', 0.18),       # Medium open, slightly wide
-            'i': ('vowel_narrow_i', 0.16),    # Narrow, high tongue
-            'o': ('vowel_round_o', 0.18),     # Round lips, medium open
-            'u': ('vowel_round_u', 0.16),     # Round lips, smaller opening
-            'ay': ('vowel_wide_a', 0.18),     # Diphthong
-            'ow': ('vowel_round_o', 0.18),    # Diphthong
-        }
+    def discard_response(self, response_data):
+        """Drop a response without playing it, releasing its download"""
+        if response_data and 'audio_stream' in response_data:
+            response_data['audio_stream'].close()
+    
+    def close(self):
+        """Shutdown: stop capture at once and end background link/storage work"""
+        self.closed = True
+        self.is_recording = False
+        self.link.close()
+        self.conversation_store.close()
+    
+    def post_conversation(self, data, session=None):
+        """POST one conversation record. Returns True if stored, False if the server refused the record;
+        raises on network errors and 5xx replies (worth retrying later)"""
+        response = (session or requests).post(
+            f"{self.api_url}/conversation",
+            data=data,
+            timeout=10,
+            verify=self.verify_ssl
+        )
         
-        consonant_patterns = {
-            'b': ('bilabial_b', 0.12),        # Lips together
-            'p': ('bilabial_p', 0.12),        # Lips together
-            'm': ('bilabial_m', 0.14),        # Lips together, longer
-            'f': ('labiodental_f', 0.12),     # Teeth on lip
-            'v': ('labiodental_v', 0.12),     # Teeth on lip
-            't': ('dental_t', 0.10),          # Tongue to teeth
-            'd': ('dental_d', 0.10),          # Tongue to teeth
-            'n': ('dental_n', 0.12),          # Tongue to teeth, longer
-            'l': ('dental_l', 0.12),          # Tongue to teeth
-            'r': ('dental_r', 0.14),          # Tongue movement
-            's': ('sibilant_s', 0.14),        # Hissing sound
-            'z': ('sibilant_z', 0.14),        # Hissing sound
-            'sh': ('sibilant_sh', 0.16),      # Wider hissing
-            'ch': ('sibilant_ch', 0.14),      # Sharp hissing
-            'k': ('velar_k', 0.08),           # Back of tongue
-            'g': ('velar_g', 0.08),           # Back of tongue
-            'w': ('rounded_w', 0.12),         # Rounded lips
-            'y': ('palatal_y', 0.10),         # High tongue
-        }
+        if response.status_code >= 500:
+            response.raise_for_status()
+        if response.status_code == 200:
+            result = response.json()
+            if result.get('status') == 'added':
+                logger.info("Conversation stored successfully")
+                return True
         
-        for word in words:
-            # Process each character with context
-            i = 0
-            while i < len(word):
-                char = word[i]
-                
-                # Check for common digraphs first
-                if i < len(word) - 1:
-                    digraph = word[i:i+2]
-                    if digraph in consonant_patterns:
-                        phonemes.append(consonant_patterns[digraph])
-                        i += 2
-                        continue
-                    elif digraph in vowel_patterns:
-                        phonemes.append(vowel_patterns[digraph])
-                        i += 2
-                        continue
-                
-                # Single character processing
-                if char in vowel_patterns:
-                    phonemes.append(vowel_patterns[char])
-                elif char in consonant_patterns:
-                    phonemes.append(consonant_patterns[char])
-                else:
-                    # Default consonant
-                    phonemes.append(('consonant_default', 0.08))
-                
-                i += 1
-            
-            # Add word boundary
-            phonemes.append(('pause', 0.05))
+        logger.warning(f"Conversation rejected by server: {response.status_code}")
+        return False
+
+class ConversationStore:
+    """Fire-and-forget conversation persistence: batched in the background, spooled to disk when offline"""
+    
+    def __init__(self, client, batch_size=CONVERSATION_BATCH_SIZE, flush_interval=CONVERSATION_FLUSH_SECONDS,
+                 spool_path=CONVERSATION_SPOOL_PATH, rejected_path=CONVERSATION_REJECTED_PATH):
+        self.client = client
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool_path = spool_path
+        self.rejected_path = rejected_path
+        self.records = queue.Queue()
+        self.session = requests.Session()
+        self.stop_marker = object()
+        
+        self.thread = threading.Thread(target=self.worker)
+        self.thread.daemon = True
+        self.thread.start()
+    
+    def enqueue(self, user_input, ai_response, language_used='english'):
+        """Queue a record for storage; never blocks"""
+        if not user_input or not ai_response:
+            logger.warning("Skipping conversation storage - missing input or response")
+            return False
         
-        return phonemes
+        self.records.put({
+            'user_name': self.client.user_name,
+            'user_input': user_input,
+            'ai_response': ai_response,
+            'language_used': language_used
+        })
+        return True
     
-    def store_conversation(self, user_input, ai_response, language_used='english'):
-        """Store conversation in the server database"""
-        try:
-            if not user_input or not ai_response:
-                logger.warning("Skipping conversation storage - missing input or response")
-                return False
-            
-            data = {
-                'user_name': self.user_name,
-                'user_input': user_input,
-                'ai_response': ai_response,
-                'language_used': language_used
-            }
+    def worker(self):
+        """Collect records and flush when the batch is full or the oldest record is too old"""
+        batch = []
+        deadline = None
+        
+        while True:
+            timeout = None if not batch else max(0.0, deadline - time.time())
+            try:
+                record = self.records.get(timeout=timeout)
+            except queue.Empty:
+                record = None
             
-            response = requests.post(
-                f"{self.api_url}/conversation",
-                data=data,
-                timeout=10,
-                verify=self.verify_ssl
-            )
+            if record is self.stop_marker:
+                if batch:
+                    self.flush(batch)
+                break
             
-            if response.status_code == 200:
-                result = response.json()
-                if result.get('status') == 'added':
-                    logger.info("Conversation stored successfully")
-                    return True
+            if record is not None:
+                if not batch:
+                    deadline = time.time() + self.flush_interval
+                batch.append(record)
             
-            return False
+            if batch and (len(batch) >= self.batch_size or time.time() >= deadline):
+                self.flush(batch)
+                batch = []
+    
+    def flush(self, batch):
+        """Send spooled records first, then the batch; whatever is left goes back to the spool.
+        Only transport errors and 5xx replies stop the flush. A record the server refuses is moved
+        to the rejected file, so it can never block the records behind it."""
+        spooled = self.read_spool()
+        pending = spooled + batch
+        done = 0  # Records handled for good: stored or rejected
+        
+        for record in pending:
+            try:
+                stored = self.client.post_conversation(record, session=self.session)
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"Conversation server unavailable, spooling {len(pending) - done} record(s): {e}")
+                break
+            except Exception as e:
+                logger.error(f"Error storing conversation, rejecting the record: {e}")
+                stored = False
+            if not stored:
+                self.append_records(self.rejected_path, [record])
+            done += 1
+        
+        if done == len(pending):
+            if spooled:
+                self.rewrite_spool([])
+                logger.info(f"Replayed {len(spooled)} spooled conversation record(s)")
+        elif done == 0:
+            self.append_spool(batch)
+        else:
+            self.rewrite_spool(pending[done:])
+    
+    def read_spool(self):
+        if not os.path.exists(self.spool_path):
+            return []
+        records = []
+        try:
+            with open(self.spool_path, 'r') as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        records.append(json.loads(line))
         except Exception as e:
-            logger.error(f"Error storing conversation: {e}")
-            return False
-
-class AvatarState:
-    """Enhanced Avatar State with loading mode support"""
-    def __init__(self):
-        # Emotion system
-        self.target_emotion = "sleepy"  # Start in sleep mode
-        self.current_emotion = "sleepy"
-        self.emotion_transition_speed = 3.0
-        
-        # Loading mode
-        self.is_loading = False
-        self.loading_start_time = 0
-        self.loading_expression_index = 0
-        self.next_loading_change = 0
-        
-        # Eye system
-        self.eye_open_ratio = 1.0
-        self.target_eye_open_ratio = 1.0
-        self.is_blinking = False
-        self.blink_start_time = 0
-        self.blink_duration = 0.12
-        self.next_blink_time = time.time() + 3
-        
-        # Eyebrow system
-        self.eyebrow_y, self.target_eyebrow_y = 0.0, 0.0
-        self.eyebrow_r, self.target_eyebrow_r = 0.0, 0.0
-        
-        # Pupil system
-        self.pupil_pos = np.array([0.0, 0.0])
-        self.target_pupil_pos = np.array([0.0, 0.0])
-        self.next_gaze_shift_time = time.time() + 2
-        self.pupil_size, self.target_pupil_size = 1.0, 1.0
-        
-        # Mouth system
-        self.mouth_open_ratio = 0.0
-        self.mouth_curve, self.target_mouth_curve = 0.0, 0.0
-        self.upper_lip_y = 0.0
-        self.lower_lip_y = 0.0
-        
-        # Speech system
-        self.is_speaking = False
-        self.speech_start_time = 0
-        self.speech_text = ""
-        self.speech_phonemes = []
-        self.current_phoneme_index = 0
-        
-        # Eye movement
-        self.eye_movement_enabled = True
-        self.eye_movement_range = 0.3
-        
-        # Sleep and special states
-        self.sleep_animation_phase = 0.0
-        self.is_sleeping = True  # Start sleeping
-        self.breathing_offset = 0.0
-        
-        # Mouth width tracking
-        self.current_mouth_width = 0.0
-        self.target_mouth_width = 0.0
-
-class TextureManager:
-    """Manages all texture loading and handling"""
-    
-    def __init__(self, parts_path=PARTS_PATH):
-        self.parts_path = parts_path
-        self.textures = {}
-        self.texture_info = {}
-        self.load_all_textures()
-    
-    def load_texture(self, image_path):
-        """Load a single texture"""
-        if not os.path.exists(image_path):
-            logger.error(f"Texture not found: {image_path}")
-            # Create a placeholder texture
-            return self.create_placeholder_texture(), 64, 64
-        
+            logger.error(f"Error reading conversation spool: {e}")
+        return records
+    
+    def append_spool(self, records):
+        self.append_records(self.spool_path, records)
+    
+    def append_records(self, path, records):
         try:
-            img = Image.open(image_path).convert("RGBA")
-            img_data = np.array(list(img.getdata()), np.uint8)
-            texture_id = glGenTextures(1)
-            glBindTexture(GL_TEXTURE_2D, texture_id)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, img.width, img.height, 0, GL_RGBA, GL_UNSIGNED_BYTE, img_data)
-            return texture_id, img.width, img.height
+            with open(path, 'a') as f:
+                for record in records:
+                    f.write(json.dumps(record) + "\n")
         except Exception as e:
-            logger.error(f"Error loading texture '{image_path}': {e}")
-            return self.create_placeholder_texture(), 64, 64
-    
-    def create_placeholder_texture(self):
-        """Create a placeholder texture when image files are missing"""
-        # Create a simple 64x64 white texture
-        img_data = np.full((64, 64, 4), 255, dtype=np.uint8)
-        texture_id = glGenTextures(1)
-        glBindTexture(GL_TEXTURE_2D, texture_id)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, 64, 64, 0, GL_RGBA, GL_UNSIGNED_BYTE, img_data)
-        return texture_id
-    
-    def load_all_textures(self):
-        """Load all required textures"""
-        logger.info("Loading textures...")
-        
-        # Try to load textures, fall back to placeholder if missing
-        texture_files = {
-            "base": "base.png",
-            "l_eye_bg": "left_eye_background_and_border.png",
-            "r_eye_bg": "right_eye_background_and_border.png",
-            "l_pupil": "left_eye_pupil.png",
-            "r_pupil": "right_eye_pupil.png",
-        }
-        
-        for key, filename in texture_files.items():
-            file_path = os.path.join(self.parts_path, filename)
-            tex_id, w, h = self.load_texture(file_path)
-            self.textures[key] = tex_id
-            self.texture_info[key] = (w, h)
-        
-        logger.info(f"Loaded {len(self.textures)} textures")
+            logger.error(f"Error writing {path}: {e}")
+    
+    def rewrite_spool(self, records):
+        try:
+            if not records:
+                os.remove(self.spool_path)
+                return
+            temp_path = self.spool_path + ".tmp"
+            with open(temp_path, 'w') as f:
+                for record in records:
+                    f.write(json.dumps(record) + "\n")
+            os.replace(temp_path, self.spool_path)
+        except Exception as e:
+            logger.error(f"Error rewriting conversation spool: {e}")
+    
+    def close(self, timeout=2.0):
+        """Flush what is queued and stop the worker"""
+        self.records.put(self.stop_marker)
+        self.thread.join(timeout=timeout)
 
-class FaceRenderer:
-    """Enhanced Face Renderer with loading mode support"""
-    
-    def __init__(self, window_width, window_height, texture_manager):
-        self.window_width = window_width
-        self.window_height = window_height
-        self.texture_manager = texture_manager
-        self.update_face_dimensions()
-        
-        # Animation timing
-        self.last_update_time = time.time()
-        
-        # Background color state
-        self.current_bg_color = list(BG_COLOR_NORMAL)
-        self.target_bg_color = list(BG_COLOR_NORMAL)
-    
-    def update_face_dimensions(self):
-        """Update face dimensions based on window size"""
-        self.center_x = self.window_width / 2
-        self.center_y = self.window_height / 2
-        
-        # Scale face based on window size
-        base_size = min(self.window_width, self.window_height)
-        self.face_height = base_size * 0.8
-        
-        # Get aspect ratio from base texture if available
-        if "base" in self.texture_manager.texture_info:
-            base_w, base_h = self.texture_manager.texture_info["base"]
-            aspect_ratio = base_w / base_h
-            self.face_width = self.face_height * aspect_ratio
-        else:
-            self.face_width = self.face_height * 0.8
-        
-        # Calculate component dimensions relative to face size
-        self.eye_y_offset = self.face_height * 0.08
-        self.eye_x_offset = self.face_width * 0.18
-        self.eye_size = self.face_width * 0.28
-        self.pupil_size = self.eye_size * 0.6
-        
-        # Eyebrow dimensions
-        self.brow_y_offset = self.face_height * 0.22
-        self.brow_size = self.eye_size * 1.0
-        
-        # Mouth dimensions
-        self.mouth_y_offset = self.face_height * 0.2
-        self.mouth_width = self.face_width * 0.25
-        self.mouth_height = self.face_width * 0.06
-        
-        logger.info(f"Face dimensions updated: {self.face_width}x{self.face_height}")
-    
-    def resize_window(self, new_width, new_height):
-        """Handle window resize"""
-        self.window_width = new_width
-        self.window_height = new_height
-        self.update_face_dimensions()
-        
-        # Update OpenGL viewport
-        glViewport(0, 0, new_width, new_height)
-        glMatrixMode(GL_PROJECTION)
-        glLoadIdentity()
-        gluOrtho2D(0, new_width, 0, new_height)
-        glMatrixMode(GL_MODELVIEW)
-    
-    def update_background_color(self, is_loading, dt):
-        """Update background color based on mode"""
-        if is_loading:
-            self.target_bg_color = list(BG_COLOR_LOADING)
-        else:
-            self.target_bg_color = list(BG_COLOR_NORMAL)
-        
-        # Smooth transition
-        for i in range(4):
-            self.current_bg_color[i] += (self.target_bg_color[i] - self.current_bg_color[i]) * dt * 3.0
-        
-        glClearColor(*self.current_bg_color)
-    
-    def create_quad_mesh(self, cx, cy, width, height):
-        """Create a quad mesh for rendering"""
-        x1, y1 = cx - width / 2, cy - height / 2
-        x2, y2 = cx + width / 2, cy + height / 2
-        vertices = np.array([(x1, y1), (x2, y1), (x2, y2), (x1, y2)], dtype=np.float32)
-        tex_coords = np.array([(0, 1), (1, 1), (1, 0), (0, 0)], dtype=np.float32)
-        return vertices, tex_coords
-    
-    def create_curved_eyebrow_mesh(self, cx, cy, width, height, curve_strength=0.3):
-        """Create curved eyebrow mesh"""
-        segments = 10
-        vertices = []
-        
-        for i in range(segments + 1):
-            t = i / segments
-            x = cx - width/2 + t * width
-            curve_y = math.sin(t * math.pi) * curve_strength * height
-            top_y = cy + height/2 + curve_y
-            bottom_y = cy - height/2 + curve_y * 0.3
-            vertices.extend([(x, bottom_y), (x, top_y)])
-        
-        return np.array(vertices, dtype=np.float32)
-    
-    def create_enhanced_lip_mesh(self, cx, cy, width, height, phoneme_type, is_upper=True, curve_amount=0.0, segments=32):
-        """Create enhanced lip mesh based on phoneme type for realistic speech"""
-        def cubic_bezier(p0, p1, p2, p3, t):
-            u = 1 - t
-            return (u**3)*p0 + 3*(u**2)*t*p1 + 3*u*(t**2)*p2 + (t**3)*p3
-        
-        # Phoneme-specific lip shapes
-        if phoneme_type.startswith('vowel_wide'):
-            # Wide open mouth (a, e)
-            if is_upper:
-                p0 = np.array([0.0, 0.1])
-                p1 = np.array([0.25, 0.4 + curve_amount])
-                p2 = np.array([0.75, 0.4 + curve_amount])
-                p3 = np.array([1.0, 0.1])
-            else:
-                p0 = np.array([0.0, -0.1 - curve_amount])
-                p1 = np.array([0.25, -0.5 - curve_amount])
-                p2 = np.array([0.75, -0.5 - curve_amount])
-                p3 = np.array([1.0, -0.1 - curve_amount])
-        
-        elif phoneme_type.startswith('vowel_round'):
-            # Round lips (o, u)
-            if is_upper:
-                p0 = np.array([0.0, 0.05])
-                p1 = np.array([0.25, 0.25 + curve_amount])
-                p2 = np.array([0.75, 0.25 + curve_amount])
-                p3 = np.array([1.0, 0.05])
-            else:
-                p0 = np.array([0.0, -0.05 - curve_amount])
-                p1 = np.array([0.25, -0.25 - curve_amount])
-                p2 = np.array([0.75, -0.25 - curve_amount])
-                p3 = np.array([1.0, -0.05 - curve_amount])
-        
-        elif phoneme_type.startswith('vowel_narrow'):
-            # Narrow opening (i)
-            if is_upper:
-                p0 = np.array([0.0, 0.02])
-                p1 = np.array([0.25, 0.15 + curve_amount])
-                p2 = np.array([0.75, 0.15 + curve_amount])
-                p3 = np.array([1.0, 0.02])
-            else:
-                p0 = np.array([0.0, -0.02 - curve_amount])
-                p1 = np.array([0.25, -0.15 - curve_amount])
-                p2 = np.array([0.75, -0.15 - curve_amount])
-                p3 = np.array([1.0, -0.02 - curve_amount])
-        
-        elif phoneme_type.startswith('bilabial'):
-            # Lips together (b, p, m)
-            if is_upper:
-                p0 = np.array([0.0, 0.0])
-                p1 = np.array([0.25, 0.05 + curve_amount])
-                p2 = np.array([0.75, 0.05 + curve_amount])
-                p3 = np.array([1.0, 0.0])
-            else:
-                p0 = np.array([0.0, 0.0 - curve_amount])
-                p1 = np.array([0.25, -0.05 - curve_amount])
-                p2 = np.array([0.75, -0.05 - curve_amount])
-                p3 = np.array([1.0, 0.0 - curve_amount])
-        
-        else:
-            # Default shape
-            if is_upper:
-                p0 = np.array([0.0, 0.0])
-                p1 = np.array([0.25, 0.2 + curve_amount])
-                p2 = np.array([0.75, 0.2 + curve_amount])
-                p3 = np.array([1.0, 0.0])
-            else:
-                p0 = np.array([0.0, 0.1 - curve_amount])
-                p1 = np.array([0.25, -0.2 - curve_amount])
-                p2 = np.array([0.75, -0.2 - curve_amount])
-                p3 = np.array([1.0, 0.1 - curve_amount])
-        
-        # Generate mesh
-        thickness = 0.5
-        outer, inner = [], []
-        for i in range(segments + 1):
-            t = i / segments
-            x_norm, y_norm = cubic_bezier(p0, p1, p2, p3, t)
-            x_world = cx - width/2 + x_norm * width
-            y_world = cy + y_norm * height
-            
-            dir_y = 1.0 if is_upper else -1.0
-            offset = dir_y * thickness * height
-            outer.append((x_world, y_world))
-            inner.append((x_world, y_world - offset))
-        
-        verts = []
-        for (xo, yo), (xi, yi) in zip(outer, inner):
-            verts.extend([(xo, yo), (xi, yi)])
-        return np.array(verts, dtype=np.float32)
-    
-    def draw_quad(self, vertices, tex_coords, texture_id):
-        """Draw textured quad"""
-        glEnable(GL_TEXTURE_2D)
-        glBindTexture(GL_TEXTURE_2D, texture_id)
-        glEnableClientState(GL_VERTEX_ARRAY)
-        glEnableClientState(GL_TEXTURE_COORD_ARRAY)
-        glVertexPointer(2, GL_FLOAT, 0, vertices)
-        glTexCoordPointer(2, GL_FLOAT, 0, tex_coords)
-        glDrawArrays(GL_QUADS, 0, 4)
-        glDisableClientState(GL_VERTEX_ARRAY)
-        glDisableClientState(GL_TEXTURE_COORD_ARRAY)
-        glDisable(GL_TEXTURE_2D)
-    
-    def draw_curved_shape(self, vertices, color):
-        """Draw curved shape using triangle strip - FIXED: No color change during speech"""
-        glDisable(GL_TEXTURE_2D)
-        # Always use the same color, don't change during speech
-        glColor4f(*color)
-        glEnableClientState(GL_VERTEX_ARRAY)
-        glVertexPointer(2, GL_FLOAT, 0, vertices)
-        glDrawArrays(GL_TRIANGLE_STRIP, 0, len(vertices))
-        glDisableClientState(GL_VERTEX_ARRAY)
-        glColor4f(1.0, 1.0, 1.0, 1.0)  # Reset to white
-    
-    def draw_scaled_quad(self, vertices, tex_coords, texture_id, scale_x=1.0, scale_y=1.0):
-        """Draw scaled quad"""
-        glPushMatrix()
-        center_x = (vertices[0][0] + vertices[2][0]) / 2
-        center_y = (vertices[0][1] + vertices[2][1]) / 2
-        glTranslatef(center_x, center_y, 0)
-        glScalef(scale_x, scale_y, 1.0)
-        glTranslatef(-center_x, -center_y, 0)
-        self.draw_quad(vertices, tex_coords, texture_id)
-        glPopMatrix()
-    
-    def draw_cropped_quad(self, vertices, tex_coords, texture_id, crop_top=0.0, crop_bottom=0.0):
-        """Draw cropped quad for sleep animation"""
-        glPushMatrix()
-        cropped_vertices = np.copy(vertices)
-        cropped_tex_coords = np.copy(tex_coords)
-        
-        height = vertices[2][1] - vertices[0][1]
-        
-        if crop_top > 0:
-            crop_pixels = height * crop_top
-            cropped_vertices[2][1] -= crop_pixels
-            cropped_vertices[3][1] -= crop_pixels
-            cropped_tex_coords[2][1] = crop_top
-            cropped_tex_coords[3][1] = crop_top
-        
-        if crop_bottom > 0:
-            crop_pixels = height * crop_bottom
-            cropped_vertices[0][1] += crop_pixels
-            cropped_vertices[1][1] += crop_pixels
-            cropped_tex_coords[0][1] = 1.0 - crop_bottom
-            cropped_tex_coords[1][1] = 1.0 - crop_bottom
-        
-        self.draw_quad(cropped_vertices, cropped_tex_coords, texture_id)
-        glPopMatrix()
-    
-    def create_dynamic_coordinated_mouth_mesh(self, cx, cy, base_width, base_height, phoneme_type, curve_amount=0.0, emotion_name="neutral", segments=32):
-        """Create coordinated lips with dynamic width/length based on phonemes and emotions"""
-        
-        def cubic_bezier(p0, p1, p2, p3, t):
-            u = 1 - t
-            return (u**3)*p0 + 3*(u**2)*t*p1 + 3*u*(t**2)*p2 + (t**3)*p3
-        
-        # Emotion-based mouth width multipliers
-        emotion_width_factors = {
-            'happy': 1.4,          # Much wider smile
-            'amusement': 1.5,      # Even wider for laughter
-            'love': 1.2,           # Gentle wider smile
-            'surprise': 1.3,       # Wide open in surprise
-            'fear': 0.8,           # Tighter, smaller mouth
-            'sad': 0.7,            # Narrow, downturned
-            'angry': 0.9,          # Tense, slightly narrow
-            'disgust': 0.8,        # Tight, disgusted expression
-            'embarrassment': 0.8,  # Shy, smaller mouth
-            'confusion': 0.9,      # Slightly uncertain
-            'frustration': 0.85,   # Tense
-            'sleepy': 0.6,         # Very small, relaxed
-            'talking': 1.0,        # Normal when just talking
-            'cute_neutral': 1.1,   # Slightly wider for cuteness
-            'neutral': 1.0,        # Baseline
-            # Loading expressions
-            'loading_thinking': 0.9,
-            'loading_excited': 1.3,
-            'loading_curious': 1.1,
-            'loading_dizzy': 0.8,
-            'loading_focused': 0.8,
-        }
-        
-        # Phoneme-based width adjustments (additional to emotion)
-        phoneme_width_factors = {
-            'vowel_wide_a': 1.3,   # "Ah" - wide mouth
-            'vowel_mid_e': 1.2,    # "Eh" - moderately wide
-            'vowel_narrow_i': 0.7, # "Ee" - narrow, pulled back
-            'vowel_round_o': 0.9,  # "Oh" - round but not wide
-            'vowel_round_u': 0.8,  # "Oo" - narrow and round
-            'bilabial_b': 1.0,     # Normal width for "B"
-            'bilabial_p': 1.0,     # Normal width for "P"
-            'bilabial_m': 1.0,     # Normal width for "M"
-            'labiodental_f': 0.9,  # Slightly narrow for "F"
-            'labiodental_v': 0.9,  # Slightly narrow for "V"
-            'dental_t': 1.0,       # Normal for "T"
-            'dental_d': 1.0,       # Normal for "D"
-            'dental_n': 1.0,       # Normal for "N"
-            'dental_l': 1.0,       # Normal for "L"
-            'dental_r': 1.0,       # Normal for "R"
-            'sibilant_s': 0.85,    # Narrow for "S"
-            'sibilant_z': 0.85,    # Narrow for "Z"
-            'sibilant_sh': 0.9,    # Slightly narrow for "SH"
-            'sibilant_ch': 0.9,    # Slightly narrow for "CH"
-            'velar_k': 1.0,        # Normal for "K"
-            'velar_g': 1.0,        # Normal for "G"
-            'rounded_w': 0.8,      # Narrow and round for "W"
-            'palatal_y': 0.9,      # Slightly narrow for "Y"
-            'consonant_default': 1.0,
-            'pause': 1.0,
-            'neutral': 1.0
-        }
-        
-        # Calculate dynamic width
-        emotion_factor = emotion_width_factors.get(emotion_name, 1.0)
-        phoneme_factor = phoneme_width_factors.get(phoneme_type, 1.0)
-        
-        # Combine factors - emotion provides base, phoneme modifies it
-        total_width_factor = emotion_factor * phoneme_factor
-        dynamic_width = base_width * total_width_factor
-        
-        # Ensure width doesn't go too extreme
-        dynamic_width = max(base_width * 0.4, min(base_width * 1.8, dynamic_width))
-        
-        # Define mouth opening parameters based on phonemes
-        mouth_configs = {
-            'vowel_wide_a': {
-                'opening_width': 0.8, 'opening_height': 0.8,
-                'upper_curve': 0.3, 'lower_curve': 0.5,
-                'lip_thickness': 0.15, 'roundness': 0.2
-            },
-            'vowel_mid_e': {
-                'opening_width': 0.7, 'opening_height': 0.6,
-                'upper_curve': 0.25, 'lower_curve': 0.35,
-                'lip_thickness': 0.12, 'roundness': 0.3
-            },
-            'vowel_narrow_i': {
-                'opening_width': 0.3, 'opening_height': 0.25,
-                'upper_curve': 0.1, 'lower_curve': 0.15,
-                'lip_thickness': 0.1, 'roundness': 0.1
-            },
-            'vowel_round_o': {
-                'opening_width': 0.5, 'opening_height': 0.7,
-                'upper_curve': 0.4, 'lower_curve': 0.4,
-                'lip_thickness': 0.18, 'roundness': 0.9
-            },
-            'vowel_round_u': {
-                'opening_width': 0.3, 'opening_height': 0.5,
-                'upper_curve': 0.3, 'lower_curve': 0.3,
-                'lip_thickness': 0.16, 'roundness': 0.95
-            },
-            'bilabial_b': {
-                'opening_width': 0.0, 'opening_height': 0.0,
-                'upper_curve': 0.05, 'lower_curve': 0.05,
-                'lip_thickness': 0.12, 'roundness': 0.2
-            },
-            'bilabial_p': {
-                'opening_width': 0.0, 'opening_height': 0.0,
-                'upper_curve': 0.05, 'lower_curve': 0.05,
-                'lip_thickness': 0.12, 'roundness': 0.2
-            },
-            'bilabial_m': {
-                'opening_width': 0.0, 'opening_height': 0.0,
-                'upper_curve': 0.08, 'lower_curve': 0.08,
-                'lip_thickness': 0.14, 'roundness': 0.3
-            },
-            'labiodental_f': {
-                'opening_width': 0.2, 'opening_height': 0.15,
-                'upper_curve': 0.1, 'lower_curve': 0.2,
-                'lip_thickness': 0.1, 'roundness': 0.1
-            },
-            'labiodental_v': {
-                'opening_width': 0.2, 'opening_height': 0.15,
-                'upper_curve': 0.1, 'lower_curve': 0.2,
-                'lip_thickness': 0.1, 'roundness': 0.1
-            },
-            'dental_t': {
-                'opening_width': 0.3, 'opening_height': 0.25,
-                'upper_curve': 0.15, 'lower_curve': 0.2,
-                'lip_thickness': 0.1, 'roundness': 0.2
-            },
-            'dental_d': {
-                'opening_width': 0.3, 'opening_height': 0.25,
-                'upper_curve': 0.15, 'lower_curve': 0.2,
-                'lip_thickness': 0.1, 'roundness': 0.2
-            },
-            'dental_n': {
-                'opening_width': 0.25, 'opening_height': 0.2,
-                'upper_curve': 0.12, 'lower_curve': 0.18,
-                'lip_thickness': 0.12, 'roundness': 0.2
-            },
-            'dental_l': {
-                'opening_width': 0.3, 'opening_height': 0.2,
-                'upper_curve': 0.12, 'lower_curve': 0.18,
-                'lip_thickness': 0.1, 'roundness': 0.2
-            },
-            'dental_r': {
-                'opening_width': 0.35, 'opening_height': 0.25,
-                'upper_curve': 0.15, 'lower_curve': 0.2,
-                'lip_thickness': 0.12, 'roundness': 0.25
-            },
-            'sibilant_s': {
-                'opening_width': 0.15, 'opening_height': 0.1,
-                'upper_curve': 0.08, 'lower_curve': 0.12,
-                'lip_thickness': 0.08, 'roundness': 0.1
-            },
-            'sibilant_z': {
-                'opening_width': 0.15, 'opening_height': 0.1,
-                'upper_curve': 0.08, 'lower_curve': 0.12,
-                'lip_thickness': 0.08, 'roundness': 0.1
-            },
-            'sibilant_sh': {
-                'opening_width': 0.2, 'opening_height': 0.15,
-                'upper_curve': 0.1, 'lower_curve': 0.15,
-                'lip_thickness': 0.1, 'roundness': 0.3
-            },
-            'sibilant_ch': {
-                'opening_width': 0.18, 'opening_height': 0.12,
-                'upper_curve': 0.08, 'lower_curve': 0.12,
-                'lip_thickness': 0.09, 'roundness': 0.2
-            },
-            'velar_k': {
-                'opening_width': 0.25, 'opening_height': 0.2,
-                'upper_curve': 0.1, 'lower_curve': 0.15,
-                'lip_thickness': 0.1, 'roundness': 0.2
-            },
-            'velar_g': {
-                'opening_width': 0.25, 'opening_height': 0.2,
-                'upper_curve': 0.1, 'lower_curve': 0.15,
-                'lip_thickness': 0.1, 'roundness': 0.2
-            },
-            'rounded_w': {
-                'opening_width': 0.2, 'opening_height': 0.3,
-                'upper_curve': 0.2, 'lower_curve': 0.2,
-                'lip_thickness': 0.14, 'roundness': 0.8
-            },
-            'palatal_y': {
-                'opening_width': 0.2, 'opening_height': 0.15,
-                'upper_curve': 0.1, 'lower_curve': 0.15,
-                'lip_thickness': 0.1, 'roundness': 0.3
-            },
-            'consonant_default': {
-                'opening_width': 0.2, 'opening_height': 0.15,
-                'upper_curve': 0.1, 'lower_curve': 0.15,
-                'lip_thickness': 0.1, 'roundness': 0.2
-            },
-            'pause': {
-                'opening_width': 0.05, 'opening_height': 0.03,
-                'upper_curve': 0.05, 'lower_curve': 0.08,
-                'lip_thickness': 0.1, 'roundness': 0.2
-            },
-            'neutral': {
-                'opening_width': 0.1, 'opening_height': 0.05,
-                'upper_curve': 0.05, 'lower_curve': 0.08,
-                'lip_thickness': 0.1, 'roundness': 0.2
-            }
-        }
-        
-        # Get configuration for current phoneme
-        config = mouth_configs.get(phoneme_type, mouth_configs['neutral'])
-        
-        # Calculate actual dimensions
-        actual_width = dynamic_width
-        actual_height = base_height
-        
-        opening_width = config['opening_width'] * actual_width
-        opening_height = config['opening_height'] * actual_height
-        lip_thickness = config['lip_thickness'] * actual_height
-        roundness = config['roundness']
-        
-        # Adjust curves based on emotion curve_amount
-        upper_curve_strength = config['upper_curve'] + curve_amount * 0.4
-        lower_curve_strength = config['lower_curve'] - curve_amount * 0.4
-        
-        # Additional emotion-based curve adjustments
-        if emotion_name in ['happy', 'amusement', 'love']:
-            upper_curve_strength *= 0.8  # Less upper curve for smiles
-            lower_curve_strength *= 1.3  # More lower curve for smiles
-        elif emotion_name in ['sad', 'frustration']:
-            upper_curve_strength *= 1.2  # More upper curve for frowns
-            lower_curve_strength *= 0.7  # Less lower curve for frowns
-        
-        vertices = []
-        
-        # Create mouth opening and lip contours with dynamic width
-        for i in range(segments + 1):
-            t = i / segments
-            
-            # X position along the DYNAMIC mouth width
-            x = cx - actual_width/2 + t * actual_width
-            
-            # Calculate opening shape based on roundness
-            if roundness > 0.6:  # Round shapes (o, u, w)
-                # Elliptical opening with proper roundness
-                angle = t * math.pi
-                opening_y_offset = math.sin(angle) * opening_height/2
-                
-                # Create proper circular/oval shape
-                distance_from_center = abs(t - 0.5) * 2  # 0 at center, 1 at edges
-                opening_x_factor = math.sqrt(1 - distance_from_center ** (2.5 - roundness))
-                opening_y_offset *= opening_x_factor
-                
-            elif phoneme_type.startswith('vowel_wide'):  # Wide shapes (a, e)
-                # Wide opening across most of the mouth
-                center_factor = 1.0 - 2 * abs(t - 0.5)  # Linear from edges to center
-                opening_y_offset = center_factor * opening_height/2
-                
-            elif phoneme_type.startswith('vowel_narrow'):  # Narrow shapes (i)
-                # Narrow opening in the center
-                center_factor = 1.0 - 8 * (t - 0.5) ** 2  # Sharp peak at center
-                center_factor = max(0, center_factor)
-                opening_y_offset = center_factor * opening_height/2
-                
-            else:  # Other consonants
-                # Standard opening
-                center_factor = 1.0 - 4 * (t - 0.5) ** 2  # Moderate peak at center
-                center_factor = max(0, center_factor)
-                opening_y_offset = center_factor * opening_height/2
-            
-            # Apply emotional width stretching to the opening
-            width_stretch = (actual_width / base_width)
-            if width_stretch > 1.0:  # Mouth is wider than normal
-                # For wide emotions, make the opening extend more across the width
-                edge_factor = 1.0 - 2 * abs(t - 0.5)  # 1 at center, 0 at edges
-                width_opening_boost = (width_stretch - 1.0) * edge_factor * 0.3
-                opening_y_offset += width_opening_boost * opening_height
-            
-            # Upper lip outer contour
-            upper_outer_curve = math.sin(t * math.pi) * upper_curve_strength * actual_height
-            upper_outer_y = cy + opening_y_offset/2 + upper_outer_curve + lip_thickness/2
-            
-            # Upper lip inner contour (mouth opening)
-            upper_inner_y = cy + opening_y_offset/2
-            
-            # Lower lip inner contour (mouth opening)
-            lower_inner_y = cy - opening_y_offset/2
-            
-            # Lower lip outer contour
-            lower_outer_curve = math.sin(t * math.pi) * lower_curve_strength * actual_height
-            lower_outer_y = cy - opening_y_offset/2 - lower_outer_curve - lip_thickness/2
-            
-            # Add vertices for triangle strip rendering
-            # Each segment creates 4 vertices: upper_outer, upper_inner, lower_outer, lower_inner
-            vertices.extend([
-                (x, upper_outer_y),
-                (x, upper_inner_y),
-                (x, lower_outer_y),
-                (x, lower_inner_y)
-            ])
-        
-        return np.array(vertices, dtype=np.float32), actual_width
+class LinkStatus:
+    """Health of the API link as seen by LinkSupervisor"""
+    UNKNOWN = "unknown"
+    ONLINE = "online"
+    DEGRADED = "degraded"
+    OFFLINE = "offline"
 
-    def draw_dynamic_coordinated_mouth(self, vertices, color):
-        """Draw the coordinated mouth with proper topology for realistic lips"""
-        glDisable(GL_TEXTURE_2D)
-        glColor4f(*color)
-        
-        glEnableClientState(GL_VERTEX_ARRAY)
-        glVertexPointer(2, GL_FLOAT, 0, vertices)
-        
-        segments = len(vertices) // 4 - 1  # Number of segments
-        
-        # Draw upper lip as quad strip
-        upper_indices = []
-        for i in range(segments):
-            base_idx = i * 4
-            next_base_idx = (i + 1) * 4
-            # Create quad: current_outer, current_inner, next_inner, next_outer
-            upper_indices.extend([
-                base_idx,      # current upper outer
-                base_idx + 1,  # current upper inner
-                next_base_idx + 1,  # next upper inner
-                next_base_idx       # next upper outer
-            ])
-        
-        if upper_indices:
-            glDrawElements(GL_QUADS, len(upper_indices), GL_UNSIGNED_INT, 
-                          np.array(upper_indices, dtype=np.uint32))
-        
-        # Draw lower lip as quad strip
-        lower_indices = []
-        for i in range(segments):
-            base_idx = i * 4
-            next_base_idx = (i + 1) * 4
-            # Create quad: current_inner, current_outer, next_outer, next_inner
-            lower_indices.extend([
-                base_idx + 3,  # current lower inner
-                base_idx + 2,  # current lower outer
-                next_base_idx + 2,  # next lower outer
-                next_base_idx + 3   # next lower inner
-            ])
-        
-        if lower_indices:
-            glDrawElements(GL_QUADS, len(lower_indices), GL_UNSIGNED_INT, 
-                          np.array(lower_indices, dtype=np.uint32))
-        
-        glDisableClientState(GL_VERTEX_ARRAY)
-        glColor4f(1.0, 1.0, 1.0, 1.0)  # Reset to white
-    
-    def render_face(self, avatar_state):
-        """Render the complete face with loading mode support"""
-        # Update background color
-        dt = time.time() - self.last_update_time
-        self.update_background_color(avatar_state.is_loading, dt)
-        self.last_update_time = time.time()
-        
-        glClear(GL_COLOR_BUFFER_BIT)
-        glLoadIdentity()
-        
-        # Create meshes dynamically based on current window size
-        face_v, face_tc = self.create_quad_mesh(self.center_x, self.center_y, self.face_width, self.face_height)
-        
-        # Eye backgrounds
-        l_eye_v, l_eye_tc = self.create_quad_mesh(
-            self.center_x - self.eye_x_offset, 
-            self.center_y + self.eye_y_offset, 
-            self.eye_size, self.eye_size * 0.8
-        )
-        r_eye_v, r_eye_tc = self.create_quad_mesh(
-            self.center_x + self.eye_x_offset, 
-            self.center_y + self.eye_y_offset, 
-            self.eye_size, self.eye_size * 0.8
-        )
-        
-        # Pupils
-        l_pupil_v, l_pupil_tc = self.create_quad_mesh(
-            self.center_x - self.eye_x_offset, 
-            self.center_y + self.eye_y_offset, 
-            self.pupil_size, self.pupil_size
-        )
-        r_pupil_v, r_pupil_tc = self.create_quad_mesh(
-            self.center_x + self.eye_x_offset, 
-            self.center_y + self.eye_y_offset, 
-            self.pupil_size, self.pupil_size
-        )
-        
-        # Eyebrows
-        l_brow_v = self.create_curved_eyebrow_mesh(
-            self.center_x - self.eye_x_offset, 
-            self.center_y + self.brow_y_offset, 
-            self.brow_size, self.eye_size * 0.05
-        )
-        r_brow_v = self.create_curved_eyebrow_mesh(
-            self.center_x + self.eye_x_offset, 
-            self.center_y + self.brow_y_offset, 
-            self.brow_size, self.eye_size * 0.05
-        )
-        
-        # Calculate movement ranges
-        pupil_movement_range = np.array([self.eye_size * 0.15, self.eye_size * 0.1])
-        
-        # 1. Base Face
-        if "base" in self.texture_manager.textures:
-            self.draw_quad(face_v, face_tc, self.texture_manager.textures["base"])
-        
-        # 2. Eye Backgrounds with blink scaling
-        eye_scale_y = avatar_state.eye_open_ratio
-        if "l_eye_bg" in self.texture_manager.textures:
-            self.draw_scaled_quad(l_eye_v, l_eye_tc, self.texture_manager.textures["l_eye_bg"], 1.0, eye_scale_y)
-        if "r_eye_bg" in self.texture_manager.textures:
-            self.draw_scaled_quad(r_eye_v, r_eye_tc, self.texture_manager.textures["r_eye_bg"], 1.0, eye_scale_y)
-        
-        # 3. Pupils with enhanced movement and sleep handling
-        pupil_offset = avatar_state.pupil_pos * pupil_movement_range
-        pupil_scale = avatar_state.pupil_size
-        
-        if avatar_state.is_sleeping:
-            crop_top_amount = max(0.0, 1.0 - avatar_state.eye_open_ratio * 0.8)
-            pupil_offset_y = pupil_offset[1] + self.eye_size * 0.22
+class LinkSupervisor:
+    """Probes /health in the background with jittered intervals and tracks link quality.
+    RTT is smoothed with an EWMA; real requests feed in as well, so a slow or failed turn
+    changes the mode of the next one instead of waiting for the next probe."""
+    
+    # Per-turn request modes
+    STREAMING = "streaming"  # Upload audio, stream the reply
+    TEXT_ONLY = "text_only"  # Send the local transcript only, no audio upload
+    OFFLINE = "offline"  # Answer locally without touching the network
+    
+    def __init__(self, client, interval=LINK_PROBE_INTERVAL, jitter=LINK_PROBE_JITTER,
+                 reconnect_interval=LINK_RECONNECT_INTERVAL, timeout=LINK_PROBE_TIMEOUT):
+        self.client = client
+        self.interval = interval
+        self.jitter = jitter
+        self.reconnect_interval = reconnect_interval
+        self.timeout = timeout
+        
+        self.rtt = None  # EWMA of /health round trips, seconds
+        self.failures = 0
+        self.slow_request = False
+        self.status = LinkStatus.UNKNOWN
+        self.lock = threading.Lock()
+        self.probe_now = threading.Event()
+        self.stopped = threading.Event()
+        
+        self.thread = threading.Thread(target=self.worker, name="link-supervisor")
+        self.thread.daemon = True
+        self.thread.start()
+    
+    def worker(self):
+        retry_delay = self.reconnect_interval
+        while not self.stopped.is_set():
+            self.probe()
             
-            glPushMatrix()
-            glTranslatef(pupil_offset[0], pupil_offset_y, 0)
-            if "l_pupil" in self.texture_manager.textures:
-                self.draw_cropped_quad(l_pupil_v, l_pupil_tc, self.texture_manager.textures["l_pupil"], crop_top=crop_top_amount)
-            glPopMatrix()
+            if self.status == LinkStatus.OFFLINE:
+                # Reconnect: retry quickly, backing off towards the normal interval
+                delay = retry_delay
+                retry_delay = min(retry_delay * 2, self.interval)
+            else:
+                delay = self.interval
+                retry_delay = self.reconnect_interval
             
-            glPushMatrix()
-            glTranslatef(pupil_offset[0], pupil_offset_y, 0)
-            if "r_pupil" in self.texture_manager.textures:
-                self.draw_cropped_quad(r_pupil_v, r_pupil_tc, self.texture_manager.textures["r_pupil"], crop_top=crop_top_amount)
-            glPopMatrix()
+            # Jitter keeps a fleet of robots from probing in lockstep
+            delay *= random.uniform(1.0 - self.jitter, 1.0 + self.jitter)
+            self.probe_now.wait(delay)
+            self.probe_now.clear()
+    
+    def probe(self):
+        start = time.monotonic()
+        ok = self.client.test_api_connection(timeout=self.timeout, quiet=self.status != LinkStatus.UNKNOWN)
+        with self.lock:
+            if ok:
+                sample = time.monotonic() - start
+                self.rtt = sample if self.rtt is None else self.rtt + LINK_RTT_ALPHA * (sample - self.rtt)
+                self.failures = 0
+            else:
+                self.failures += 1
+            self.update_status()
+    
+    def record_request(self, elapsed):
+        """A request got its response headers after elapsed seconds"""
+        with self.lock:
+            self.failures = 0
+            self.slow_request = elapsed > SLOW_LINK_SECONDS
+            self.update_status()
+    
+    def record_failure(self):
+        """A request failed: count it and re-probe right away"""
+        with self.lock:
+            self.failures += 1
+            self.update_status()
+        self.probe_now.set()
+    
+    def update_status(self):
+        if self.failures >= LINK_OFFLINE_FAILURES:
+            status = LinkStatus.OFFLINE
+        elif self.failures or self.slow_request or (self.rtt is not None and self.rtt > LINK_DEGRADED_RTT):
+            status = LinkStatus.DEGRADED
+        elif self.rtt is None:
+            status = LinkStatus.UNKNOWN
         else:
-            pupil_scale_y = pupil_scale * eye_scale_y
-            
-            glPushMatrix()
-            glTranslatef(pupil_offset[0], pupil_offset[1], 0)
-            if "l_pupil" in self.texture_manager.textures:
-                self.draw_scaled_quad(l_pupil_v, l_pupil_tc, self.texture_manager.textures["l_pupil"], pupil_scale, pupil_scale_y)
-            glPopMatrix()
-            
-            glPushMatrix()
-            glTranslatef(pupil_offset[0], pupil_offset[1], 0)
-            if "r_pupil" in self.texture_manager.textures:
-                self.draw_scaled_quad(r_pupil_v, r_pupil_tc, self.texture_manager.textures["r_pupil"], pupil_scale, pupil_scale_y)
-            glPopMatrix()
-        
-        # 4. Curved Eyebrows (keep same color always)
-        y_offset = avatar_state.eyebrow_y * self.face_height
-        rotation = avatar_state.eyebrow_r
-        
-        for brow_v, rot_dir in [(l_brow_v, 1), (r_brow_v, -1)]:
-            glPushMatrix()
-            center_x = np.mean(brow_v[::2, 0])
-            center_y = np.mean(brow_v[::2, 1]) + y_offset
-            
-            glTranslatef(center_x, center_y, 0)
-            glRotatef(rotation * rot_dir, 0, 0, 1)
-            glTranslatef(-center_x, -center_y + y_offset, 0)
-            
-            adjusted_brow_v = np.copy(brow_v)
-            adjusted_brow_v[:, 1] += y_offset
-            
-            # FIXED: Always use same color for eyebrows
-            self.draw_curved_shape(adjusted_brow_v, LIP_EYEBROW_COLOR_GL)
-            glPopMatrix()
-        
-        # 5. Enhanced Dynamic Coordinated Lip Rendering (NEW VERSION)
-        curve_amount = avatar_state.mouth_curve
-        current_phoneme = 'neutral'
-        
-        # Get current phoneme if speaking
-        if avatar_state.is_speaking and avatar_state.speech_phonemes:
-            elapsed = time.time() - avatar_state.speech_start_time
-            phoneme_time = 0
-            
-            for phoneme_type, duration in avatar_state.speech_phonemes:
-                if elapsed < phoneme_time + duration:
-                    current_phoneme = phoneme_type
-                    break
-                phoneme_time += duration
-        
-        # Create dynamic coordinated mouth mesh with emotion-based width
-        mouth_vertices, actual_mouth_width = self.create_dynamic_coordinated_mouth_mesh(
-            self.center_x, 
-            self.center_y - self.mouth_y_offset, 
-            self.mouth_width, 
-            self.mouth_height, 
-            current_phoneme,
-            curve_amount=curve_amount,
-            emotion_name=avatar_state.target_emotion
-        )
+            status = LinkStatus.ONLINE
         
-        # Draw coordinated mouth
-        self.draw_dynamic_coordinated_mouth(mouth_vertices, LIP_EYEBROW_COLOR_GL)
-
+        if status != self.status:
+            rtt_ms = f"{self.rtt * 1000:.0f}ms" if self.rtt is not None else "n/a"
+            logger.info(f"API link: {self.status} -> {status} (rtt {rtt_ms}, failures {self.failures})")
+            self.status = status
+    
+    def turn_mode(self):
+        """Request mode for the next turn, decided before anything is sent"""
+        with self.lock:
+            status = self.status
+        if status == LinkStatus.OFFLINE:
+            return self.OFFLINE
+        if status == LinkStatus.DEGRADED:
+            return self.TEXT_ONLY
+        return self.STREAMING
+    
+    def close(self):
+        self.stopped.set()
+        self.probe_now.set()
 
 class VoiceController:
     """Enhanced voice controller with local detection"""
@@ -1372,31 +1675,537 @@ class VoiceController:
 
         return None
     
-    def listen_for_wake_command(self):
-        """Listen for wake command locally"""
-        return self.local_detector.listen_for_wake_word()
+    def strip_wake_phrase(self, text):
+        """Normalized text without the wake words it starts with (a pre-rolled turn begins with them)"""
+        words = command_words(text)
+        while words:
+            stripped = strip_wake_word(words, self.wake_keywords)
+            if stripped is None:
+                break
+            words = stripped
+        return ' '.join(words)
+    
+    def match_local_command(self, text):
+        """Map a local transcript to ('sleep' | action | None, command_only); see match_command.
+        command_only means no server reply is needed."""
+        return match_command(command_words(text) if text else [], self.sleep_keywords, self.wake_keywords)
 
-class EnhancedRobotFaceSystem:
+class ConversationPipeline:
+    """Asyncio conversation pipeline running on its own thread.
+    Wake, capture, request and playback stages are tasks joined by bounded queues; blocking
+    audio/network calls run in a thread pool. UI changes go back to the render loop through
+    a thread-safe channel drained once per frame."""
+    
+    def __init__(self, system, queue_size=1, workers=6, overlap_turns=True):
+        self.system = system
+        self.queue_size = queue_size
+        self.overlap_turns = overlap_turns  # Start the next capture as soon as a reply starts playing
+        self.ui_events = queue.Queue()  # pipeline -> render loop
+        self.loop = asyncio.new_event_loop()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pipeline")
+        self.pending_jobs = set()  # Submitted pool jobs, cancelled on shutdown
+        self.thread = threading.Thread(target=self.run_loop, name="conversation-pipeline")
+        self.thread.daemon = True
+        
+        self.state_changed = None
+        self.conversation_tasks = []
+        self.recordings = None
+        self.responses = None
+        self.turn_done = None
+        self.capture_released = False
+        self.deadline = None  # RequestDeadline of the turn currently in the request stage
+    
+    # Lifecycle (called from the render thread)
+    def start(self):
+        self.thread.start()
+        logger.info("Conversation pipeline started")
+    
+    def run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.state_changed = asyncio.Event()
+        self.system.state_machine.add_listener(self.on_state_transition)
+        self.loop.create_task(self.supervise("wake", self.wake_stage))
+        self.loop.run_forever()
+        
+        # Structured shutdown: cancel whatever is still running
+        pending = asyncio.all_tasks(self.loop)
+        for task in pending:
+            task.cancel()
+        self.loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        self.loop.close()
+    
+    def shutdown(self, timeout=2.0):
+        # Abort in-flight requests first; their daemon threads are not waited for
+        if self.deadline is not None:
+            self.deadline.cancel()
+        # Pool jobs are joined at interpreter exit: end the recording loop and drop waiting robot actions
+        assistant = self.system.voice_assistant
+        assistant.closed = True
+        assistant.is_recording = False
+        robot_actions_stopped.set()
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=timeout)
+        # ThreadPoolExecutor.shutdown(cancel_futures=True) needs Python 3.9: cancel queued jobs by hand
+        for job in list(self.pending_jobs):
+            job.cancel()
+        self.executor.shutdown(wait=False)
+    
+    def start_conversation(self):
+        """Thread-safe: begin the capture/request/playback stages"""
+        self.loop.call_soon_threadsafe(self._start_conversation)
+    
+    def stop_conversation(self):
+        """Thread-safe: cancel the conversation stages and drop queued turns"""
+        self.loop.call_soon_threadsafe(self._stop_conversation)
+    
+    # Thread-safe channels
+    def on_state_transition(self, old_state, new_state):
+        try:
+            self.loop.call_soon_threadsafe(self.state_changed.set)
+        except RuntimeError:
+            pass  # Loop already closed during shutdown
+    
+    def ui(self, callback, *args):
+        """Queue a call to run on the render thread"""
+        self.ui_events.put((callback, args))
+        try:
+            pygame.event.post(pygame.event.Event(PIPELINE_UI_EVENT))  # Wake an idle render loop
+        except pygame.error:
+            pass  # Display already shut down
+    
+    def process_ui_events(self):
+        """Render thread: apply queued UI changes"""
+        while True:
+            try:
+                callback, args = self.ui_events.get_nowait()
+            except queue.Empty:
+                return
+            callback(*args)
+    
+    # Loop-side helpers
+    async def run_blocking(self, func, *args, **kwargs):
+        job = self.executor.submit(func, *args, **kwargs)
+        self.pending_jobs.add(job)
+        job.add_done_callback(self.pending_jobs.discard)
+        return await asyncio.wrap_future(job, loop=self.loop)
+    
+    async def run_request(self, deadline, func, *args):
+        """Run a network call under the turn deadline. Returns None once the budget is spent.
+        The call runs on a daemon thread so an abandoned request never delays shutdown."""
+        future = Future()
+        
+        def worker():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(func(*args, deadline=deadline))
+            except BaseException as e:
+                future.set_exception(e)
+        
+        thread = threading.Thread(target=worker, name="api-request")
+        thread.daemon = True
+        thread.start()
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future, loop=self.loop), deadline.remaining())
+        except asyncio.TimeoutError:
+            logger.warning(f"Turn latency budget exhausted in {func.__name__}")
+            deadline.cancel()
+            return None
+        except asyncio.CancelledError:
+            deadline.cancel()
+            raise
+    
+    async def wait_for_state(self, predicate):
+        while not predicate():
+            self.state_changed.clear()
+            if predicate():
+                break
+            await self.state_changed.wait()
+    
+    async def supervise(self, name, stage):
+        """Run a stage, logging and restarting it on failure instead of dying silently"""
+        while True:
+            try:
+                await stage()
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Pipeline stage '{name}' failed, restarting: {e}")
+                self.ui(self.system.stop_loading_mode)
+                self.system.state_machine.transition(RobotState.LISTENING, allowed_from=AWAKE_STATES)
+                if self.turn_done is not None:
+                    self.turn_done.set()
+                await asyncio.sleep(1.0)
+    
+    def _start_conversation(self):
+        if any(not task.done() for task in self.conversation_tasks):
+            return
+        self.recordings = asyncio.Queue(maxsize=self.queue_size)
+        self.responses = asyncio.Queue(maxsize=self.queue_size)
+        self.turn_done = asyncio.Event()
+        self.turn_done.set()
+        self.conversation_tasks = [
+            self.loop.create_task(self.supervise("capture", self.capture_stage)),
+            self.loop.create_task(self.supervise("request", self.request_stage)),
+            self.loop.create_task(self.supervise("playback", self.playback_stage)),
+        ]
+    
+    def _stop_conversation(self):
+        for task in self.conversation_tasks:
+            task.cancel()
+        self.conversation_tasks = []
+        if self.deadline is not None:
+            self.deadline.cancel()
+        
+        # Release downloads held by turns that will never play
+        if self.responses is not None:
+            while not self.responses.empty():
+                turn = self.responses.get_nowait()
+                self.system.voice_assistant.discard_response(turn['response'])
+    
+    # Stages
+    async def wake_stage(self):
+        """Decode wake words block by block while sleeping; idle (no polling) while awake"""
+        system = self.system
+        detector = system.voice_controller.local_detector
+        
+        while True:
+            await self.wait_for_state(lambda: system.is_sleeping)
+            await self.run_blocking(detector.discard_pending)
+            
+            while system.is_sleeping:
+                result = await self.run_blocking(detector.process_block)
+                if result is True:  # Wake command detected
+                    logger.info("Wake command detected locally")
+                    system.use_preroll = True
+                    self.ui(system.wake_up)
+                    try:
+                        await asyncio.wait_for(self.wait_for_state(lambda: not system.is_sleeping), 2.0)
+                    except asyncio.TimeoutError:
+                        pass
+                    break
+    
+    async def capture_stage(self):
+        """Record one utterance per turn and hand it to the request stage"""
+        system = self.system
+        assistant = system.voice_assistant
+        
+        while True:
+            # Released when the previous reply starts playing (overlap_turns) or has finished
+            await self.turn_done.wait()
+            
+            logger.info("Listening for voice input...")
+            trace = system.tracer.start_turn()
+            overlapped = self.overlap_turns and assistant.audio_output.is_busy()
+            if overlapped:
+                # Reply still playing: keep SPEAKING until it ends or the user barges in
+                if system.is_sleeping:
+                    return
+            else:
+                self.ui(system.set_expression, "happy")
+                if not system.state_machine.transition(RobotState.RECORDING, allowed_from=AWAKE_STATES):
+                    return
+            self.turn_done.clear()
+            assistant.is_recording = True
+            assistant.is_processing = False
+            
+            preroll = b''
+            if system.use_preroll:
+                preroll = await self.run_blocking(system.voice_controller.local_detector.capture_preroll)
+                system.use_preroll = False
+            
+            with trace.span('record'):
+                recording = await self.run_blocking(
+                    assistant.record_audio_with_minimum_time,
+                    preroll=preroll, on_intent=lambda action: start_robot_action(action, trace),
+                    barge_in=overlapped,
+                    keep_recording=lambda: system.state_machine.state in CAPTURE_STATES)
+            assistant.is_recording = False
+            
+            if system.state_machine.state not in CAPTURE_STATES:
+                # Put to sleep mid-recording: what was captured is not a request
+                system.tracer.finish_turn(trace, status="cancelled")
+                return
+            
+            if not recording:
+                logger.error("Failed to record audio")
+                system.tracer.finish_turn(trace, status="record_failed")
+                system.state_machine.transition(RobotState.LISTENING, allowed_from=AWAKE_STATES)
+                await asyncio.sleep(2)
+                self.turn_done.set()
+                continue
+            
+            # Blocks while the request stage is busy (backpressure)
+            await self.recordings.put({'trace': trace, 'recording': recording})
+    
+    async def request_stage(self):
+        """Resolve a recording locally or via the API and hand the reply to playback"""
+        system = self.system
+        assistant = system.voice_assistant
+        
+        while True:
+            turn = await self.recordings.get()
+            trace, recording = turn['trace'], turn['recording']
+            
+            # Local commands are handled on the robot without any round-trip
+            local_text = recording.get('transcript', '')
+            command_text = local_text
+            if recording.get('preroll'):
+                # The pre-roll puts the wake phrase in front of the request; it is not a command
+                command_text = system.voice_controller.strip_wake_phrase(local_text)
+            local_command, command_only = system.voice_controller.match_local_command(command_text)
+            if local_command == 'sleep':
+                logger.info(f"Local sleep command: {local_text}")
+                system.tracer.finish_turn(trace, status="local_sleep")
+                self.ui(system.enter_sleep_mode)
+                return
+            elif local_command and command_only:
+                logger.info(f"Local command: {local_command}")
+                self.ui(system.set_expression, "happy")
+                if local_command != recording.get('intent'):
+                    start_robot_action(local_command, trace)
+                turn['response'] = assistant.response_cache.canned_response('ok', robot_expression='happy')
+                turn['status'] = "local"
+                await self.responses.put(turn)
+                continue
+            
+            # The link supervisor picks the mode before anything is sent; every call shares one budget
+            mode = assistant.link.turn_mode()
+            deadline = self.deadline = RequestDeadline(TURN_RESPONSE_BUDGET)
+            can_send_text = bool(local_text) and assistant.text_input_supported
+            response_data = None
+            
+            if mode == LinkSupervisor.OFFLINE:
+                logger.warning("API link offline, answering locally")
+            else:
+                # Process with API - show loading
+                logger.info(f"Processing with API ({mode})...")
+                self.ui(system.start_loading_mode, "Processing your request...")
+                system.state_machine.transition(RobotState.PROCESSING, allowed_from=AWAKE_STATES)
+                assistant.is_processing = True
+                
+                # Degraded link: send the local transcript instead of the audio
+                if can_send_text and mode == LinkSupervisor.TEXT_ONLY:
+                    response_data = await self.run_request(deadline, assistant.send_text_to_api, local_text, trace, recording.get('intent'))
+                else:
+                    response_data = await self.run_request(deadline, assistant.send_audio_to_api, recording, trace)
+                    if not response_data and can_send_text and not deadline.expired:
+                        response_data = await self.run_request(deadline, assistant.send_text_to_api, local_text, trace, recording.get('intent'))
+                assistant.is_processing = False
+                self.ui(system.stop_loading_mode)
+            
+            if not response_data:
+                if mode != LinkSupervisor.OFFLINE:
+                    logger.error("Failed to get API response")
+                self.ui(system.set_expression, "confusion")
+                turn['response'] = assistant.response_cache.canned_response('offline')
+                turn['status'] = "offline" if mode == LinkSupervisor.OFFLINE else "api_failed"
+                await self.responses.put(turn)
+                continue
+            
+            # Extract data
+            user_input = response_data.get('user_input', '')
+            text_response = response_data.get('text_response', '')
+            
+            # Neither transcriber heard any words: the reply would answer silence
+            if not user_input.strip() and not local_text:
+                logger.info("Nothing intelligible in the recording")
+                assistant.discard_response(response_data)
+                self.ui(system.set_expression, "confusion")
+                turn['response'] = assistant.response_cache.canned_response('not_understood')
+                turn['status'] = "not_understood"
+                await self.responses.put(turn)
+                continue
+            
+            # Check for voice commands in response, then in the user input
+            command_input = user_input
+            if recording.get('preroll'):
+                command_input = system.voice_controller.strip_wake_phrase(user_input)
+            voice_command = system.voice_controller.check_voice_command(text_response)
+            if voice_command is None:
+                voice_command = system.voice_controller.check_voice_command(command_input)
+            if voice_command == 'sleep':
+                logger.info("Sleep command detected")
+                assistant.discard_response(response_data)
+                system.tracer.finish_turn(trace, status="sleep")
+                self.ui(system.enter_sleep_mode)
+                return
+            elif voice_command == 'wake':
+                logger.info("Wake command detected (already awake)")
+                self.ui(system.set_expression, "surprise")
+                await asyncio.sleep(1)
+            
+            # Store conversation (queued, never blocks the speaking path)
+            with trace.span('storage'):
+                assistant.conversation_store.enqueue(
+                    user_input, text_response, 
+                    response_data.get('language_used', 'english')
+                )
+            
+            turn['response'] = response_data
+            await self.responses.put(turn)
+    
+    async def playback_stage(self):
+        """Speak replies with lip sync, then release the next capture"""
+        system = self.system
+        assistant = system.voice_assistant
+        
+        while True:
+            turn = await self.responses.get()
+            trace, response_data = turn['trace'], turn['response']
+            status = turn.get('status', "ok")
+            self.capture_released = False
+            
+            if response_data:
+                self.ui(system.show_response_text, response_data.get('text_response', ''))
+                if status == "ok":
+                    self.ui(system.set_expression, "talking")
+                system.state_machine.transition(RobotState.SPEAKING, allowed_from=AWAKE_STATES)
+                assistant.is_speaking = True
+                on_started = self.release_capture if self.overlap_turns else None
+                await self.run_blocking(assistant.play_audio_response, response_data, system.avatar_state, trace, on_started)
+                assistant.is_speaking = False
+            system.tracer.finish_turn(trace, status=status)
+            
+            if status == "ok":
+                # Set final expression
+                robot_expression = response_data.get('robot_expression', 'happy')
+                if robot_expression == "sleepy":
+                    self.ui(system.enter_sleep_mode)
+                    return
+                self.ui(system.set_expression, robot_expression)
+            
+            if assistant.is_recording:
+                # The next turn is already being captured (started during playback)
+                self.ui(system.set_expression, "happy")
+                system.state_machine.transition(RobotState.RECORDING, allowed_from=AWAKE_STATES)
+            else:
+                system.state_machine.transition(RobotState.LISTENING, allowed_from=AWAKE_STATES)
+                if status == "api_failed":
+                    await asyncio.sleep(2)
+            if not self.capture_released:
+                self.turn_done.set()
+    
+    def release_capture(self):
+        """Playback thread: sound has started, let the next capture begin (barge-in enabled)"""
+        self.capture_released = True
+        self.loop.call_soon_threadsafe(self.turn_done.set)
+    
+class FrameScheduler:
+    """Adaptive frame pacing: picks when to wake next and skips redraws that would not change the picture"""
+    
+    def __init__(self, awake_fps=FRAME_RATE_AWAKE):
+        self.awake_fps = awake_fps
+        self.drawn_signature = None
+        self.drawn_state = None
+        self.in_motion = True
+        self.overlay_fading = False
+        self.invalidated = True
+    
+    def invalidate(self):
+        """Force the next frame to be drawn (resize, expose, mode switch)"""
+        self.invalidated = True
+    
+    def signature(self, avatar_state, renderer, targets=False):
+        """On-screen position of every smoothed value (or of its target), in pixels"""
+        if targets:
+            # Blinks and the sleep bob are driven by time, not smoothing, so they count as converged
+            eye_open = avatar_state.eye_open_ratio if avatar_state.is_blinking else avatar_state.target_eye_open_ratio
+            pupil_x, pupil_y = avatar_state.target_pupil_pos
+            if avatar_state.is_sleeping:
+                pupil_y = avatar_state.pupil_pos[1]
+            values = (eye_open, pupil_x, pupil_y, avatar_state.target_pupil_size, avatar_state.target_eyebrow_y,
+                      avatar_state.target_eyebrow_r, avatar_state.target_mouth_curve)
+        else:
+            values = (avatar_state.eye_open_ratio, avatar_state.pupil_pos[0], avatar_state.pupil_pos[1],
+                      avatar_state.pupil_size, avatar_state.eyebrow_y, avatar_state.eyebrow_r,
+                      avatar_state.mouth_curve)
+        
+        eye_open, pupil_x, pupil_y, pupil_size, eyebrow_y, eyebrow_r, mouth_curve = values
+        return np.array([
+            eye_open * renderer.eye_size,
+            pupil_x * renderer.eye_size * 0.15,
+            pupil_y * renderer.eye_size * 0.1,
+            pupil_size * renderer.pupil_size,
+            eyebrow_y * renderer.face_height,
+            math.radians(eyebrow_r) * renderer.brow_size * 0.5,
+            mouth_curve * renderer.mouth_height
+        ])
+    
+    def discrete_state(self, avatar_state, renderer):
+        """Values that change the picture in steps rather than by drifting"""
+        return (avatar_state.target_emotion, avatar_state.is_sleeping, avatar_state.is_loading,
+                renderer.current_phoneme(avatar_state))
+    
+    def should_redraw(self, avatar_state, renderer, overlay=None):
+        """Called once per update with the (text, alpha, fading) overlay; True when the frame would differ
+        from the one on screen"""
+        signature = self.signature(avatar_state, renderer)
+        state = self.discrete_state(avatar_state, renderer)
+        if overlay is not None:
+            text, alpha, fading = overlay
+            state += (text, round(alpha * 255))  # One step of the fading border alpha
+            self.overlay_fading = fading
+        else:
+            self.overlay_fading = False
+        
+        # Still converging on the current expression: keep updating at the full awake rate
+        target_signature = self.signature(avatar_state, renderer, targets=True)
+        self.in_motion = np.abs(signature - target_signature).max() > REDRAW_PIXEL_THRESHOLD
+        
+        # Background fades and mouth cross-fades advance inside the renderer, so keep drawing until they finish
+        bg_delta = max(abs(t - c) for t, c in zip(renderer.target_bg_color, renderer.current_bg_color)) * 255
+        mouth_blending = time.time() - renderer.mouth_switch_time < MOUTH_BLEND_SECONDS
+        
+        redraw = (self.invalidated or avatar_state.is_speaking or mouth_blending or
+                  bg_delta > REDRAW_PIXEL_THRESHOLD or state != self.drawn_state or
+                  np.abs(signature - self.drawn_signature).max() > REDRAW_PIXEL_THRESHOLD)
+        if redraw:
+            self.invalidated = False
+            self.drawn_signature = signature
+            self.drawn_state = state
+        return redraw
+    
+    def next_frame_delay(self, avatar_state, now):
+        """Seconds until the next update: every frame while something moves, otherwise the next scheduled change"""
+        if avatar_state.is_speaking:
+            return 1.0 / FRAME_RATE_SPEAKING
+        if self.in_motion or self.invalidated or self.overlay_fading or avatar_state.is_loading:
+            return 1.0 / self.awake_fps
+        if avatar_state.is_sleeping:
+            return 1.0 / FRAME_RATE_SLEEPING
+        if avatar_state.is_blinking:
+            return 1.0 / self.awake_fps
+        
+        upcoming = [avatar_state.next_blink_time]
+        if avatar_state.eye_movement_enabled:
+            upcoming.append(avatar_state.next_gaze_shift_time)
+        return max(1.0 / self.awake_fps, min(FRAME_MAX_IDLE_SECONDS, min(upcoming) - now))
+
+class EnhancedRobotFaceSystem(FaceAnimator):
     """Main system class with all fixes implemented"""
     
-    def __init__(self, width=400, height=300, api_url="https://aiec.guni.ac.in:8111", user_name="test_user", fullscreen=False):
+    def __init__(self, width=400, height=300, api_url="https://aiec.guni.ac.in:8111", user_name="test_user", fullscreen=False,
+                 renderer="fixed"):
         self.width = width
         self.height = height
         self.fullscreen = fullscreen
         self.api_url = api_url
         self.user_name = user_name
+        self.renderer = renderer  # "fixed" (fixed-function GL) or "gles2" (GLSL ES 2.0 shaders)
         
         # System state
         self.running = True
-        self.clock = pygame.time.Clock()
-        self.fps = 30
+        self.frame_scheduler = FrameScheduler()
         
         # Voice control state
-        self.is_sleeping = True  # Start in sleep mode
+        self.state_machine = RobotStateMachine(RobotState.SLEEPING)  # Start in sleep mode
         self.conversation_active = False
-        self.audio_thread = None
-        self.wake_listener_thread = None
         self.min_input_length = 5
+        self.use_preroll = False  # Prepend wake-word audio to the next recording
+        self.tracer = LatencyTracer()
         
         # Text display
         self.current_ai_text = ""
@@ -1411,9 +2220,10 @@ class EnhancedRobotFaceSystem:
         # Initialize pygame and display
         self.initialize_display()
         
-        # Start in sleep mode and begin listening for wake commands
+        # Start in sleep mode; the pipeline's wake stage listens for wake commands
         self.set_expression("sleepy")
-        self.start_wake_listener()
+        self.pipeline = ConversationPipeline(self)
+        self.pipeline.start()
         
         print("Enhanced Robot Face System initialized!")
         print("🎙️ Say 'wake up' or 'hello' to start interacting!")
@@ -1421,277 +2231,91 @@ class EnhancedRobotFaceSystem:
     
     def initialize_display(self):
         """Initialize pygame and OpenGL display"""
+        pygame.mixer.pre_init(AUDIO_FREQUENCY, -16, AUDIO_CHANNELS, AUDIO_BUFFER)
         pygame.init()
-        pygame.mixer.init()
         
-        # Set display mode
-        if self.fullscreen:
-            display_info = pygame.display.Info()
-            self.width = display_info.current_w
-            self.height = display_info.current_h
-            pygame.display.set_mode((self.width, self.height), DOUBLEBUF | OPENGL | FULLSCREEN)
-        else:
-            pygame.display.set_mode((self.width, self.height), DOUBLEBUF | OPENGL | RESIZABLE)
-        
-        pygame.display.set_caption("Enhanced Robot Face - Voice Controlled (Fixed)")
-        
-        # Initialize components
-        self.texture_manager = TextureManager()
-        self.face_renderer = FaceRenderer(self.width, self.height, self.texture_manager)
-        self.voice_assistant = VoiceAssistantClient(self.api_url, self.user_name)
+        # Initialize components; textures belong to the GL context, so they are loaded after the window opens
+        if self.renderer == "gles2":
+            try:
+                self.open_window(gles=True)
+                self.texture_manager = TextureManager()
+                self.face_renderer = ShaderFaceRenderer(self.width, self.height, self.texture_manager)
+            except (RuntimeError, pygame.error, OpenGL.error.Error) as e:
+                logger.error(f"GLES2 renderer unavailable, falling back to fixed-function: {e}")
+                self.renderer = "fixed"
+                # Fixed-function calls do not exist in an ES context: reopen the window with desktop GL
+                pygame.display.quit()
+                pygame.display.init()
+        if self.renderer != "gles2":
+            self.open_window(gles=False)
+            self.texture_manager = TextureManager()
+            self.face_renderer = FaceRenderer(self.width, self.height, self.texture_manager)
+        self.text_renderer = TextRenderer(pygame.font.Font(None, OVERLAY_FONT_SIZE))
+        self.audio_output = AudioOutputService()
+        self.voice_assistant = VoiceAssistantClient(self.api_url, self.user_name, audio_output=self.audio_output)
         self.voice_controller = VoiceController()
+        self.voice_assistant.local_model = self.voice_controller.local_detector.model
         self.avatar_state = AvatarState()
         
         # Initialize OpenGL with normal background
         glClearColor(*BG_COLOR_NORMAL)
         glEnable(GL_BLEND)
         glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-        glMatrixMode(GL_PROJECTION)
-        glLoadIdentity()
-        gluOrtho2D(0, self.width, 0, self.height)
-        glMatrixMode(GL_MODELVIEW)
+        if self.renderer == "fixed":
+            glMatrixMode(GL_PROJECTION)
+            glLoadIdentity()
+            gluOrtho2D(0, self.width, 0, self.height)
+            glMatrixMode(GL_MODELVIEW)
         
         # Update face renderer dimensions
         self.face_renderer.resize_window(self.width, self.height)
         
         logger.info("Display initialized successfully")
     
-    def start_loading_mode(self, message="Connecting to server..."):
-        """Start loading mode with funny expressions"""
-        self.is_loading = True
-        self.loading_message = message
-        self.avatar_state.is_loading = True
-        self.avatar_state.loading_start_time = time.time()
-        self.avatar_state.loading_expression_index = 0
-        self.avatar_state.next_loading_change = time.time() + 0.8
-        
-        # Set initial loading expression
-        self.set_expression(LOADING_EXPRESSIONS[0])
-        logger.info(f"Loading mode started: {message}")
-    
-    def stop_loading_mode(self):
-        """Stop loading mode"""
-        self.is_loading = False
-        self.avatar_state.is_loading = False
-        logger.info("Loading mode stopped")
-    
-    def update_loading_expressions(self):
-        """Update loading expressions continuously"""
-        if not self.avatar_state.is_loading:
-            return
-        
-        current_time = time.time()
-        if current_time > self.avatar_state.next_loading_change:
-            # Cycle through loading expressions
-            self.avatar_state.loading_expression_index = (self.avatar_state.loading_expression_index + 1) % len(LOADING_EXPRESSIONS)
-            next_expression = LOADING_EXPRESSIONS[self.avatar_state.loading_expression_index]
-            self.set_expression(next_expression)
-            
-            # Random timing for more natural feel
-            self.avatar_state.next_loading_change = current_time + random.uniform(0.6, 1.2)
-            
-            logger.info(f"Loading expression changed to: {next_expression}")
-    
-    def start_wake_listener(self):
-        """Start the wake word listener thread"""
-        if not self.wake_listener_thread or not self.wake_listener_thread.is_alive():
-            self.wake_listener_thread = threading.Thread(target=self.wake_listener_worker)
-            self.wake_listener_thread.daemon = True
-            self.wake_listener_thread.start()
-            logger.info("Wake listener started")
-    
-    def wake_listener_worker(self):
-        """Worker thread for listening to wake commands"""
-        while self.running:
-            if self.is_sleeping and not self.conversation_active:
-                try:
-                    result = self.voice_controller.listen_for_wake_command()
-                    if result is True:  # Wake command detected
-                        logger.info("Wake command detected locally")
-                        self.wake_up()
-                    elif result is False:  # Sleep command detected (but already sleeping)
-                        pass
-                except Exception as e:
-                    logger.error(f"Wake listener error: {e}")
-                
-                time.sleep(0.1)  # Small delay to prevent excessive CPU usage
-            else:
-                time.sleep(1)  # Longer delay when not needed
-    
-    def set_expression(self, emotion_name):
-        """Set facial expression"""
-        if emotion_name in EMOTIONS:
-            self.avatar_state.target_emotion = emotion_name
-            logger.info(f"Expression set to: {emotion_name}")
+    def open_window(self, gles=False):
+        """Create the OpenGL window: an OpenGL ES 2.0 context for the shader renderer, desktop GL otherwise"""
+        if gles:
+            pygame.display.gl_set_attribute(pygame.GL_CONTEXT_PROFILE_MASK, pygame.GL_CONTEXT_PROFILE_ES)
+            pygame.display.gl_set_attribute(pygame.GL_CONTEXT_MAJOR_VERSION, 2)
+            pygame.display.gl_set_attribute(pygame.GL_CONTEXT_MINOR_VERSION, 0)
         else:
-            logger.warning(f"Unknown emotion: {emotion_name}")
-    
-    def update_animations(self, dt):
-        """Update all animations with loading mode support"""
-        current_time = time.time()
-        speed = dt * self.avatar_state.emotion_transition_speed
-        
-        # Update loading expressions
-        self.update_loading_expressions()
-        
-        # Get current emotion parameters
-        emotion = EMOTIONS[self.avatar_state.target_emotion]
-        
-        # Update emotion targets
-        self.avatar_state.target_eyebrow_y = emotion["eyebrow_y"]
-        self.avatar_state.target_eyebrow_r = emotion["eyebrow_r"]
-        self.avatar_state.target_mouth_curve = emotion["mouth_c"]
-        self.avatar_state.target_eye_open_ratio = emotion["eye_o"]
-        self.avatar_state.target_pupil_size = emotion["pupil_s"]
-        self.avatar_state.eye_movement_range = emotion["eye_move_range"]
-        
-        # Smooth transitions
-        self.avatar_state.eyebrow_y += (self.avatar_state.target_eyebrow_y - self.avatar_state.eyebrow_y) * speed
-        self.avatar_state.eyebrow_r += (self.avatar_state.target_eyebrow_r - self.avatar_state.eyebrow_r) * speed
-        self.avatar_state.mouth_curve += (self.avatar_state.target_mouth_curve - self.avatar_state.mouth_curve) * speed
-        self.avatar_state.pupil_size += (self.avatar_state.target_pupil_size - self.avatar_state.pupil_size) * speed
-        
-        # Eye movement control
-        self.avatar_state.eye_movement_enabled = not emotion.get("eye_steady", False)
-        self.avatar_state.is_sleeping = (self.avatar_state.target_emotion == "sleepy")
-        
-        # Enhanced pupil movement for loading mode
-        if self.avatar_state.is_loading:
-            # Crazy eye movement during loading
-            loading_time = current_time - self.avatar_state.loading_start_time
-            self.avatar_state.target_pupil_pos = np.array([
-                math.sin(loading_time * 3) * 0.8,
-                math.cos(loading_time * 2.5) * 0.6
-            ])
-        elif self.avatar_state.eye_movement_enabled and current_time > self.avatar_state.next_gaze_shift_time:
-            movement_range = self.avatar_state.eye_movement_range
-            self.avatar_state.target_pupil_pos = np.array([
-                random.uniform(-movement_range, movement_range), 
-                random.uniform(-movement_range * 0.7, movement_range * 0.7)
-            ])
-            self.avatar_state.next_gaze_shift_time = current_time + random.uniform(1.5, 4.0)
-        elif not self.avatar_state.eye_movement_enabled:
-            self.avatar_state.target_pupil_pos = np.array([0.0, 0.0])
-        
-        self.avatar_state.pupil_pos += (self.avatar_state.target_pupil_pos - self.avatar_state.pupil_pos) * dt * 3.0
-        
-        # Breathing animation
-        self.avatar_state.breathing_offset = math.sin(current_time * 2) * 3
-        
-        # Sleep animation
-        if self.avatar_state.is_sleeping:
-            self.avatar_state.sleep_animation_phase += dt * 2.0
-            sleep_offset = math.sin(self.avatar_state.sleep_animation_phase) * 0.05
-            self.avatar_state.pupil_pos[1] = sleep_offset
-        
-        # Enhanced blinking system
-        if not self.avatar_state.is_blinking and current_time > self.avatar_state.next_blink_time:
-            self.avatar_state.is_blinking = True
-            self.avatar_state.blink_start_time = current_time
-            
-            if self.avatar_state.is_sleeping:
-                self.avatar_state.blink_duration = 2.0
-            elif self.avatar_state.target_emotion in ["fear", "surprise"]:
-                self.avatar_state.blink_duration = 0.08
-            else:
-                self.avatar_state.blink_duration = 0.12
+            # SDL's defaults: a 2.1 compatibility context, which still has the fixed-function pipeline
+            pygame.display.gl_set_attribute(pygame.GL_CONTEXT_PROFILE_MASK, 0)
+            pygame.display.gl_set_attribute(pygame.GL_CONTEXT_MAJOR_VERSION, 2)
+            pygame.display.gl_set_attribute(pygame.GL_CONTEXT_MINOR_VERSION, 1)
         
-        if self.avatar_state.is_blinking:
-            progress = (current_time - self.avatar_state.blink_start_time) / self.avatar_state.blink_duration
-            if progress <= 1.0:
-                if self.avatar_state.is_sleeping:
-                    self.avatar_state.eye_open_ratio = 0.3 + math.sin(progress * math.pi) * 0.1
-                else:
-                    self.avatar_state.eye_open_ratio = 1.0 - math.sin(progress * math.pi) * 0.8
-            else:
-                self.avatar_state.is_blinking = False
-                self.avatar_state.eye_open_ratio = self.avatar_state.target_eye_open_ratio
-                if self.avatar_state.is_sleeping:
-                    self.avatar_state.next_blink_time = current_time + random.uniform(0.5, 2.0)
-                else:
-                    self.avatar_state.next_blink_time = current_time + random.uniform(2, 6)
-        else:
-            self.avatar_state.eye_open_ratio += (self.avatar_state.target_eye_open_ratio - self.avatar_state.eye_open_ratio) * speed
-        
-        # Enhanced coordinated lip sync with dynamic width (UPDATED SECTION)
-        if self.avatar_state.is_speaking and self.avatar_state.speech_phonemes:
-            elapsed = current_time - self.avatar_state.speech_start_time
-            
-            phoneme_time = 0
-            current_phoneme = None
-            
-            for phoneme_type, duration in self.avatar_state.speech_phonemes:
-                if elapsed < phoneme_time + duration:
-                    current_phoneme = phoneme_type
-                    break
-                phoneme_time += duration
-            
-            # Set mouth opening ratio and width based on current phoneme
-            if current_phoneme:
-                if current_phoneme.startswith('vowel_wide'):
-                    self.avatar_state.mouth_open_ratio = 0.9
-                    self.avatar_state.target_mouth_width = 1.3  # Wider for "ah", "eh"
-                elif current_phoneme.startswith('vowel_round'):
-                    self.avatar_state.mouth_open_ratio = 0.7
-                    self.avatar_state.target_mouth_width = 0.8  # Narrower for "oh", "oo"
-                elif current_phoneme.startswith('vowel_narrow'):
-                    self.avatar_state.mouth_open_ratio = 0.4
-                    self.avatar_state.target_mouth_width = 0.7  # Much narrower for "ee"
-                elif current_phoneme.startswith('bilabial'):
-                    self.avatar_state.mouth_open_ratio = 0.0
-                    self.avatar_state.target_mouth_width = 1.0  # Normal width
-                elif current_phoneme.startswith('dental'):
-                    self.avatar_state.mouth_open_ratio = 0.4
-                    self.avatar_state.target_mouth_width = 1.0  # Normal width
-                elif current_phoneme.startswith('sibilant'):
-                    self.avatar_state.mouth_open_ratio = 0.3
-                    self.avatar_state.target_mouth_width = 0.85  # Slightly narrow
-                elif current_phoneme.startswith('rounded'):
-                    self.avatar_state.mouth_open_ratio = 0.5
-                    self.avatar_state.target_mouth_width = 0.8  # Narrow and round
-                else:  # pause or other
-                    self.avatar_state.mouth_open_ratio = 0.1
-                    self.avatar_state.target_mouth_width = 1.0
-                
-                # Add natural variation for more realistic movement
-                variation = math.sin(elapsed * math.pi * 4) * 0.1
-                self.avatar_state.mouth_open_ratio += variation
-                self.avatar_state.mouth_open_ratio = max(0.0, min(1.0, self.avatar_state.mouth_open_ratio))
-                
-                # Add width variation for dynamic speech
-                width_variation = math.sin(elapsed * math.pi * 3) * 0.05
-                self.avatar_state.target_mouth_width += width_variation
+        if self.fullscreen:
+            display_info = pygame.display.Info()
+            self.width = display_info.current_w
+            self.height = display_info.current_h
+            pygame.display.set_mode((self.width, self.height), DOUBLEBUF | OPENGL | FULLSCREEN)
         else:
-            # Return to neutral position when not speaking
-            self.avatar_state.mouth_open_ratio *= max(0, 1.0 - (dt * 4.0))
-            # Return to emotion-based default width
-            emotion_defaults = {
-                'happy': 1.2, 'amusement': 1.3, 'love': 1.1,
-                'sad': 0.8, 'angry': 0.9, 'fear': 0.8,
-                'surprise': 1.1, 'disgust': 0.8,
-                'neutral': 1.0
-            }
-            self.avatar_state.target_mouth_width = emotion_defaults.get(
-                self.avatar_state.target_emotion, 1.0
-            )
+            pygame.display.set_mode((self.width, self.height), DOUBLEBUF | OPENGL | RESIZABLE)
         
-        # Smooth width transitions
-        self.avatar_state.current_mouth_width += (
-            self.avatar_state.target_mouth_width - self.avatar_state.current_mouth_width
-        ) * dt * 8.0  # Fast width changes for responsive speech
+        pygame.display.set_caption("Enhanced Robot Face - Voice Controlled (Fixed)")
     
-    def handle_events(self):
+    @property
+    def is_sleeping(self):
+        """True while the state machine is in the sleeping state"""
+        return self.state_machine.state == RobotState.SLEEPING
+    
+    def handle_events(self, events):
         """Handle pygame events including window resize"""
-        for event in pygame.event.get():
+        for event in events:
             if event.type == QUIT:
                 self.running = False
             elif event.type == VIDEORESIZE:
                 self.width = event.w
                 self.height = event.h
                 self.face_renderer.resize_window(self.width, self.height)
+                self.frame_scheduler.invalidate()
                 logger.info(f"Window resized to: {self.width}x{self.height}")
+            elif event.type == VIDEOEXPOSE:
+                self.frame_scheduler.invalidate()
             elif event.type == KEYDOWN:
                 self.handle_key_press(event.key)
+            elif event.type in (PLAYBACK_END_EVENT, MUSIC_END_EVENT):
+                self.audio_output.on_end_event(event.type)
     
     def handle_key_press(self, key):
         """Handle keyboard input"""
@@ -1735,6 +2359,7 @@ class EnhancedRobotFaceSystem:
             pygame.display.set_mode((self.width, self.height), DOUBLEBUF | OPENGL | RESIZABLE)
         
         self.face_renderer.resize_window(self.width, self.height)
+        self.frame_scheduler.invalidate()
         logger.info(f"Fullscreen {'enabled' if self.fullscreen else 'disabled'}")
     
     def start_conversation_mode(self):
@@ -1743,111 +2368,21 @@ class EnhancedRobotFaceSystem:
             logger.info("Starting conversation mode")
             self.conversation_active = True
             self.set_expression("happy")
-            
-            self.audio_thread = threading.Thread(target=self.conversation_worker)
-            self.audio_thread.daemon = True
-            self.audio_thread.start()
+            self.pipeline.start_conversation()
             
             print("🎤 Voice conversation started! Speak to interact.")
     
-    def conversation_worker(self):
-        """Worker function for voice conversation with loading support"""
-        try:
-            while self.running and self.conversation_active and not self.is_sleeping:
-                logger.info("Listening for voice input...")
-                
-                # Set listening expression
-                self.set_expression("happy")
-                
-                # Record audio with minimum time
-                self.voice_assistant.is_recording = True
-                self.voice_assistant.is_processing = False
-                self.voice_assistant.is_speaking = False
-                
-                audio_path = self.voice_assistant.record_audio_with_minimum_time()
-                self.voice_assistant.is_recording = False
-                
-                if not audio_path:
-                    logger.error("Failed to record audio")
-                    time.sleep(2)
-                    continue
-                
-                # Process with API - show loading
-                logger.info("Processing with API...")
-                self.start_loading_mode("Processing your request...")
-                self.voice_assistant.is_processing = True
-                
-                response_data = self.voice_assistant.send_audio_to_api(audio_path)
-                self.voice_assistant.is_processing = False
-                self.stop_loading_mode()
-                
-                if not response_data:
-                    logger.error("Failed to get API response")
-                    self.set_expression("confusion")
-                    time.sleep(2)
-                    continue
-                
-                # Extract data
-                user_input = response_data.get('user_input', '')
-                text_response = response_data.get('text_response', '')
-                robot_expression = response_data.get('robot_expression', 'happy')
-                
-                # Check for voice commands in response
-                voice_command = self.voice_controller.check_voice_command(text_response)
-                if voice_command == 'sleep':
-                    logger.info("Sleep command detected")
-                    self.enter_sleep_mode()
-                    break
-                elif voice_command == 'wake':
-                    logger.info("Wake command detected (already awake)")
-                    self.set_expression("surprise")
-                    time.sleep(1)
-                else:
-                    voice_command = self.voice_controller.check_voice_command(user_input)
-                    if voice_command == 'sleep':
-                        logger.info("Sleep command detected")
-                        self.enter_sleep_mode()
-                        break
-                    elif voice_command == 'wake':
-                        logger.info("Wake command detected (already awake)")
-                        self.set_expression("surprise")
-                        time.sleep(1)
-                    
-                
-                # Store conversation
-                self.voice_assistant.store_conversation(
-                    user_input, text_response, 
-                    response_data.get('language_used', 'english')
-                )
-                
-                # Update text display
-                self.current_ai_text = text_response
-                self.text_display_time = time.time()
-                
-                # Play response with enhanced lip sync
-                self.set_expression("talking")
-                self.voice_assistant.is_speaking = True
-                self.voice_assistant.play_audio_response(response_data, self.avatar_state)
-                self.voice_assistant.is_speaking = False
-                
-                # Set final expression
-                if robot_expression == "sleepy":
-                    self.enter_sleep_mode()
-                    break
-                
-                self.set_expression(robot_expression)
-                time.sleep(1)
-                
-        except Exception as e:
-            logger.error(f"Conversation worker error: {e}")
-            self.conversation_active = False
-            self.stop_loading_mode()
+    def show_response_text(self, text):
+        """Show the AI reply in the text overlay"""
+        self.current_ai_text = text
+        self.text_display_time = time.time()
     
     def enter_sleep_mode(self):
         """Enter sleep mode"""
         logger.info("Entering sleep mode...")
-        self.is_sleeping = True
         self.conversation_active = False
+        self.pipeline.stop_conversation()
+        self.state_machine.transition(RobotState.SLEEPING)
         self.set_expression("sleepy")
         self.stop_loading_mode()
         
@@ -1855,9 +2390,7 @@ class EnhancedRobotFaceSystem:
         self.voice_assistant.is_recording = False
         self.voice_assistant.is_processing = False
         self.voice_assistant.is_speaking = False
-        
-        # Restart wake listener
-        self.start_wake_listener()
+        self.audio_output.stop()
         
         print("😴 Robot is sleeping. Say 'wake up' or 'hello' to wake it up!")
     
@@ -1865,10 +2398,9 @@ class EnhancedRobotFaceSystem:
         """Wake up from sleep mode"""
         if self.is_sleeping:
             logger.info("Waking up...")
-            self.is_sleeping = False
+            self.state_machine.transition(RobotState.LISTENING)
             self.set_expression("surprise")
-            time.sleep(0.5)
-            self.set_expression("happy")
+            # No delay here: audio spoken meanwhile is recovered from the pre-roll
             self.start_conversation_mode()  # Automatically start conversation
             print("😊 Robot is awake! Speaking...")
     
@@ -1877,80 +2409,27 @@ class EnhancedRobotFaceSystem:
         if not text or alpha <= 0:
             return
         
-        # Set up 2D rendering
-        glMatrixMode(GL_PROJECTION)
-        glPushMatrix()
-        glLoadIdentity()
-        glOrtho(0, self.width, 0, self.height, -1, 1)
-        glMatrixMode(GL_MODELVIEW)
-        glPushMatrix()
-        glLoadIdentity()
-        
-        # Draw background box
-        text_lines = self.wrap_text(text, 60)
-        line_count = len(text_lines)
-        
-        bg_height = max(80, line_count * 25 + 20)
+        # Text is laid out once per (text, width) and drawn from the glyph atlas in one batch
         bg_width = min(self.width - 40, 600)
+        layout = self.text_renderer.layout(text, bg_width - 20)
+        bg_height = max(80, layout.height + 20)
         bg_x = (self.width - bg_width) // 2
         bg_y = 20
         
-        # Background
-        glColor4f(0.0, 0.0, 0.0, 0.7 * alpha)
-        glBegin(GL_QUADS)
-        glVertex2f(bg_x, bg_y)
-        glVertex2f(bg_x + bg_width, bg_y)
-        glVertex2f(bg_x + bg_width, bg_y + bg_height)
-        glVertex2f(bg_x, bg_y + bg_height)
-        glEnd()
-        
         # Border with different color for loading mode
         if self.is_loading:
-            glColor4f(1.0, 0.5, 0.0, alpha)  # Orange for loading
+            border_color = (1.0, 0.5, 0.0, alpha)  # Orange for loading
         else:
-            glColor4f(0.3, 0.6, 1.0, alpha)  # Blue for normal
-        
-        glLineWidth(2.0)
-        glBegin(GL_LINE_LOOP)
-        glVertex2f(bg_x, bg_y)
-        glVertex2f(bg_x + bg_width, bg_y)
-        glVertex2f(bg_x + bg_width, bg_y + bg_height)
-        glVertex2f(bg_x, bg_y + bg_height)
-        glEnd()
-        
-        # Restore matrices
-        glPopMatrix()
-        glMatrixMode(GL_PROJECTION)
-        glPopMatrix()
-        glMatrixMode(GL_MODELVIEW)
-    
-    def wrap_text(self, text, width):
-        """Wrap text to specified width"""
-        words = text.split()
-        lines = []
-        current_line = ""
-        
-        for word in words:
-            if len(current_line + " " + word) <= width:
-                if current_line:
-                    current_line += " " + word
-                else:
-                    current_line = word
-            else:
-                if current_line:
-                    lines.append(current_line)
-                current_line = word
+            border_color = (0.3, 0.6, 1.0, alpha)  # Blue for normal
         
-        if current_line:
-            lines.append(current_line)
-        
-        return lines
+        self.face_renderer.draw_text_panel((bg_x, bg_y, bg_width, bg_height), (0.0, 0.0, 0.0, 0.7 * alpha), border_color,
+                                           layout, bg_x + 10, bg_y + bg_height - 10, OVERLAY_TEXT_COLOR + (alpha,))
     
-    def render_status_overlay(self):
-        """Render status information"""
+    def status_overlay(self):
+        """(text, alpha, fading) for the overlay this frame, or None"""
         # Display loading message
         if self.is_loading and self.loading_message:
-            self.render_text_overlay(f"🔄 {self.loading_message}", 1.0)
+            return self.loading_message, 1.0, False
         
         # Display AI text if available
         elif self.current_ai_text and self.display_text:
@@ -1959,28 +2438,55 @@ class EnhancedRobotFaceSystem:
             
             if elapsed_time < self.text_fade_duration:
                 fade_factor = max(0.0, 1.0 - (elapsed_time / self.text_fade_duration))
-                self.render_text_overlay(self.current_ai_text, fade_factor)
+                return self.current_ai_text, fade_factor, True
         
         # Show wake instruction when sleeping
         elif self.is_sleeping:
-            self.render_text_overlay("😴 Say 'wake up' or 'hello' to wake me!", 0.8)
+            return "Zzz... Say 'wake up' or 'hello' to wake me!", 0.8, False
+        return None
+    
+    def render_status_overlay(self):
+        """Render status information"""
+        overlay = self.status_overlay()
+        if overlay is not None:
+            text, alpha, _ = overlay
+            self.render_text_overlay(text, alpha)
     
     def render_frame(self):
         """Render a complete frame"""
         self.face_renderer.render_face(self.avatar_state)
-        #self.render_status_overlay()
+        self.render_status_overlay()
         pygame.display.flip()
     
     def run(self):
         """Main run loop"""
         logger.info("Starting Enhanced Robot Face System...")
         
+        last_update = time.monotonic()
+        next_frame = last_update
         while self.running:
-            dt = self.clock.tick(self.fps) / 1000.0
+            # Sleep until the next frame is due; input and pipeline UI events wake the loop early
+            events = []
+            timeout = next_frame - time.monotonic()
+            if timeout > 0:
+                event = pygame.event.wait(max(1, int(timeout * 1000)))
+                if event.type != NOEVENT:
+                    events.append(event)
+            events.extend(pygame.event.get())
+            
+            # The scheduled gap counts in full (4 fps while sleeping); only an unexpected overrun is clamped
+            now = time.monotonic()
+            dt = min(now - last_update, max(0.0, next_frame - last_update) + FRAME_OVERRUN_SLACK)
+            last_update = now
             
-            self.handle_events()
-            self.update_animations(dt)
-            self.render_frame()
+            self.handle_events(events)
+            self.pipeline.process_ui_events()
+            steps = max(1, math.ceil(dt / MAX_ANIMATION_STEP))
+            for _ in range(steps):
+                self.update_animations(dt / steps)
+            if self.frame_scheduler.should_redraw(self.avatar_state, self.face_renderer, self.status_overlay()):
+                self.render_frame()
+            next_frame = now + self.frame_scheduler.next_frame_delay(self.avatar_state, time.time())
         
         self.cleanup()
     
@@ -1989,7 +2495,8 @@ class EnhancedRobotFaceSystem:
         logger.info("Cleaning up...")
         
         self.conversation_active = False
-        self.is_sleeping = True
+        self.pipeline.stop_conversation()
+        self.state_machine.transition(RobotState.SLEEPING)
         
         # Stop voice assistant
         self.voice_assistant.is_recording = False
@@ -1998,16 +2505,15 @@ class EnhancedRobotFaceSystem:
         
         # Stop audio
         try:
-            pygame.mixer.music.stop()
+            self.audio_output.stop()
         except:
             pass
         
-        # Wait for threads
-        if self.audio_thread and self.audio_thread.is_alive():
-            self.audio_thread.join(timeout=2.0)
+        # Abort capture, stop link probing and flush pending conversation records
+        self.voice_assistant.close()
         
-        if self.wake_listener_thread and self.wake_listener_thread.is_alive():
-            self.wake_listener_thread.join(timeout=2.0)
+        # Cancel pipeline tasks and stop its loop
+        self.pipeline.shutdown()
         
         pygame.quit()
         logger.info("System shutdown complete")
@@ -2058,6 +2564,8 @@ def main():
                       help='Window height')
     parser.add_argument('--fullscreen', action='store_true',
                       help='Start in fullscreen mode')
+    parser.add_argument('--renderer', choices=['fixed', 'gles2'], default='fixed',
+                      help='Face renderer: fixed-function OpenGL or GLSL ES 2.0 shaders (Raspberry Pi KMS)')
     
     args = parser.parse_args()
     
@@ -2067,7 +2575,8 @@ def main():
             height=args.height,
             api_url=args.api_url,
             user_name=args.user_name,
-            fullscreen=args.fullscreen
+            fullscreen=args.fullscreen,
+            renderer=args.renderer
         )
         
         system.run()
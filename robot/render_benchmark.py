@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Headless frame-time benchmark for the face renderer.
+Creates an offscreen OpenGL context (OSMesa software rasterizer or an EGL pbuffer),
+drives AvatarState through a scripted emotion / blink / speech / loading timeline on
+a virtual clock and reports per-stage CPU time with percentiles:
+  update  - FaceAnimator.update_animations
+  mesh    - textured part batch and mouth mesh / mouth parameters
+  submit  - the rest of render_face (GL state and draw calls)
+  finish  - glFinish, i.e. waiting for the driver to rasterize the frame
+
+Usage:
+    python render_benchmark.py                              # OSMesa, fixed-function renderer
+    python render_benchmark.py --backend egl --renderer gles2 --width 1024 --height 600
+    EGL_PLATFORM=device python render_benchmark.py --backend egl   # default is surfaceless
+    python render_benchmark.py --save-frame frame.png       # check what was rendered
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import functools
+
+from latency_trace import percentile
+
+# face_render and OpenGL are imported in main() once PYOPENGL_PLATFORM has been chosen
+face_render = None
+GL = None
+GLU = None
+
+STAGES = ['update', 'mesh', 'submit', 'finish', 'frame']
+
+# (seconds, event, argument) - sleep, wake, a chat turn with loading and speech, a run of emotions
+TIMELINE = [
+    (0.0, 'expression', 'sleepy'),
+    (2.0, 'expression', 'neutral'),
+    (2.5, 'blink', None),
+    (3.0, 'expression', 'happy'),
+    (3.5, 'speak', "Hello! I am your friendly robot. How can I help you today?"),
+    (8.0, 'expression', 'surprise'),
+    (8.5, 'blink', None),
+    (9.0, 'loading', True),
+    (12.0, 'loading', False),
+    (12.0, 'expression', 'amusement'),
+    (12.2, 'speak', "That is a great question. Let me think about the weather, the news and a funny story "
+                    "about a robot who wanted to learn how to dance."),
+    (20.0, 'expression', 'sad'),
+    (21.0, 'expression', 'angry'),
+    (22.0, 'blink', None),
+    (23.0, 'expression', 'love'),
+    (24.0, 'expression', 'confusion'),
+    (25.0, 'expression', 'sleepy'),
+]
+TIMELINE_SECONDS = 28.0
+
+
+class VirtualClock:
+    """Replaces the time module inside face_render so every run sees the same animation state on the same frame"""
+
+    def __init__(self, start=1_000_000.0):
+        self.now = start
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+def create_osmesa_context(width, height):
+    """Mesa's software rasterizer rendering into a client-side RGBA buffer"""
+    from OpenGL import arrays, osmesa
+    from OpenGL.GL import GL_UNSIGNED_BYTE
+
+    context = osmesa.OSMesaCreateContextExt(osmesa.OSMESA_RGBA, 24, 0, 0, None)
+    if not context:
+        raise RuntimeError("OSMesaCreateContextExt failed")
+    buffer = arrays.GLubyteArray.zeros((height, width, 4))
+    if not osmesa.OSMesaMakeCurrent(context, buffer, GL_UNSIGNED_BYTE, width, height):
+        raise RuntimeError("OSMesaMakeCurrent failed")
+    return context, buffer  # The buffer must outlive the context
+
+
+def create_egl_context(width, height):
+    """Desktop OpenGL context on an EGL pbuffer surface (GPU drivers without a display server).
+    The default display is whatever EGL_PLATFORM names; main() makes that Mesa's surfaceless platform,
+    since the default X11/Wayland platform has no display to open on a headless board."""
+    import ctypes
+    from OpenGL import EGL
+
+    display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+    major, minor = EGL.EGLint(), EGL.EGLint()
+    if not EGL.eglInitialize(display, ctypes.pointer(major), ctypes.pointer(minor)):
+        raise RuntimeError("eglInitialize failed")
+
+    config_attributes = [
+        EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+        EGL.EGL_RED_SIZE, 8, EGL.EGL_GREEN_SIZE, 8, EGL.EGL_BLUE_SIZE, 8, EGL.EGL_ALPHA_SIZE, 8,
+        EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+        EGL.EGL_NONE
+    ]
+    config = EGL.EGLConfig()
+    count = EGL.EGLint()
+    EGL.eglChooseConfig(display, (EGL.EGLint * len(config_attributes))(*config_attributes),
+                        ctypes.pointer(config), 1, ctypes.pointer(count))
+    if count.value < 1:
+        raise RuntimeError("No EGL config with pbuffer + OpenGL support")
+
+    surface_attributes = [EGL.EGL_WIDTH, width, EGL.EGL_HEIGHT, height, EGL.EGL_NONE]
+    surface = EGL.eglCreatePbufferSurface(display, config,
+                                          (EGL.EGLint * len(surface_attributes))(*surface_attributes))
+    EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+    context = EGL.eglCreateContext(display, config, EGL.EGL_NO_CONTEXT, None)
+    if not EGL.eglMakeCurrent(display, surface, surface, context):
+        raise RuntimeError("eglMakeCurrent failed")
+    return display, surface, context
+
+
+HEADLESS_BACKENDS = {'osmesa': create_osmesa_context, 'egl': create_egl_context}
+
+
+def make_headless_system_class():
+    class HeadlessFaceSystem(face_render.FaceAnimator):
+        """The face system's animation and render path without a window, audio or conversation pipeline"""
+
+        def __init__(self, width, height, renderer, parts_path):
+            self.width = width
+            self.height = height
+            self.renderer = renderer
+            self.is_loading = False
+            self.loading_message = ""
+            self.speech_end_time = 0.0
+
+            self.texture_manager = face_render.TextureManager(parts_path)
+            renderer_class = face_render.ShaderFaceRenderer if renderer == "gles2" else face_render.FaceRenderer
+            self.face_renderer = renderer_class(width, height, self.texture_manager)
+            self.avatar_state = face_render.AvatarState()
+
+            # Same GL state as initialize_display
+            GL.glClearColor(*face_render.BG_COLOR_NORMAL)
+            GL.glEnable(GL.GL_BLEND)
+            GL.glBlendFunc(GL.GL_SRC_ALPHA, GL.GL_ONE_MINUS_SRC_ALPHA)
+            if renderer == "fixed":
+                GL.glMatrixMode(GL.GL_PROJECTION)
+                GL.glLoadIdentity()
+                GLU.gluOrtho2D(0, width, 0, height)
+                GL.glMatrixMode(GL.GL_MODELVIEW)
+            self.face_renderer.resize_window(width, height)
+
+        def speak(self, text):
+            """Start lip sync the way play_audio_response does once sound starts"""
+            state = self.avatar_state
+            state.is_speaking = True
+            state.speech_start_time = face_render.time.time()
+            state.speech_text = text
+            state.speech_phonemes = face_render.text_to_enhanced_phonemes(text)
+            state.current_phoneme_index = 0
+            self.speech_end_time = state.speech_start_time + sum(duration for _, duration in state.speech_phonemes)
+
+        def apply(self, event, argument):
+            if event == 'expression':
+                self.set_expression(argument)
+            elif event == 'blink':
+                self.avatar_state.next_blink_time = face_render.time.time()
+            elif event == 'speak':
+                self.speak(argument)
+            elif event == 'loading':
+                if argument:
+                    self.start_loading_mode("Thinking...")
+                else:
+                    self.stop_loading_mode()
+
+        def finish_speech(self):
+            state = self.avatar_state
+            if state.is_speaking and face_render.time.time() >= self.speech_end_time:
+                state.is_speaking = False
+                state.speech_phonemes = []
+
+    return HeadlessFaceSystem
+
+
+def timed(stage_times, stage, func):
+    """Wrap func so its run time is added to stage_times[stage]"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stage_times[stage] += time.perf_counter() - start
+    return wrapper
+
+
+def instrument_mesh_stage(renderer, stage_times):
+    """Time the mesh builders as instance attributes, so render_face picks up the wrapped versions"""
+    names = ['build_textured_batch']
+    if isinstance(renderer, face_render.ShaderFaceRenderer):
+        names.append('mouth_parameters')
+    else:
+        names.append('create_dynamic_coordinated_mouth_mesh')
+    for name in names:
+        setattr(renderer, name, timed(stage_times, 'mesh', getattr(renderer, name)))
+
+
+def run_timeline(system, clock, fps, warmup):
+    """Render the timeline at a fixed step (warmup frames first, unmeasured); returns stage -> per-frame seconds"""
+    dt = 1.0 / fps
+    frame_count = int(TIMELINE_SECONDS * fps)
+    events = sorted(TIMELINE, key=lambda item: item[0])
+    start = clock.time()
+    next_event = 0
+
+    results = {stage: [] for stage in STAGES}
+    stage_times = {'mesh': 0.0}
+    instrument_mesh_stage(system.face_renderer, stage_times)
+
+    for frame in range(frame_count + warmup):
+        elapsed = clock.time() - start
+        while next_event < len(events) and events[next_event][0] <= elapsed:
+            _, event, argument = events[next_event]
+            system.apply(event, argument)
+            next_event += 1
+        system.finish_speech()
+
+        stage_times['mesh'] = 0.0
+        frame_start = time.perf_counter()
+        system.update_animations(dt)
+        update_end = time.perf_counter()
+        system.face_renderer.render_face(system.avatar_state)
+        render_end = time.perf_counter()
+        GL.glFinish()
+        finish_end = time.perf_counter()
+
+        clock.advance(dt)
+        if frame < warmup:
+            continue
+        results['update'].append(update_end - frame_start)
+        results['mesh'].append(stage_times['mesh'])
+        results['submit'].append(render_end - update_end - stage_times['mesh'])
+        results['finish'].append(finish_end - render_end)
+        results['frame'].append(finish_end - frame_start)
+    return results
+
+
+def save_frame(path, width, height):
+    from PIL import Image
+    pixels = GL.glReadPixels(0, 0, width, height, GL.GL_RGBA, GL.GL_UNSIGNED_BYTE)
+    Image.frombytes("RGBA", (width, height), pixels).transpose(Image.FLIP_TOP_BOTTOM).save(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless face renderer frame-time benchmark')
+    parser.add_argument('--backend', choices=sorted(HEADLESS_BACKENDS), default='osmesa',
+                        help='Offscreen OpenGL backend')
+    parser.add_argument('--renderer', choices=['fixed', 'gles2'], default='fixed', help='Face renderer')
+    parser.add_argument('--width', type=int, default=800, help='Framebuffer width')
+    parser.add_argument('--height', type=int, default=600, help='Framebuffer height')
+    parser.add_argument('--fps', type=float, default=60, help='Simulated frame rate of the timeline')
+    parser.add_argument('--warmup', type=int, default=30, help='Frames rendered before measuring')
+    parser.add_argument('--parts-path', default='parts/', help='Face part images')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for blink and gaze randomness')
+    parser.add_argument('--save-frame', help='Write the last rendered frame to this PNG')
+    args = parser.parse_args()
+
+    # PyOpenGL picks its platform at import time
+    os.environ['PYOPENGL_PLATFORM'] = args.backend
+    if args.backend == 'egl':
+        os.environ.setdefault('EGL_PLATFORM', 'surfaceless')  # Read by Mesa's eglGetDisplay
+    global face_render, GL, GLU
+    from OpenGL import GL, GLU
+    import face_render  # Renderer and animation only: no servo, audio or network imports
+
+    try:
+        context = HEADLESS_BACKENDS[args.backend](args.width, args.height)
+    except Exception as e:
+        print(f"Could not create a {args.backend} context: {e}")
+        sys.exit(1)
+
+    random.seed(args.seed)
+    clock = VirtualClock()
+    face_render.time = clock
+    system = make_headless_system_class()(args.width, args.height, args.renderer, args.parts_path)
+
+    print(f"Renderer: {args.renderer} on {args.backend} ({GL.glGetString(GL.GL_RENDERER).decode()}), "
+          f"{args.width}x{args.height}, {TIMELINE_SECONDS:g} s timeline at {args.fps:g} fps")
+    results = run_timeline(system, clock, args.fps, args.warmup)
+    if args.save_frame:
+        save_frame(args.save_frame, args.width, args.height)
+
+    frames = results['frame']
+    print(f"{len(frames)} frames, {len(frames) / sum(frames):.0f} fps sustained")
+    print(f"{'stage':<8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for stage in STAGES:
+        values = results[stage]
+        print(f"{stage:<8} {percentile(values, 0.5) * 1000:>8.3f} {percentile(values, 0.95) * 1000:>8.3f} "
+              f"{percentile(values, 0.99) * 1000:>8.3f} {max(values) * 1000:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Upload benchmark for the voice assistant codecs.
+Encodes the same utterance as WAV, FLAC and Opus and POSTs each one to a local
+HTTP stand-in for /process_audio that reads the request body at a throttled rate.
+
+Usage:
+    python upload_benchmark.py                         # synthetic 8 s utterance
+    python upload_benchmark.py --wav sample.wav --bandwidth-kbps 2000 500 128
+"""
+
+import time
+import wave
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import requests
+
+from audio_codec import AUDIO_CODECS, UPLOAD_CODEC_PREFERENCE, local_audio_codecs, encode_pcm
+
+
+def synthetic_utterance(seconds=8.0, rate=16000):
+    """Speech-like test signal: voiced harmonics with a syllable envelope plus a little noise"""
+    t = np.arange(int(seconds * rate)) / rate
+    pitch = 140 + 20 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / rate
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 8))
+    envelope = np.clip(np.sin(2 * np.pi * 3.0 * t), 0, None) ** 0.5
+    noise = np.random.default_rng(0).normal(0, 0.02, len(t))
+    signal = 0.3 * voiced * envelope + noise
+    return (np.clip(signal, -1, 1) * 32767).astype(np.int16).tobytes(), rate
+
+
+def load_wav(path):
+    with wave.open(path, 'rb') as wf:
+        if wf.getsampwidth() != 2 or wf.getnchannels() != 1:
+            raise ValueError("Benchmark WAV must be 16-bit mono")
+        return wf.readframes(wf.getnframes()), wf.getframerate()
+
+
+class ThrottledUploadHandler(BaseHTTPRequestHandler):
+    """Accepts a POST and reads its body no faster than server.bytes_per_second"""
+
+    def do_POST(self):
+        remaining = int(self.headers.get('Content-Length', 0))
+        bytes_per_second = self.server.bytes_per_second
+        block = 4096
+        while remaining > 0:
+            data = self.rfile.read(min(block, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            time.sleep(len(data) / bytes_per_second)
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(bytes_per_second):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ThrottledUploadHandler)
+    server.bytes_per_second = bytes_per_second
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def upload(url, codec, payload):
+    files = {'audio': (f"audio.{AUDIO_CODECS[codec]['extension']}", payload, AUDIO_CODECS[codec]['mime'])}
+    start = time.perf_counter()
+    requests.post(url, files=files, data={'user_name': 'benchmark'}, timeout=120)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare upload time per codec over a throttled link')
+    parser.add_argument('--wav', help='16-bit mono WAV to use instead of the synthetic utterance')
+    parser.add_argument('--seconds', type=float, default=8.0, help='Synthetic utterance length')
+    parser.add_argument('--bandwidth-kbps', type=float, nargs='+', default=[2000, 500, 128],
+                        help='Simulated uplink bandwidths in kilobits per second')
+    parser.add_argument('--repeat', type=int, default=3, help='Uploads per codec and bandwidth')
+    args = parser.parse_args()
+
+    pcm, rate = load_wav(args.wav) if args.wav else synthetic_utterance(args.seconds)
+    duration = len(pcm) / 2 / rate
+    codecs = [c for c in UPLOAD_CODEC_PREFERENCE if c in local_audio_codecs()]
+    print(f"Utterance: {duration:.1f}s at {rate} Hz, codecs available: {', '.join(codecs)}")
+
+    payloads = {}
+    print(f"\n{'codec':<6} {'bytes':>9} {'ratio':>6} {'encode ms':>10}")
+    for codec in codecs:
+        start = time.perf_counter()
+        payload = encode_pcm(pcm, codec, rate)
+        encode_ms = (time.perf_counter() - start) * 1000
+        if payload is None:
+            print(f"{codec:<6} encoding failed")
+            continue
+        payloads[codec] = payload
+        print(f"{codec:<6} {len(payload):>9} {len(pcm) / len(payload):>5.1f}x {encode_ms:>10.1f}")
+
+    for kbps in args.bandwidth_kbps:
+        server = start_server(kbps * 1000 / 8)
+        url = f"http://127.0.0.1:{server.server_address[1]}/process_audio"
+        print(f"\nUplink {kbps:g} kbps")
+        print(f"{'codec':<6} {'median s':>9} {'min s':>7}")
+        for codec, payload in payloads.items():
+            times = [upload(url, codec, payload) for _ in range(args.repeat)]
+            print(f"{codec:<6} {np.median(times):>9.2f} {min(times):>7.2f}")
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()